@@ -0,0 +1,78 @@
+import argparse
+import os
+import random
+import time
+
+from tetris_bot import TetrisBot, SearchPiece, SHAPES, shutdown_search_pools
+
+def random_piece(rng):
+    shape_idx = rng.randrange(len(SHAPES))
+    return SearchPiece(SHAPES[shape_idx], shape_idx)
+
+def random_board(rng, height):
+    """Build a board with a ragged stack of the given height and a few holes."""
+    grid = [[0 for _ in range(10)] for _ in range(20)]
+    for x in range(10):
+        column_height = rng.randint(max(0, height - 3), height)
+        for y in range(20 - column_height, 20):
+            if rng.random() > 0.1:
+                grid[y][x] = rng.randint(1, 7)
+    return grid
+
+def set_pieces(bot, pieces):
+    """Give the bot the current piece, plus the next and preview pieces when the depth has them."""
+    bot.set_pieces(pieces[0], pieces[1] if len(pieces) > 1 else None, pieces[2:])
+
+def run(workers, boards, depth, beam_width, rounds):
+    """Time fixed-size searches on the given boards and return seconds per decision."""
+    bot = TetrisBot('hard', search_workers=workers)
+    bot.settings['hard'].update({
+        'search_budget': 60.0,  # Large enough that every search runs to full depth
+        'search_depth': depth,
+        'beam_width': beam_width,
+        'error_rate': 0.0
+    })
+
+    # Warm the pool so process start-up is not counted
+    grid, pieces = boards[0]
+    bot.set_grid(grid)
+    set_pieces(bot, pieces)
+    bot.find_best_move()
+
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for grid, pieces in boards:
+            bot.set_grid(grid)
+            set_pieces(bot, pieces)
+            bot.find_best_move()
+    return (time.perf_counter() - start) / (rounds * len(boards))
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TetrisBot parallel search scaling benchmark")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1, help="Largest worker count to try")
+    parser.add_argument("--depth", type=int, default=3, help="Pieces searched per decision")
+    parser.add_argument("--beam", type=int, default=16, help="Beam width")
+    parser.add_argument("--boards", type=int, default=8, help="Number of sample boards")
+    parser.add_argument("--rounds", type=int, default=3, help="Passes over the sample boards")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the sample boards")
+    args = parser.parse_args()
+    if args.depth < 1:
+        parser.error("--depth must be at least 1")
+
+    rng = random.Random(args.seed)
+    boards = [(random_board(rng, rng.randint(2, 10)),
+               [random_piece(rng) for _ in range(args.depth)])
+              for _ in range(args.boards)]
+
+    print(f"depth={args.depth} beam={args.beam} boards={args.boards} rounds={args.rounds}")
+    print(f"{'workers':>8} {'ms/decision':>12} {'speedup':>8}")
+
+    baseline = None
+    try:
+        for workers in range(1, args.max_workers + 1):
+            seconds = run(workers, boards, args.depth, args.beam, args.rounds)
+            if baseline is None:
+                baseline = seconds
+            print(f"{workers:>8} {seconds * 1000:>12.1f} {baseline / seconds:>8.2f}")
+    finally:
+        shutdown_search_pools()
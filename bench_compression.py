@@ -0,0 +1,167 @@
+import argparse
+import json
+import random
+import time
+import zlib
+
+from message_compression import PRESET_DICTIONARY, WINDOW_BITS, MEM_LEVEL, LEVEL, CompressedSocket, FrameCompressor
+from spectator_stream import MatchStream
+from tetris_bot import TetrisBot, BotGame, SHAPES
+
+def game_messages(seed, pieces, updates_per_piece=8):
+    """
+    The messages one client receives during a game against a bot: an
+    opponent_update per tick with the falling piece moving down, plus
+    add_lines after clears and an occasional ping.
+    """
+    rng = random.Random(seed)
+    game = BotGame(TetrisBot('easy'), seed)
+    messages = []
+    t = 1000.0
+    for _ in range(pieces):
+        if game.game_over:
+            break
+        shape_idx = game.queue[0]
+        for step in range(updates_per_piece):
+            t += 0.1
+            messages.append({
+                "type": "opponent_update",
+                "grid": game.bot.grid,
+                "score": game.score,
+                "t": round(t, 6),
+                "piece": {"shape": SHAPES[shape_idx], "color": shape_idx, "x": 4, "y": step, "fall": round(rng.random() * 0.5, 3)},
+                "fall_speed": 0.5
+            })
+        lines = game.play_piece()
+        if lines:
+            messages.append({"type": "add_lines", "lines": lines})
+        if rng.random() < 0.02:
+            messages.append({"type": "ping", "t": round(t, 6)})
+    return [json.dumps(message).encode() for message in messages]
+
+def spectator_frames(seed, pieces):
+    """The delta frames of a spectator stream of two bot games, one tick per piece"""
+    games = [BotGame(TetrisBot('easy'), seed), BotGame(TetrisBot('easy'), seed + 1000)]
+    match = MatchStream("0123abcd", [(0, "A"), (1, "B")])
+    frames = []
+    for _ in range(pieces):
+        for player, game in enumerate(games):
+            if not game.game_over:
+                game.play_piece()
+            match.update(player, [list(row) for row in game.bot.grid], game.score)
+        delta, _, _ = match.tick()
+        frames.append(delta)
+    return frames
+
+class NullSocket:
+    """Counts what a CompressedSocket writes"""
+
+    def __init__(self):
+        self.bytes = 0
+
+    def send(self, data, flags=0):
+        self.bytes += len(data)
+        return len(data)
+
+def spectator_cost(frames, spectators):
+    """
+    Time the compressed spectators of one stream, with each frame compressed
+    per connection and compressed once then spliced into every connection.
+
+    Returns:
+        list: (variant, microseconds per frame, compressed bytes per frame and spectator)
+    """
+    results = []
+    for name in ("per-connection", "shared"):
+        socks = [NullSocket() for _ in range(spectators)]
+        connections = [CompressedSocket(sock) for sock in socks]
+        shared = FrameCompressor()
+        start = time.perf_counter()
+        for frame in frames:
+            if name == "shared":
+                compressed = shared.compress(frame)
+                for connection in connections:
+                    connection.send_frame(frame, compressed)
+            else:
+                for connection in connections:
+                    connection.send(frame)
+        elapsed = time.perf_counter() - start
+        results.append((name, elapsed / len(frames) * 1e6, sum(sock.bytes for sock in socks) / len(frames) / spectators))
+    return results
+
+def stream(window_bits, mem_level, zdict):
+    """Compress all messages with one per-connection stream, flushed per message"""
+    def run(messages):
+        args = (LEVEL, zlib.DEFLATED, window_bits, mem_level, zlib.Z_DEFAULT_STRATEGY)
+        compressor = zlib.compressobj(*args, zdict) if zdict else zlib.compressobj(*args)
+        return [compressor.compress(m) + compressor.flush(zlib.Z_SYNC_FLUSH) for m in messages]
+    def restore(chunks):
+        decompressor = zlib.decompressobj(window_bits, zdict) if zdict else zlib.decompressobj(window_bits)
+        return [decompressor.decompress(chunk) for chunk in chunks]
+    return run, restore
+
+def independent(window_bits, mem_level, zdict):
+    """Compress every message on its own, with no history between them"""
+    def run(messages):
+        args = (LEVEL, zlib.DEFLATED, window_bits, mem_level, zlib.Z_DEFAULT_STRATEGY)
+        out = []
+        for m in messages:
+            compressor = zlib.compressobj(*args, zdict) if zdict else zlib.compressobj(*args)
+            out.append(compressor.compress(m) + compressor.flush())
+        return out
+    def restore(chunks):
+        return [(zlib.decompressobj(window_bits, zdict) if zdict else zlib.decompressobj(window_bits)).decompress(chunk)
+                for chunk in chunks]
+    return run, restore
+
+def state_size(window_bits, mem_level):
+    """Memory of one connection's compressor and decompressor as documented in zlib's zconf.h, in KB"""
+    window_bits = abs(window_bits)
+    deflate = (1 << (window_bits + 2)) + (1 << (mem_level + 9))
+    inflate = (1 << window_bits) + 7 * 1024
+    return (deflate + inflate) / 1024
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Compression of server-to-client messages: CPU cost against bandwidth")
+    parser.add_argument("--games", type=int, default=5, help="Bot games to generate messages from")
+    parser.add_argument("--pieces", type=int, default=150, help="Pieces per game")
+    parser.add_argument("--spectators", type=int, default=100, help="Compressed spectators of one match")
+    args = parser.parse_args()
+
+    games = [game_messages(seed, args.pieces) for seed in range(args.games)]
+    count = sum(len(messages) for messages in games)
+    raw = sum(len(m) for messages in games for m in messages)
+
+    variants = [
+        ("per-message", independent(-15, 8, None), -15, 8),
+        ("per-message+dict", independent(WINDOW_BITS, MEM_LEVEL, PRESET_DICTIONARY), WINDOW_BITS, MEM_LEVEL),
+        ("stream", stream(WINDOW_BITS, MEM_LEVEL, None), WINDOW_BITS, MEM_LEVEL),
+        ("stream+dict", stream(WINDOW_BITS, MEM_LEVEL, PRESET_DICTIONARY), WINDOW_BITS, MEM_LEVEL),
+        ("stream+dict 32K", stream(-15, 8, PRESET_DICTIONARY), -15, 8)
+    ]
+
+    print(f"{count} messages from {len(games)} games, {raw / count:.0f} bytes per message uncompressed")
+    print(f"{'variant':>17} {'bytes/msg':>10} {'ratio':>6} {'saved':>6} {'comp us':>8} {'decomp us':>10} {'state KB':>9}")
+    print(f"{'none':>17} {raw / count:>10.0f} {1.0:>6.2f} {'0%':>6} {0:>8.1f} {0:>10.1f} {0:>9.0f}")
+    for name, (run, restore), window_bits, mem_level in variants:
+        compressed = 0
+        compress_time = decompress_time = 0.0
+        for messages in games:
+            start = time.perf_counter()
+            chunks = run(messages)
+            compress_time += time.perf_counter() - start
+            start = time.perf_counter()
+            restored = restore(chunks)
+            decompress_time += time.perf_counter() - start
+            assert restored == messages
+            compressed += sum(len(chunk) for chunk in chunks)
+        print(f"{name:>17} {compressed / count:>10.0f} {raw / compressed:>6.2f} {1 - compressed / raw:>6.0%} "
+              f"{compress_time / count * 1e6:>8.1f} {decompress_time / count * 1e6:>10.1f} "
+              f"{state_size(window_bits, mem_level):>9.0f}")
+
+    frames = spectator_frames(0, args.pieces)
+    plain = sum(len(frame) for frame in frames) / len(frames)
+    print(f"\nspectator deltas to {args.spectators} compressed spectators, {plain:.0f} bytes per frame uncompressed")
+    print(f"{'variant':>17} {'us/frame':>10} {'bytes/frame/spectator':>22}")
+    for name, micros, size in spectator_cost(frames, args.spectators):
+        print(f"{name:>17} {micros:>10.1f} {size:>22.0f}")
@@ -0,0 +1,86 @@
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import time
+
+from server_ipc import FramedSocket
+from shm_ring import ShmChannel
+
+def opponent_update():
+    """An encoded opponent_update as relayed between workers"""
+    return json.dumps({
+        "type": "opponent_update",
+        "grid": [[(x * y) % 8 for x in range(10)] for y in range(20)],
+        "score": 12345,
+        "t": time.time(),
+        "piece": {"shape": [[1, 1], [1, 1]], "color": 3, "x": 4, "y": 7, "fall": 0.25},
+        "fall_speed": 0.5
+    }).encode()
+
+def echo(inbound, outbound, iterations):
+    """Echo process: send every frame straight back"""
+    for _ in range(iterations):
+        header, payload = inbound.recv()
+        outbound.send(header, bytes(payload))
+
+def measure(inbound, outbound, payload, iterations, warmup):
+    """
+    Ping-pong frames and return one-way handoff times in microseconds,
+    taken as half of each round trip.
+    """
+    header = {"op": "deliver", "to": "00000000-0000-0000-0000-000000000000"}
+    samples = []
+    for i in range(warmup + iterations):
+        start = time.perf_counter_ns()
+        outbound.send(header, payload)
+        inbound.recv()
+        if i >= warmup:
+            samples.append((time.perf_counter_ns() - start) / 2000)
+    return sorted(samples)
+
+def percentile(samples, p):
+    return samples[min(len(samples) - 1, int(len(samples) * p / 100))]
+
+def run_uds(payload, iterations, warmup):
+    a, b = socket.socketpair(socket.AF_UNIX, socket.SOCK_STREAM)
+    parent, child = FramedSocket(a), FramedSocket(b)
+    process = multiprocessing.Process(target=echo, args=(child, child, warmup + iterations))
+    process.start()
+    try:
+        return measure(parent, parent, payload, iterations, warmup)
+    finally:
+        process.join()
+        parent.close()
+        child.close()
+
+def run_shm(payload, iterations, warmup):
+    to_child, to_parent = ShmChannel(), ShmChannel()
+    process = multiprocessing.Process(target=echo, args=(to_child, to_parent, warmup + iterations))
+    process.start()
+    try:
+        return measure(to_parent, to_child, payload, iterations, warmup)
+    finally:
+        process.join()
+        to_child.unlink()
+        to_parent.unlink()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Handoff latency between processes: Unix socket vs shared memory ring")
+    parser.add_argument("--iterations", type=int, default=20000, help="Round trips measured per case")
+    parser.add_argument("--warmup", type=int, default=1000, help="Round trips run before measuring")
+    args = parser.parse_args()
+
+    payloads = {
+        "event": json.dumps({"type": "add_lines", "count": 2}).encode(),
+        "snapshot": opponent_update()
+    }
+
+    print(f"iterations={args.iterations} cpus={os.cpu_count()}")
+    print(f"{'transport':>10} {'message':>9} {'bytes':>6} {'p50 us':>8} {'p99 us':>8} {'max us':>9}")
+    for name, payload in payloads.items():
+        for transport, run in (("uds", run_uds), ("shm", run_shm)):
+            samples = run(payload, args.iterations, args.warmup)
+            print(f"{transport:>10} {name:>9} {len(payload):>6} {percentile(samples, 50):>8.1f} "
+                  f"{percentile(samples, 99):>8.1f} {samples[-1]:>9.1f}")
@@ -0,0 +1,67 @@
+import argparse
+import os
+import random
+import time
+
+# Render off-screen so the benchmark runs without a window
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import pygame
+import block
+
+def fill_board(board, rng, fill):
+    """Fill the lower part of the board with random blocks."""
+    for y in range(block.rows):
+        for x in range(block.cols):
+            if y >= block.rows * (1 - fill) and rng.random() < 0.9:
+                board.grid[y][x] = rng.randint(1, 7)
+
+def primitive_draw(board):
+    """The previous Board.draw path: draw calls for every cell on every frame."""
+    for y in range(block.rows):
+        for x in range(block.cols):
+            if board.grid[y][x] != 0:
+                block.draw_block(block.screen, x*block.block_size, y*block.block_size,
+                                 board.grid[y][x], block.block_size)
+            else:
+                block.draw_empty_cell(block.screen, x*block.block_size, y*block.block_size,
+                                      block.block_size)
+
+def atlas_draw(board):
+    """Batch-blit every cell from the block atlas without the cached board layer."""
+    tiles = block.atlas.rects
+    block.screen.blits([(block.atlas.surface, (x*block.block_size, y*block.block_size), tiles[board.grid[y][x]])
+                        for y in range(block.rows) for x in range(block.cols)],
+                       False)
+
+def time_frames(draw, frames):
+    """Return the mean milliseconds per frame for a draw function."""
+    draw()
+    start = time.perf_counter()
+    for _ in range(frames):
+        draw()
+    return (time.perf_counter() - start) * 1000 / frames
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Board draw frame-time benchmark")
+    parser.add_argument("--frames", type=int, default=300, help="Frames timed per case")
+    parser.add_argument("--fill", type=float, default=1.0, help="Fraction of rows filled with blocks")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed for the board")
+    args = parser.parse_args()
+
+    board = block.Board()
+    fill_board(board, random.Random(args.seed), args.fill)
+    piece = block.Piece()
+
+    cases = [
+        ("board: draw primitives", lambda: primitive_draw(board)),
+        ("board: atlas blits", lambda: atlas_draw(board)),
+        ("board: cached layer", board.draw),
+        ("piece: atlas blits", piece.draw),
+    ]
+
+    print(f"frames={args.frames} fill={args.fill}")
+    for name, draw in cases:
+        print(f"{name:>24}: {time_frames(draw, args.frames):.3f} ms/frame")
+
+    pygame.quit()
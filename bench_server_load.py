@@ -0,0 +1,481 @@
+import argparse
+import heapq
+import json
+import multiprocessing
+import os
+import random
+import resource
+import selectors
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+from message_compression import Decompressor
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "block-server.py")
+
+# Report fields compared by --compare, and whether a larger value is better
+COMPARED = [
+    ("connect.rate", True),
+    ("match_ms.p50", False),
+    ("rtt_ms.p50", False),
+    ("rtt_ms.p99", False),
+    ("fanout_ms.p50", False),
+    ("fanout_ms.p99", False),
+    ("messages.received_rate", True),
+    ("bytes.wire_per_message", False),
+    ("server.cpu_percent", False),
+    ("server.rss_max_mb", False)
+]
+
+def raise_file_limit():
+    """Allow as many open sockets as the hard limit permits"""
+    soft, hard = resource.getrlimit(resource.RLIMIT_NOFILE)
+    if soft < hard:
+        resource.setrlimit(resource.RLIMIT_NOFILE, (hard, hard))
+
+def random_grid(rng, filled_rows):
+    """A board with its bottom rows partly filled, as a real client would send"""
+    grid = [[0] * 10 for _ in range(20)]
+    for y in range(20 - filled_rows, 20):
+        for x in range(10):
+            if rng.random() < 0.8:
+                grid[y][x] = rng.randint(1, 7)
+    return grid
+
+class SimClient:
+    """One simulated player speaking the client protocol"""
+
+    def __init__(self, index):
+        self.index = index
+        self.sock = None
+        self.buffer = ""
+        self.decompressor = None
+        self.state = "idle"  # idle, waiting, playing, over
+        self.game = 0  # Bumped when a game ends, so timers of the old game are ignored
+        self.connected_at = None
+        self.join_sent = None
+        self.game_over_sent = None
+        self.matched = False
+
+class LoadProcess:
+    """
+    Drives many simulated clients from one process with a selector and a timer heap.
+
+    Each client connects at its ramp time, joins multiplayer, and while in a
+    game sends grid_update at grid_rate and clear_lines at random intervals.
+    When its game length runs out it sends game_over, and after a short
+    pause ready_for_new_game to be matched again.
+    """
+
+    def __init__(self, port, clients, options, seed):
+        self.port = port
+        self.options = options
+        self.rng = random.Random(seed)
+        self.selector = selectors.DefaultSelector()
+        self.decoder = json.JSONDecoder()
+        self.timers = []  # Heap of (time, sequence, action, client, game)
+        self.sequence = 0
+        self.clients = [SimClient(i) for i in range(clients)]
+        self.grids = [random_grid(self.rng, rows) for rows in range(0, 16, 3)]
+        self.stats = {
+            "connected": 0,
+            "connect_failed": 0,
+            "disconnected": 0,
+            "connect_seconds": 0.0,
+            "connect_first": None,
+            "connect_last": None,
+            "sent": 0,
+            "received": 0,
+            "wire_bytes": 0,
+            "plain_bytes": 0,
+            "games": 0,
+            "match_ms": [],
+            "rtt_ms": [],
+            "fanout_ms": []
+        }
+
+    def schedule(self, at, action, client):
+        self.sequence += 1
+        heapq.heappush(self.timers, (at, self.sequence, action, client, client.game))
+
+    def send(self, client, message):
+        try:
+            client.sock.sendall(json.dumps(message).encode())
+            self.stats["sent"] += 1
+        except OSError:
+            self.drop(client)
+
+    def drop(self, client):
+        if client.sock:
+            self.selector.unregister(client.sock)
+            client.sock.close()
+            client.sock = None
+            client.state = "idle"
+            client.game += 1
+            self.stats["disconnected"] += 1
+
+    def run(self, ramp, duration):
+        start = time.perf_counter()
+        for client in self.clients:
+            self.schedule(start + ramp * self.rng.random(), "connect", client)
+        deadline = start + ramp + duration
+
+        while True:
+            now = time.perf_counter()
+            if now >= deadline:
+                break
+            while self.timers and self.timers[0][0] <= now:
+                _, _, action, client, game = heapq.heappop(self.timers)
+                if game == client.game:
+                    getattr(self, f"on_{action}")(client, now)
+
+            timeout = min(self.timers[0][0] - now if self.timers else 0.1, deadline - now)
+            for key, _ in self.selector.select(max(0.0, timeout)):
+                self.on_readable(key.data)
+
+        for client in self.clients:
+            if client.sock:
+                client.sock.close()
+        return self.stats
+
+    def on_connect(self, client, now):
+        try:
+            connect_start = time.perf_counter()
+            client.sock = socket.create_connection(("127.0.0.1", self.port), timeout=10)
+            self.stats["connect_seconds"] += time.perf_counter() - connect_start
+        except OSError:
+            self.stats["connect_failed"] += 1
+            return
+        client.sock.setblocking(True)
+        client.sock.settimeout(None)
+        self.selector.register(client.sock, selectors.EVENT_READ, client)
+        self.stats["connected"] += 1
+        client.connected_at = time.perf_counter()
+        if self.stats["connect_first"] is None:
+            self.stats["connect_first"] = client.connected_at
+        self.stats["connect_last"] = client.connected_at
+        client.join_sent = client.connected_at
+        client.state = "waiting"
+        client.decompressor = Decompressor()
+        join = {"type": "join", "name": f"load-{os.getpid()}-{client.index}", "mode": "multiplayer"}
+        if self.options["compression"]:
+            join["compression"] = "zlib"
+        self.send(client, join)
+
+    def on_tick(self, client, now):
+        if client.state != "playing":
+            return
+        self.send(client, {
+            "type": "grid_update",
+            "grid": self.rng.choice(self.grids),
+            "score": self.rng.randint(0, 10000),
+            "mode": "multiplayer",
+            "t": time.time(),
+            "piece": {"shape": [[1, 1], [1, 1]], "color": 2, "x": 4, "y": self.rng.randint(0, 17), "fall": 0.0},
+            "fall_speed": 0.5
+        })
+        self.schedule(now + 1 / self.options["grid_rate"], "tick", client)
+
+    def on_clear(self, client, now):
+        if client.state != "playing":
+            return
+        self.send(client, {"type": "clear_lines", "lines": self.rng.randint(1, 4)})
+        self.schedule(now + self.rng.expovariate(1 / self.options["clear_interval"]), "clear", client)
+
+    def on_end(self, client, now):
+        if client.state != "playing":
+            return
+        client.game_over_sent = time.perf_counter()
+        self.send(client, {"type": "game_over", "score": self.rng.randint(0, 10000), "mode": "multiplayer"})
+
+    def on_ready(self, client, now):
+        client.state = "waiting"
+        self.send(client, {"type": "ready_for_new_game"})
+
+    def on_readable(self, client):
+        try:
+            data = client.sock.recv(65536)
+        except OSError:
+            data = b""
+        if not data:
+            self.drop(client)
+            return
+
+        self.stats["wire_bytes"] += len(data)
+        data = client.decompressor.feed(data)
+        self.stats["plain_bytes"] += len(data)
+        client.buffer += data.decode()
+        while True:
+            client.buffer = client.buffer.lstrip()
+            if not client.buffer:
+                break
+            try:
+                message, end = self.decoder.raw_decode(client.buffer)
+            except json.JSONDecodeError:
+                break
+            client.buffer = client.buffer[end:]
+            self.stats["received"] += 1
+            self.on_message(client, message)
+
+    def on_message(self, client, message):
+        now = time.perf_counter()
+        message_type = message.get("type")
+
+        if message_type == "ping":
+            self.send(client, {"type": "pong", "t": message["t"]})
+
+        elif message_type == "player_id" and client.join_sent:
+            self.stats["rtt_ms"].append((now - client.join_sent) * 1000)
+            client.join_sent = None
+
+        elif message_type == "game_start":
+            if not client.matched:
+                client.matched = True
+                self.stats["match_ms"].append((now - client.connected_at) * 1000)
+            client.state = "playing"
+            self.schedule(now + self.rng.random() / self.options["grid_rate"], "tick", client)
+            self.schedule(now + self.rng.expovariate(1 / self.options["clear_interval"]), "clear", client)
+            length = self.options["game_length"]
+            self.schedule(now + self.rng.uniform(0.5 * length, 1.5 * length), "end", client)
+
+        elif message_type == "opponent_update":
+            if "t" in message:
+                self.stats["fanout_ms"].append((time.time() - message["t"]) * 1000)
+
+        elif message_type == "game_over" or message_type == "opponent_disconnected":
+            if client.game_over_sent:
+                self.stats["rtt_ms"].append((now - client.game_over_sent) * 1000)
+                client.game_over_sent = None
+            if client.state == "playing":
+                self.stats["games"] += 1
+            client.state = "over"
+            client.game += 1
+            self.schedule(now + self.options["rematch_delay"], "ready", client)
+
+def run_load(port, clients, options, seed, results):
+    """Load process entry point"""
+    raise_file_limit()
+    results.put(LoadProcess(port, clients, options, seed).run(options["ramp"], options["duration"]))
+
+def process_tree(pid):
+    """pid and all of its descendants"""
+    children = {}
+    for entry in os.listdir("/proc"):
+        if entry.isdigit():
+            try:
+                with open(f"/proc/{entry}/stat") as f:
+                    parent = int(f.read().rsplit(")", 1)[1].split()[1])
+                children.setdefault(parent, []).append(int(entry))
+            except (OSError, IndexError, ValueError):
+                pass
+    tree, stack = [], [pid]
+    while stack:
+        current = stack.pop()
+        tree.append(current)
+        stack.extend(children.get(current, []))
+    return tree
+
+def sample_process(pids):
+    """
+    Returns:
+        tuple: (CPU seconds, resident set size in bytes) summed over the processes
+    """
+    ticks = os.sysconf("SC_CLK_TCK")
+    page = os.sysconf("SC_PAGE_SIZE")
+    cpu = rss = 0
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                fields = f.read().rsplit(")", 1)[1].split()
+            cpu += (int(fields[11]) + int(fields[12])) / ticks
+            rss += int(fields[21]) * page
+        except (OSError, IndexError, ValueError):
+            pass
+    return cpu, rss
+
+class ServerSampler:
+    """Samples CPU time and memory of the server process tree in a background thread"""
+
+    def __init__(self, pid, interval=0.5):
+        self.pid = pid
+        self.interval = interval
+        self.rss_max = 0
+        self.samples = []  # (time, cpu seconds)
+        self.stopped = threading.Event()
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+
+    def run(self):
+        while not self.stopped.is_set():
+            cpu, rss = sample_process(process_tree(self.pid))
+            self.samples.append((time.perf_counter(), cpu))
+            self.rss_max = max(self.rss_max, rss)
+            self.stopped.wait(self.interval)
+
+    def start(self):
+        self.thread.start()
+
+    def stop(self):
+        self.stopped.set()
+        self.thread.join()
+
+    def report(self):
+        if len(self.samples) < 2:
+            return {}
+        (t0, cpu0), (t1, cpu1) = self.samples[0], self.samples[-1]
+        return {
+            "cpu_seconds": round(cpu1 - cpu0, 3),
+            "cpu_percent": round(100 * (cpu1 - cpu0) / (t1 - t0), 1),
+            "rss_max_mb": round(self.rss_max / 2 ** 20, 1)
+        }
+
+def percentiles(values):
+    if not values:
+        return {"count": 0}
+    values = sorted(values)
+    pick = lambda p: round(values[min(len(values) - 1, int(len(values) * p / 100))], 3)
+    return {"count": len(values), "p50": pick(50), "p90": pick(90), "p99": pick(99), "max": round(values[-1], 3)}
+
+def git_commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(SERVER_SCRIPT)).stdout.strip() or None
+    except OSError:
+        return None
+
+def build_report(args, totals, sampler):
+    merged = {key: [] for key in ("match_ms", "rtt_ms", "fanout_ms")}
+    for stats in totals:
+        for key in merged:
+            merged[key].extend(stats[key])
+    count = lambda key: sum(stats[key] for stats in totals)
+    connected = count("connected")
+    # perf_counter is system-wide on Linux, so the load processes' times are comparable
+    firsts = [stats["connect_first"] for stats in totals if stats["connect_first"] is not None]
+    lasts = [stats["connect_last"] for stats in totals if stats["connect_last"] is not None]
+    connect_span = max(lasts) - min(firsts) if firsts else 0
+    return {
+        "commit": git_commit(),
+        "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        "cpus": os.cpu_count(),
+        "config": {key: value for key, value in vars(args).items() if key not in ("report", "compare")},
+        "connect": {
+            "connected": connected,
+            "failed": count("connect_failed"),
+            "disconnected": count("disconnected"),
+            "rate": round(connected / connect_span, 1) if connect_span else None,
+            "mean_ms": round(1000 * count("connect_seconds") / connected, 3) if connected else None
+        },
+        "match_ms": percentiles(merged["match_ms"]),
+        "rtt_ms": percentiles(merged["rtt_ms"]),
+        "fanout_ms": percentiles(merged["fanout_ms"]),
+        "messages": {
+            "sent": count("sent"),
+            "received": count("received"),
+            "sent_rate": round(count("sent") / (args.ramp + args.duration), 1),
+            "received_rate": round(count("received") / (args.ramp + args.duration), 1)
+        },
+        "bytes": {
+            "wire": count("wire_bytes"),
+            "plain": count("plain_bytes"),
+            "wire_per_message": round(count("wire_bytes") / count("received"), 1) if count("received") else None,
+            "ratio": round(count("plain_bytes") / count("wire_bytes"), 2) if count("wire_bytes") else None
+        },
+        "games": count("games"),
+        "server": sampler.report() if sampler else {}
+    }
+
+def lookup(report, path):
+    value = report
+    for key in path.split("."):
+        value = value.get(key) if isinstance(value, dict) else None
+    return value
+
+def compare(report, baseline):
+    """Print the main report fields against a baseline report"""
+    print(f"\ncompared with {baseline.get('commit')} ({baseline.get('time')})")
+    print(f"{'metric':>24} {'baseline':>10} {'current':>10} {'change':>8}")
+    for path, higher_is_better in COMPARED:
+        old, new = lookup(baseline, path), lookup(report, path)
+        if old is None or new is None:
+            continue
+        change = (new - old) / old * 100 if old else 0.0
+        worse = change < 0 if higher_is_better else change > 0
+        flag = " worse" if worse and abs(change) >= 10 else ""
+        print(f"{path:>24} {old:>10} {new:>10} {change:>+7.1f}%{flag}")
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Simulated-player load test for TetrisServer")
+    parser.add_argument("--clients", type=int, default=1000, help="Simulated players")
+    parser.add_argument("--load-processes", type=int, default=4, help="Processes running the simulated players")
+    parser.add_argument("--ramp", type=float, default=10.0, help="Seconds over which the players connect; 0 connects them all at once")
+    parser.add_argument("--duration", type=float, default=30.0, help="Seconds of play after the ramp")
+    parser.add_argument("--grid-rate", type=float, default=10.0, help="grid_update messages per second per player")
+    parser.add_argument("--clear-interval", type=float, default=8.0, help="Mean seconds between clear_lines")
+    parser.add_argument("--game-length", type=float, default=20.0, help="Mean game length in seconds")
+    parser.add_argument("--rematch-delay", type=float, default=1.0, help="Seconds before ready_for_new_game")
+    parser.add_argument("--port", type=int, default=5650, help="Port of the server under test")
+    parser.add_argument("--external", action="store_true", help="Use a server already running on --port")
+    parser.add_argument("--server-pid", type=int, help="Sample CPU/RSS of this process tree with --external")
+    parser.add_argument("--workers", type=int, default=1, help="Server worker processes")
+    parser.add_argument("--transport", choices=["uds", "shm"], default="uds", help="Server relay transport")
+    parser.add_argument("--compression", action="store_true", help="Have the server zlib-compress what it sends")
+    parser.add_argument("--seed", type=int, default=1, help="Random seed")
+    parser.add_argument("--report", default="bench-server-load.json", help="Where to write the JSON report")
+    parser.add_argument("--compare", help="Baseline report to compare against")
+    args = parser.parse_args()
+
+    raise_file_limit()
+    server = None
+    scores_file = os.path.join(tempfile.gettempdir(), f"bench-server-load-scores-{args.port}.json")
+    if not args.external:
+        server = subprocess.Popen([sys.executable, SERVER_SCRIPT, "--port", str(args.port), "--scores", scores_file,
+                                   "--workers", str(args.workers), "--transport", args.transport],
+                                  stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        for _ in range(100):
+            try:
+                socket.create_connection(("127.0.0.1", args.port)).close()
+                break
+            except ConnectionRefusedError:
+                time.sleep(0.1)
+
+    server_pid = server.pid if server else args.server_pid
+    sampler = ServerSampler(server_pid) if server_pid and os.path.exists("/proc") else None
+    options = {key: getattr(args, key) for key in ("grid_rate", "clear_interval", "game_length",
+                                                    "rematch_delay", "ramp", "duration", "compression")}
+
+    try:
+        if sampler:
+            sampler.start()
+        results = multiprocessing.Queue()
+        per_process = [args.clients // args.load_processes + (i < args.clients % args.load_processes)
+                       for i in range(args.load_processes)]
+        loads = [multiprocessing.Process(target=run_load, args=(args.port, count, options, args.seed * 1000 + i, results))
+                 for i, count in enumerate(per_process)]
+        for load in loads:
+            load.start()
+        totals = [results.get() for _ in loads]
+        for load in loads:
+            load.join()
+    finally:
+        if sampler:
+            sampler.stop()
+        if server:
+            server.terminate()
+            server.wait()
+        if os.path.exists(scores_file):
+            os.remove(scores_file)
+
+    report = build_report(args, totals, sampler)
+    with open(args.report, 'w') as f:
+        json.dump(report, f, indent=2)
+
+    print(json.dumps({key: report[key] for key in ("connect", "match_ms", "rtt_ms", "fanout_ms", "messages", "bytes", "games", "server")}, indent=2))
+    print(f"Report written to {args.report}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(report, json.load(f))
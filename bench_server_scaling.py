@@ -0,0 +1,125 @@
+import argparse
+import json
+import multiprocessing
+import os
+import selectors
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+SERVER_SCRIPT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "block-server.py")
+
+def grid_update(score):
+    return json.dumps({
+        "type": "grid_update",
+        "grid": [[0] * 10 for _ in range(20)],
+        "score": score,
+        "mode": "multiplayer"
+    }).encode()
+
+def run_load(port, connections, duration, results):
+    """
+    Load process: open connections, wait until they are all matched, then
+    play ping-pong - every opponent_update received is answered with a
+    grid_update, so each matched pair keeps two messages in flight.
+    """
+    selector = selectors.DefaultSelector()
+    message = grid_update(0)
+    start = time.perf_counter()
+
+    sockets = []
+    for i in range(connections):
+        sock = socket.create_connection(("127.0.0.1", port))
+        sock.sendall(json.dumps({"type": "join", "name": f"load-{os.getpid()}-{i}", "mode": "multiplayer"}).encode())
+        sockets.append(sock)
+
+    # Wait for every connection's game_start
+    pending = set(sockets)
+    for sock in sockets:
+        selector.register(sock, selectors.EVENT_READ)
+    buffers = {sock: b"" for sock in sockets}
+    while pending:
+        for key, _ in selector.select(timeout=10):
+            data = key.fileobj.recv(65536)
+            buffers[key.fileobj] += data
+            if b'"game_start"' in buffers[key.fileobj]:
+                pending.discard(key.fileobj)
+        if time.perf_counter() - start > 60:
+            break
+    matched = time.perf_counter() - start
+
+    # Ping-pong until the deadline
+    for sock in sockets:
+        sock.sendall(message)
+    received = 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        for key, _ in selector.select(timeout=0.1):
+            data = key.fileobj.recv(65536)
+            replies = data.count(b'"opponent_update"')
+            received += replies
+            if replies:
+                key.fileobj.sendall(message * replies)
+
+    for sock in sockets:
+        sock.close()
+    results.put((connections - len(pending), matched, received))
+
+def run(workers, port, connections, load_processes, duration):
+    """Start a server with the given worker count and measure it."""
+    scores_file = os.path.join(tempfile.gettempdir(), f"bench-server-scores-{port}.json")
+    server = subprocess.Popen([sys.executable, SERVER_SCRIPT, "--port", str(port),
+                               "--workers", str(workers), "--scores", scores_file],
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        # Wait for the port to accept connections
+        for _ in range(100):
+            try:
+                socket.create_connection(("127.0.0.1", port)).close()
+                break
+            except ConnectionRefusedError:
+                time.sleep(0.1)
+
+        results = multiprocessing.Queue()
+        per_process = connections // load_processes
+        loads = [multiprocessing.Process(target=run_load, args=(port, per_process, duration, results))
+                 for _ in range(load_processes)]
+        for load in loads:
+            load.start()
+        totals = [results.get() for _ in loads]
+        for load in loads:
+            load.join()
+    finally:
+        server.terminate()
+        server.wait()
+        if os.path.exists(scores_file):
+            os.remove(scores_file)
+
+    matched = sum(t[0] for t in totals)
+    connect_time = max(t[1] for t in totals)
+    messages = sum(t[2] for t in totals)
+    return matched, matched / connect_time, messages / duration
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="TetrisServer multi-process scaling benchmark")
+    parser.add_argument("--max-workers", type=int, default=os.cpu_count() or 1, help="Largest worker count to try")
+    parser.add_argument("--connections", type=int, default=400, help="Client connections (an even number)")
+    parser.add_argument("--load-processes", type=int, default=4, help="Processes generating client load")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds of message ping-pong per run")
+    parser.add_argument("--port", type=int, default=5600, help="First port to use, one per run")
+    args = parser.parse_args()
+
+    print(f"connections={args.connections} load_processes={args.load_processes} "
+          f"duration={args.duration}s cpus={os.cpu_count()}")
+    print(f"{'workers':>8} {'matched':>8} {'conn/s':>9} {'msgs/s':>9} {'speedup':>8}")
+
+    baseline = None
+    for workers in range(1, args.max_workers + 1):
+        matched, connect_rate, message_rate = run(workers, args.port + workers, args.connections,
+                                                  args.load_processes, args.duration)
+        if baseline is None:
+            baseline = message_rate
+        print(f"{workers:>8} {matched:>8} {connect_rate:>9.0f} {message_rate:>9.0f} "
+              f"{message_rate / baseline if baseline else 0:>8.2f}")
@@ -7,23 +7,61 @@ import uuid
 import logging
 import heapq
 import os
+import multiprocessing
+import shutil
+import signal
+import sys
+import tempfile
 
-# Set up logging
-logging.basicConfig(level=logging.INFO, format='%(asctime)s - %(levelname)s - %(message)s')
+from server_ipc import FramedSocket, listen_unix, connect_unix
+from shm_ring import ShmChannel
+from server_metrics import ServerMetrics, InstrumentedLock, TextEndpoint, FileDump, unsent_bytes
+from server_logging import setup_logging, dropped_logs
+from bot_scheduler import TimerWheel
+from server_limits import MAX_FRAME_SIZE, ClientLimits, valid_grid_update
+from spectator_stream import MatchStream
+from message_compression import CompressedSocket, FrameCompressor, COMPRESSION_ACK
+
+# Handlers are installed by setup_logging() in each server process
 logger = logging.getLogger(__name__)
 
+# Spectator frames are sent without blocking the broadcast thread where the platform allows it
+SEND_NONBLOCKING = getattr(socket, "MSG_DONTWAIT", 0)
+
 class TetrisServer:
-    def __init__(self, host='0.0.0.0', port=5555, scores_file="high_scores.json"):
+    # Message types with a handler; anything else is counted as "other"
+    MESSAGE_TYPES = ("join", "grid_update", "clear_lines", "game_over", "ready_for_new_game", "leave_game", "pong",
+                     "list_matches", "spectate", "stop_spectating")
+    
+    def __init__(self, host='0.0.0.0', port=5555, scores_file="high_scores.json", ping_interval=5.0, idle_timeout=15.0,
+                 spectate_rate=5.0):
         self.host = host
         self.port = port
         self.scores_file = scores_file
+        self.ping_interval = ping_interval  # Seconds of silence before a client is pinged
+        self.idle_timeout = idle_timeout  # Seconds of silence before a client is disconnected, 0 to never
+        self.spectate_rate = spectate_rate  # Spectator frames per second
         self.server_socket = None
         self.clients = {}  # {client_id: {"socket": socket, "name": name, "opponent": opponent_id, "game_state": {...}, "mode": mode}}
         self.waiting_player = None  # ID of player waiting for opponent
         self.high_scores = []  # List of (score, name) tuples for ranking
-        self.lock = threading.Lock()
+        self.metrics = ServerMetrics()
+        self.metrics.gauge("clients", lambda: len(self.clients))
+        self.metrics.gauge("outbound.unsent_bytes", self.unsent_bytes)
+        self.metrics.gauge("log.dropped", dropped_logs)
+        self.exporters = []  # Metrics exporters started and stopped with the server
+        # Re-entrant: handlers call helpers such as add_high_score that take the lock again
+        self.lock = InstrumentedLock(self.metrics)
         self.running = False
         
+        # One timer wheel entry per connected client, checked by the heartbeat thread
+        self.heartbeats = TimerWheel(tick=0.1)
+        self.heartbeat_lock = threading.Lock()
+        
+        self.streams = {}  # {match_id: MatchStream} of matches between two local players
+        self.unflushed = set()  # Compressed spectator sockets holding part of a frame; broadcast thread only
+        self.frame_compressor = FrameCompressor()  # Broadcast thread only
+        
         # Load high scores if file exists
         self.load_high_scores()
 
@@ -33,21 +71,23 @@ class TetrisServer:
             if os.path.exists(self.scores_file):
                 with open(self.scores_file, 'r') as f:
                     self.high_scores = json.load(f)
-                logger.info(f"Loaded {len(self.high_scores)} high scores")
+                logger.info("Loaded %d high scores", len(self.high_scores), extra={"event": "scores_loaded"})
             else:
                 self.high_scores = []
         except Exception as e:
-            logger.error(f"Error loading high scores: {e}")
+            logger.error("Error loading high scores: %s", e, extra={"event": "scores_error"})
             self.high_scores = []
 
     def save_high_scores(self):
         """Save high scores to file"""
         try:
+            start = time.perf_counter()
             with open(self.scores_file, 'w') as f:
                 json.dump(self.high_scores, f)
-            logger.info(f"Saved {len(self.high_scores)} high scores")
+            self.metrics.observe("save_high_scores", time.perf_counter() - start)
+            logger.info("Saved %d high scores", len(self.high_scores), extra={"event": "scores_saved"})
         except Exception as e:
-            logger.error(f"Error saving high scores: {e}")
+            logger.error("Error saving high scores: %s", e, extra={"event": "scores_error"})
 
     def add_high_score(self, name, score):
         """Add a high score to the list and save"""
@@ -65,23 +105,32 @@ class TetrisServer:
             # Save to file
             self.save_high_scores()
             
-            logger.info(f"Added high score: {name} - {score}")
+            logger.info("Added high score: %s - %s", name, score, extra={"event": "high_score", "score": score})
 
     def start(self):
         """Start the server and listen for connections"""
         try:
-            self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-            self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
-            self.server_socket.bind((self.host, self.port))
-            self.server_socket.listen(5)
+            self.server_socket = self.create_server_socket()
             self.running = True
+            for exporter in self.exporters:
+                exporter.start()
+            
+            if self.idle_timeout:
+                heartbeat_thread = threading.Thread(target=self.run_heartbeats)
+                heartbeat_thread.daemon = True
+                heartbeat_thread.start()
             
-            logger.info(f"Server started on {self.host}:{self.port}")
+            broadcast_thread = threading.Thread(target=self.run_spectator_broadcast)
+            broadcast_thread.daemon = True
+            broadcast_thread.start()
+            
+            logger.info("Server started on %s:%s", self.host, self.port, extra={"event": "server_started"})
             
             # Start accepting connections
             while self.running:
                 client_socket, addr = self.server_socket.accept()
-                logger.info(f"New connection from {addr}")
+                self.metrics.count("connections.accepted")
+                logger.info("New connection from %s", addr, extra={"event": "connect"})
                 
                 # Start a new thread to handle this client
                 client_thread = threading.Thread(target=self.handle_client, args=(client_socket, addr))
@@ -89,10 +138,18 @@ class TetrisServer:
                 client_thread.start()
                 
         except Exception as e:
-            logger.error(f"Server error: {e}")
+            logger.error("Server error: %s", e, extra={"event": "server_error"})
         finally:
             self.stop()
     
+    def create_server_socket(self):
+        """Create the bound, listening server socket"""
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server_socket.bind((self.host, self.port))
+        server_socket.listen(socket.SOMAXCONN)
+        return server_socket
+    
     def stop(self):
         """Stop the server and close all connections"""
         self.running = False
@@ -115,7 +172,10 @@ class TetrisServer:
         # Save high scores
         self.save_high_scores()
         
-        logger.info("Server stopped")
+        for exporter in self.exporters:
+            exporter.stop()
+        
+        logger.info("Server stopped", extra={"event": "server_stopped"})
     
     def handle_client(self, client_socket, addr):
         """Handle communication with a client"""
@@ -123,31 +183,68 @@ class TetrisServer:
         
         try:
             # Add client to clients dictionary
+            client_info = {
+                "socket": client_socket,
+                "name": f"Player_{client_id[:8]}",
+                "opponent": None,
+                "game_state": {
+                    "grid": [],
+                    "score": 0
+                },
+                "mode": "unknown",  # Will be set when client sends join message
+                "last_seen": time.perf_counter(),
+                "ping_sent": None
+            }
             with self.lock:
-                self.clients[client_id] = {
-                    "socket": client_socket,
-                    "name": f"Player_{client_id[:8]}",
-                    "opponent": None,
-                    "game_state": {
-                        "grid": [],
-                        "score": 0
-                    },
-                    "mode": "unknown"  # Will be set when client sends join message
-                }
+                self.clients[client_id] = client_info
+            if self.idle_timeout:
+                with self.heartbeat_lock:
+                    self.heartbeats.schedule(self.ping_interval, client_id)
             
-            # Handle client messages
-            while self.running:
+            # Handle client messages; one recv() can hold several messages or part of one
+            decoder = json.JSONDecoder()
+            buffer = ""
+            limits = ClientLimits()
+            oversize = False
+            while self.running and not oversize:
                 data = client_socket.recv(4096)
                 if not data:
                     break
                 
-                self.process_message(client_id, data)
+                self.metrics.count("bytes.in", len(data))
+                client_info["last_seen"] = time.perf_counter()
+                buffer += data.decode()
+                while True:
+                    buffer = buffer.lstrip()
+                    if not buffer:
+                        break
+                    try:
+                        message, end = decoder.raw_decode(buffer)
+                    except json.JSONDecodeError:
+                        # Incomplete; anything this long is not a message a client would send
+                        oversize = len(buffer) > MAX_FRAME_SIZE
+                        break
+                    buffer = buffer[end:]
+                    if end > MAX_FRAME_SIZE:
+                        oversize = True
+                        break
+                    if self.admit_message(client_id, limits, message):
+                        self.process_message(client_id, message)
+            
+            if oversize:
+                self.metrics.count("dropped.oversize")
+                logger.warning("Client %s sent a message over %d bytes, disconnecting", client_id, MAX_FRAME_SIZE,
+                               extra={"event": "oversize", "client": client_id})
                 
         except Exception as e:
-            logger.error(f"Error handling client {client_id}: {e}")
+            logger.error("Error handling client %s: %s", client_id, e, extra={"event": "client_error", "client": client_id})
         finally:
             self.handle_client_disconnect(client_id)
     
+    def unsent_bytes(self):
+        """Outbound queue depth: bytes written to client sockets that the kernel has not sent yet"""
+        return sum(unsent_bytes(client["socket"]) for client in list(self.clients.values()))
+    
     def handle_client_disconnect(self, client_id):
         """Handle client disconnection"""
         with self.lock:
@@ -155,35 +252,60 @@ class TetrisServer:
                 # Get opponent ID before removing client
                 opponent_id = self.clients[client_id].get("opponent")
                 
-                # Close socket and remove client
+                # Close socket and remove client; shutdown wakes a handler thread blocked in recv()
+                client_socket = self.clients[client_id]["socket"]
+                try:
+                    client_socket.shutdown(socket.SHUT_RDWR)
+                except:
+                    pass
                 try:
-                    self.clients[client_id]["socket"].close()
+                    client_socket.close()
                 except:
                     pass
                 
                 # If this client was waiting for an opponent, clear waiting player
-                if self.waiting_player == client_id:
-                    self.waiting_player = None
+                self.cancel_matchmaking(client_id)
+                self.stop_spectating(client_id)
                 
                 # Notify opponent of disconnection if in multiplayer mode
                 if opponent_id and opponent_id in self.clients:
                     self.send_message(opponent_id, {
                         "type": "opponent_disconnected"
                     })
-                    
-                    # Reset opponent's opponent
-                    self.clients[opponent_id]["opponent"] = None
+                
+                # Reset opponent's opponent
+                self.end_match(client_id)
                 
                 # Remove client
                 del self.clients[client_id]
                 
-                logger.info(f"Client {client_id} disconnected")
+                logger.info("Client %s disconnected", client_id, extra={"event": "disconnect", "client": client_id})
     
-    def process_message(self, client_id, data):
-        """Process a message from a client"""
+    def admit_message(self, client_id, limits, message):
+        """Rate limit and validate a decoded message before process_message sees it. Called without self.lock"""
+        message_type = message.get("type") if type(message) is dict else None
+        if message_type not in self.MESSAGE_TYPES:
+            self.metrics.count("dropped.unknown")
+            return False
+        
+        if not limits.allow(message_type):
+            self.metrics.count(f"dropped.throttled.{message_type}")
+            logger.warning("Throttled %s from client %s", message_type, client_id,
+                           extra={"event": "throttled", "client": client_id})
+            return False
+        
+        if message_type == "grid_update" and not valid_grid_update(message):
+            self.metrics.count("dropped.invalid.grid_update")
+            logger.warning("Invalid grid_update from client %s", client_id,
+                           extra={"event": "invalid_message", "client": client_id})
+            return False
+        return True
+    
+    def process_message(self, client_id, message):
+        """Process a decoded message from a client"""
+        start = time.perf_counter()
+        message_type = message.get("type")
         try:
-            message = json.loads(data.decode())
-            message_type = message.get("type")
             
             if message_type == "join":
                 self.handle_join(client_id, message)
@@ -199,11 +321,29 @@ class TetrisServer:
             
             elif message_type == "ready_for_new_game":
                 self.handle_ready_for_new_game(client_id)
+            
+            elif message_type == "leave_game":
+                self.handle_leave_game(client_id)
+            
+            elif message_type == "pong":
+                self.handle_pong(client_id, message)
+            
+            elif message_type == "list_matches":
+                self.handle_list_matches(client_id)
+            
+            elif message_type == "spectate":
+                self.handle_spectate(client_id, message)
+            
+            elif message_type == "stop_spectating":
+                with self.lock:
+                    self.stop_spectating(client_id)
                 
-        except json.JSONDecodeError:
-            logger.error(f"Invalid JSON from client {client_id}")
         except Exception as e:
-            logger.error(f"Error processing message from client {client_id}: {e}")
+            logger.error("Error processing message from client %s: %s", client_id, e, extra={"event": "message_error", "client": client_id})
+        finally:
+            label = message_type if message_type in self.MESSAGE_TYPES else "other"
+            self.metrics.count(f"messages.in.{label}")
+            self.metrics.observe(f"handler.{label}", time.perf_counter() - start)
     
     def handle_join(self, client_id, message):
         """Handle a join request from a client"""
@@ -212,9 +352,17 @@ class TetrisServer:
             if "name" in message:
                 self.clients[client_id]["name"] = message["name"]
             
+            # Compress everything sent from here on if asked; the acknowledgement itself goes out plain
+            client_socket = self.clients[client_id]["socket"]
+            if message.get("compression") == "zlib" and isinstance(client_socket, socket.socket):
+                client_socket.sendall(COMPRESSION_ACK)
+                self.clients[client_id]["socket"] = CompressedSocket(client_socket)
+                self.metrics.count("connections.compressed")
+            
             # Update game mode
             game_mode = message.get("mode", "single")
             self.clients[client_id]["mode"] = game_mode
+            self.stop_spectating(client_id)
             
             # Send player ID back to client
             self.send_message(client_id, {
@@ -230,37 +378,10 @@ class TetrisServer:
             
             # If multiplayer mode, handle matchmaking
             if game_mode == "multiplayer":
-                # Check if there's a waiting player
-                if self.waiting_player and self.waiting_player in self.clients:
-                    # Match with waiting player
-                    opponent_id = self.waiting_player
-                    
-                    # Update opponent references
-                    self.clients[client_id]["opponent"] = opponent_id
-                    self.clients[opponent_id]["opponent"] = client_id
-                    
-                    # Clear waiting player
-                    self.waiting_player = None
-                    
-                    # Notify both players of game start
-                    self.send_message(client_id, {
-                        "type": "game_start",
-                        "opponent_name": self.clients[opponent_id]["name"]
-                    })
-                    
-                    self.send_message(opponent_id, {
-                        "type": "game_start",
-                        "opponent_name": self.clients[client_id]["name"]
-                    })
-                    
-                    logger.info(f"Started multiplayer game between {self.clients[client_id]['name']} and {self.clients[opponent_id]['name']}")
-                else:
-                    # Become the waiting player
-                    self.waiting_player = client_id
-                    logger.info(f"{self.clients[client_id]['name']} is waiting for an opponent")
+                self.start_matchmaking(client_id)
             else:
                 # Single player mode
-                logger.info(f"{self.clients[client_id]['name']} started a single player game")
+                logger.info("%s started a single player game", self.clients[client_id]['name'], extra={"event": "single_start", "client": client_id})
     
     def handle_grid_update(self, client_id, message):
         """Handle a grid update from a client"""
@@ -270,16 +391,27 @@ class TetrisServer:
                 self.clients[client_id]["game_state"]["grid"] = message["grid"]
                 self.clients[client_id]["game_state"]["score"] = message["score"]
                 
+                stream = self.streams.get(self.clients[client_id].get("match"))
+                if stream:
+                    stream.update(client_id, message["grid"], message["score"])
+                
                 # If in multiplayer mode, forward update to opponent
                 game_mode = message.get("mode", self.clients[client_id].get("mode", "single"))
                 if game_mode == "multiplayer":
                     opponent_id = self.clients[client_id].get("opponent")
                     if opponent_id and opponent_id in self.clients:
-                        self.send_message(opponent_id, {
+                        update = {
                             "type": "opponent_update",
                             "grid": message["grid"],
                             "score": message["score"]
-                        })
+                        }
+
+                        # Sender clock and falling piece, used by the opponent to interpolate
+                        for key in ("t", "piece", "fall_speed"):
+                            if key in message:
+                                update[key] = message[key]
+
+                        self.send_message(opponent_id, update)
     
     def handle_clear_lines(self, client_id, message):
         """Handle a line clear notification from a client"""
@@ -297,7 +429,8 @@ class TetrisServer:
                             "lines": lines_cleared
                         })
                         
-                        logger.info(f"{self.clients[client_id]['name']} cleared {lines_cleared} lines, sending to {self.clients[opponent_id]['name']}")
+                        logger.info("%s cleared %s lines, sending to %s", self.clients[client_id]['name'], lines_cleared,
+                                    self.clients[opponent_id]['name'], extra={"event": "clear_lines", "client": client_id})
     
     def handle_game_over(self, client_id, message):
         """Handle a game over notification from a client"""
@@ -331,7 +464,8 @@ class TetrisServer:
                             "winner": opponent_id
                         })
                         
-                        logger.info(f"Multiplayer game over - {self.clients[opponent_id]['name']} wins over {self.clients[client_id]['name']}")
+                        logger.info("Multiplayer game over - %s wins over %s", self.clients[opponent_id]['name'],
+                                    self.clients[client_id]['name'], extra={"event": "game_over", "client": client_id})
                         
                         # Send updated high scores to opponent too
                         self.send_message(opponent_id, {
@@ -340,11 +474,11 @@ class TetrisServer:
                         })
                         
                         # Reset opponents
-                        self.clients[client_id]["opponent"] = None
-                        self.clients[opponent_id]["opponent"] = None
+                        self.end_match(client_id)
                 else:
                     # Single player game over
-                    logger.info(f"Single player game over - {self.clients[client_id]['name']} scored {score}")
+                    logger.info("Single player game over - %s scored %s", self.clients[client_id]['name'], score,
+                                extra={"event": "single_game_over", "client": client_id})
     
     def handle_ready_for_new_game(self, client_id):
         """Handle a client ready for a new game after game over"""
@@ -353,44 +487,671 @@ class TetrisServer:
                 game_mode = self.clients[client_id].get("mode", "single")
                 
                 if game_mode == "multiplayer":
-                    # Check if there's a waiting player
-                    if self.waiting_player and self.waiting_player in self.clients and self.waiting_player != client_id:
-                        # Match with waiting player
-                        opponent_id = self.waiting_player
-                        
-                        # Update opponent references
-                        self.clients[client_id]["opponent"] = opponent_id
-                        self.clients[opponent_id]["opponent"] = client_id
-                        
-                        # Clear waiting player
-                        self.waiting_player = None
-                        
-                        # Notify both players of game start
-                        self.send_message(client_id, {
-                            "type": "game_start",
-                            "opponent_name": self.clients[opponent_id]["name"]
-                        })
-                        
-                        self.send_message(opponent_id, {
-                            "type": "game_start",
-                            "opponent_name": self.clients[client_id]["name"]
-                        })
-                        
-                        logger.info(f"Started new multiplayer game between {self.clients[client_id]['name']} and {self.clients[opponent_id]['name']}")
-                    else:
-                        # Become the waiting player
-                        self.waiting_player = client_id
-                        logger.info(f"{self.clients[client_id]['name']} is waiting for an opponent")
+                    self.start_matchmaking(client_id)
+    
+    def handle_leave_game(self, client_id):
+        """Handle a client leaving its game but keeping the connection for the next one"""
+        with self.lock:
+            if client_id in self.clients:
+                self.cancel_matchmaking(client_id)
+                
+                # Tell the opponent, as if the player had disconnected
+                opponent_id = self.clients[client_id].get("opponent")
+                if opponent_id and opponent_id in self.clients:
+                    self.send_message(opponent_id, {
+                        "type": "opponent_disconnected"
+                    })
+                self.end_match(client_id)
+                
+                logger.info("%s left the game", self.clients[client_id]['name'], extra={"event": "leave", "client": client_id})
+    
+    def handle_pong(self, client_id, message):
+        """Handle a client's answer to a ping, which echoes the ping's send time"""
+        with self.lock:
+            client = self.clients.get(client_id)
+            if client and client["ping_sent"] is not None:
+                rtt = time.perf_counter() - message.get("t", client["ping_sent"])
+                client["ping_sent"] = None
+                client["rtt"] = rtt
+                self.metrics.observe("rtt", rtt)
+    
+    def run_heartbeats(self):
+        """Heartbeat thread - advances the timer wheel and checks the clients that are due"""
+        tick = self.heartbeats.tick
+        next_tick = time.perf_counter() + tick
+        while self.running:
+            now = time.perf_counter()
+            if now < next_tick:
+                time.sleep(next_tick - now)
+                continue
+            
+            # Catch up on every tick that has passed since the last one
+            due = []
+            with self.heartbeat_lock:
+                while next_tick <= now:
+                    due.extend(self.heartbeats.advance())
+                    next_tick += tick
+            
+            for client_id in due:
+                delay = self.check_heartbeat(client_id, now)
+                if delay is not None:
+                    with self.heartbeat_lock:
+                        self.heartbeats.schedule(delay, client_id)
+    
+    def check_heartbeat(self, client_id, now):
+        """
+        Ping a client that has gone quiet, or disconnect it once it has been silent for idle_timeout.
+        
+        Returns:
+            float: Seconds until the client should be checked again, or None once it is gone
+        """
+        with self.lock:
+            client = self.clients.get(client_id)
+            if client is None:
+                return None
+            
+            idle = now - client["last_seen"]
+            if idle >= self.idle_timeout:
+                logger.info("Client %s silent for %.1fs, disconnecting", client_id, idle,
+                            extra={"event": "idle_reaped", "client": client_id})
+                self.metrics.count("clients.reaped")
+                self.handle_client_disconnect(client_id)
+                return None
+            
+            if idle < self.ping_interval:
+                return self.ping_interval - idle
+            
+            if client["ping_sent"] is None:
+                client["ping_sent"] = now
+                self.send_message(client_id, {
+                    "type": "ping",
+                    "t": now
+                })
+            return min(self.ping_interval, self.idle_timeout - idle)
+    
+    def start_matchmaking(self, client_id):
+        """Pair a multiplayer client with the waiting player, or make it wait. Called with self.lock held"""
+        self.clients[client_id]["waiting_since"] = time.perf_counter()
+        
+        # A returning client may already be the waiting player
+        if self.waiting_player and self.waiting_player in self.clients and self.waiting_player != client_id:
+            # Match with waiting player
+            opponent_id = self.waiting_player
+            self.waiting_player = None
+            self.start_match(client_id, opponent_id)
+            self.start_match(opponent_id, client_id)
+            logger.info("Started multiplayer game between %s and %s", self.clients[client_id]['name'],
+                        self.clients[opponent_id]['name'], extra={"event": "match", "client": client_id})
+        else:
+            # Become the waiting player
+            self.waiting_player = client_id
+            logger.info("%s is waiting for an opponent", self.clients[client_id]['name'], extra={"event": "waiting", "client": client_id})
+    
+    def cancel_matchmaking(self, client_id):
+        """Stop a client waiting for an opponent. Called with self.lock held"""
+        if self.waiting_player == client_id:
+            self.waiting_player = None
+    
+    def start_match(self, client_id, opponent_id):
+        """Set a client's opponent and tell the client its game has started. Called with self.lock held"""
+        self.clients[client_id]["opponent"] = opponent_id
+        waiting_since = self.clients[client_id].pop("waiting_since", None)
+        if waiting_since is not None:
+            self.metrics.observe("matchmaking.wait", time.perf_counter() - waiting_since)
+        self.send_message(client_id, {
+            "type": "game_start",
+            "opponent_name": self.clients[opponent_id]["name"]
+        })
+        
+        # Once both sides of a match between two players on this server are set, it can be watched
+        opponent = self.clients[opponent_id]
+        if "remote" not in opponent and opponent.get("opponent") == client_id and "match" not in opponent:
+            match_id = self.new_match_id()
+            self.streams[match_id] = MatchStream(match_id, [(client_id, self.clients[client_id]["name"]),
+                                                            (opponent_id, opponent["name"])])
+            opponent["match"] = self.clients[client_id]["match"] = match_id
+    
+    def new_match_id(self):
+        """Return an identifier for a new watchable match"""
+        return uuid.uuid4().hex[:8]
+    
+    def missing_match_reason(self, match_id):
+        """Why a match id has no spectator stream on this server"""
+        return "not_found"
+    
+    def end_match(self, client_id):
+        """Clear the opponent links of a client and its opponent. Called with self.lock held"""
+        opponent_id = self.clients[client_id].get("opponent")
+        self.clients[client_id]["opponent"] = None
+        match_id = self.clients[client_id].pop("match", None)
+        if opponent_id and opponent_id in self.clients:
+            self.clients[opponent_id]["opponent"] = None
+            self.clients[opponent_id].pop("match", None)
+        
+        # The broadcast thread tells the spectators and drops the stream
+        if match_id in self.streams:
+            self.streams[match_id].ended = True
+    
+    def handle_list_matches(self, client_id):
+        """Send a client the matches it can watch"""
+        with self.lock:
+            self.send_message(client_id, {
+                "type": "matches",
+                "matches": [stream.summary() for stream in self.streams.values() if not stream.ended]
+            })
+    
+    def handle_spectate(self, client_id, message):
+        """Subscribe a client to a match's spectator stream; the broadcast thread sends it a keyframe"""
+        with self.lock:
+            if client_id not in self.clients:
+                return
+            
+            match_id = message.get("match")
+            stream = self.streams.get(match_id)
+            if stream is None or stream.ended:
+                self.send_message(client_id, {
+                    "type": "spectate_end",
+                    "match": match_id,
+                    "reason": "ended" if stream else self.missing_match_reason(match_id)
+                })
+                return
+            
+            self.stop_spectating(client_id)
+            stream.subscribe(client_id, self.clients[client_id]["socket"])
+            self.clients[client_id]["spectating"] = match_id
+    
+    def stop_spectating(self, client_id):
+        """Unsubscribe a client from the match it is watching. Called with self.lock held"""
+        stream = self.streams.get(self.clients[client_id].pop("spectating", None))
+        if stream:
+            stream.unsubscribe(client_id)
+    
+    def run_spectator_broadcast(self):
+        """Broadcast thread - sends each watched match's shared frame to its spectators spectate_rate times a second"""
+        interval = 1 / self.spectate_rate
+        next_tick = time.perf_counter()
+        while self.running:
+            next_tick += interval
+            delay = next_tick - time.perf_counter()
+            if delay > 0:
+                time.sleep(delay)
+            else:
+                # Fell behind, skip the missed ticks
+                next_tick = time.perf_counter()
+            
+            # Encode under the lock, send outside it
+            broadcasts = []
+            with self.lock:
+                for match_id, stream in list(self.streams.items()):
+                    if stream.ended:
+                        end = json.dumps({"type": "spectate_end", "match": match_id, "reason": "ended"}).encode()
+                        broadcasts.append((stream, end, None, [(spectator_id, sock, False)
+                                                               for spectator_id, sock in stream.spectators.items()]))
+                        for spectator_id in stream.spectators:
+                            if spectator_id in self.clients:
+                                self.clients[spectator_id].pop("spectating", None)
+                        del self.streams[match_id]
+                    elif stream.spectators:
+                        broadcasts.append((stream, *stream.tick()))
+            
+            # Finish frames a spectator's socket buffer only took part of
+            for sock in list(self.unflushed):
+                try:
+                    if sock.flush(SEND_NONBLOCKING):
+                        self.unflushed.discard(sock)
+                except OSError:
+                    self.unflushed.discard(sock)
+            
+            sent = 0
+            compressed = {}  # Each frame is compressed at most once for every compressed spectator
+            for stream, delta, keyframe, targets in broadcasts:
+                for spectator_id, sock, wants_keyframe in targets:
+                    data = keyframe if wants_keyframe else delta
+                    if data and self.send_spectator_frame(stream, spectator_id, sock, data, compressed):
+                        sent += len(data)
+            if sent:
+                self.metrics.count("bytes.out", sent)
+                self.metrics.count("spectator.frames", len(broadcasts))
+    
+    def send_spectator_frame(self, stream, spectator_id, sock, data, compressed):
+        """
+        Send a frame without waiting on a slow spectator.
+        
+        A spectator whose socket buffer is full skips the frame and gets a keyframe once it drains;
+        one that took only part of a frame cannot continue the shared stream and is disconnected.
+        A compressed socket takes a frame whole and keeps what it could not write, which the
+        broadcast thread finishes on later ticks. Its frames are compressed once per tick, into
+        compressed ({frame: compressed frame}), and shared with the other compressed spectators.
+        
+        Returns:
+            bool: Whether the whole frame was sent
+        """
+        if self.clients.get(spectator_id, {}).get("socket") is not sock:
+            return False  # Gone, or switched to compression since it subscribed
+        try:
+            if isinstance(sock, CompressedSocket):
+                if data not in compressed:
+                    compressed[data] = self.frame_compressor.compress(data)
+                sent = sock.send_frame(data, compressed[data], SEND_NONBLOCKING)
+            else:
+                sent = sock.send(data, SEND_NONBLOCKING)
+        except BlockingIOError:
+            sent = 0
+        except OSError:
+            self.handle_client_disconnect(spectator_id)
+            return False
+        
+        if sent == len(data):
+            if getattr(sock, "pending", None):
+                self.unflushed.add(sock)
+            return True
+        if sent == 0:
+            self.metrics.count("spectators.lagging")
+            with self.lock:
+                if spectator_id in stream.spectators:
+                    stream.need_keyframe.add(spectator_id)
+        else:
+            self.metrics.count("spectators.dropped")
+            self.handle_client_disconnect(spectator_id)
+        return False
     
     def send_message(self, client_id, message):
         """Send a message to a client"""
         try:
             if client_id in self.clients:
-                self.clients[client_id]["socket"].send(json.dumps(message).encode())
+                data = json.dumps(message).encode()
+                self.clients[client_id]["socket"].sendall(data)
+                self.metrics.count("bytes.out", len(data))
+                self.metrics.count(f"messages.out.{message['type']}")
         except Exception as e:
-            logger.error(f"Error sending message to client {client_id}: {e}")
+            logger.error("Error sending message to client %s: %s", client_id, e, extra={"event": "send_error", "client": client_id})
             self.handle_client_disconnect(client_id)
 
+class RelaySocket:
+    """Stands in for the socket of a client on another worker; data sent to it is relayed there"""
+    
+    def __init__(self, worker, peer, client_id):
+        self.worker = worker
+        self.peer = peer
+        self.client_id = client_id
+    
+    def sendall(self, data):
+        self.worker.peer_link(self.peer).send({"op": "deliver", "to": self.client_id}, data)
+    
+    def shutdown(self, how):
+        pass
+    
+    def close(self):
+        pass
+
+class ClusterWorker(TetrisServer):
+    """
+    One worker process of a multi-process server.
+    
+    Workers share the listen port through SO_REUSEPORT, so the kernel spreads
+    connections across them. Matchmaking and high scores go through the hub
+    in the launcher process. An opponent on another worker is added to
+    self.clients as a stub whose socket relays to that worker over a Unix
+    socket, or over shared memory rings when the launcher sets them up, so
+    the message handlers work exactly as in a single process.
+    
+    Spectator streams stay on the worker that runs both players of a match.
+    Match ids carry that worker's index, so a spectate request reaching
+    another worker is refused with reason "other_worker" instead of "not_found".
+    """
+    
+    def __init__(self, index, run_dir, host='0.0.0.0', port=5555, scores_file="high_scores.json", channels=None,
+                 ping_interval=5.0, idle_timeout=15.0, spectate_rate=5.0):
+        super().__init__(host, port, scores_file, ping_interval, idle_timeout, spectate_rate)
+        self.index = index
+        self.run_dir = run_dir
+        self.hub = None
+        self.channels = channels  # {(from worker, to worker): ShmChannel}, or None to relay over Unix sockets
+        self.peers = {}  # {worker index: FramedSocket or ShmChannel}
+        self.peer_lock = threading.Lock()
+    
+    def create_server_socket(self):
+        """Create a listening socket that shares the port with the other workers"""
+        server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        server_socket.bind((self.host, self.port))
+        server_socket.listen(socket.SOMAXCONN)
+        return server_socket
+    
+    def start(self):
+        """Connect to the hub, listen for the other workers and serve clients"""
+        if self.channels:
+            for (source, target), channel in self.channels.items():
+                if source == self.index:
+                    self.peers[target] = channel
+                elif target == self.index:
+                    peer_thread = threading.Thread(target=self.read_link, args=(channel,))
+                    peer_thread.daemon = True
+                    peer_thread.start()
+        else:
+            peer_server = listen_unix(worker_socket_path(self.run_dir, self.index))
+            accept_thread = threading.Thread(target=self.accept_peers, args=(peer_server,))
+            accept_thread.daemon = True
+            accept_thread.start()
+        
+        self.hub = connect_unix(os.path.join(self.run_dir, "hub.sock"))
+        self.hub.send({"op": "hello", "worker": self.index})
+        hub_thread = threading.Thread(target=self.read_link, args=(self.hub,))
+        hub_thread.daemon = True
+        hub_thread.start()
+        
+        logger.info("Worker %d started", self.index, extra={"event": "worker_started"})
+        super().start()
+    
+    def accept_peers(self, peer_server):
+        """Accept relay connections from the other workers"""
+        while True:
+            peer_socket, _ = peer_server.accept()
+            peer_thread = threading.Thread(target=self.read_link, args=(FramedSocket(peer_socket),))
+            peer_thread.daemon = True
+            peer_thread.start()
+    
+    def peer_link(self, index):
+        """Return the relay connection to another worker, connecting on first use"""
+        with self.peer_lock:
+            link = self.peers.get(index)
+            if link is None:
+                link = self.peers[index] = connect_unix(worker_socket_path(self.run_dir, index))
+            return link
+    
+    def read_link(self, link):
+        """Apply frames from the hub or another worker until it closes"""
+        while True:
+            frame = link.recv()
+            if frame is None:
+                if link is self.hub and self.running:
+                    # The launcher has gone away
+                    logger.info("Hub closed, stopping worker %d", self.index, extra={"event": "hub_closed"})
+                    self.stop()
+                break
+            
+            header, payload = frame
+            try:
+                op = header["op"]
+                if op == "deliver":
+                    self.handle_deliver(header["to"], payload)
+                elif op == "match":
+                    self.handle_match(header)
+                elif op == "unpair":
+                    self.handle_unpair(header)
+                elif op == "high_scores":
+                    with self.lock:
+                        self.high_scores = header["scores"]
+            except Exception as e:
+                logger.error("Error handling %s from the cluster: %s", header.get('op'), e, extra={"event": "cluster_error"})
+    
+    def handle_deliver(self, client_id, payload):
+        """
+        Send an already-encoded message relayed from another worker to a local client.
+        Over shared memory the payload is a view into the ring slot, valid until the next frame.
+        """
+        with self.lock:
+            client = self.clients.get(client_id)
+            if client and "remote" not in client:
+                try:
+                    client["socket"].sendall(payload)
+                    # Bytes were counted by the worker that encoded the message
+                    self.metrics.count("relay.delivered")
+                except Exception as e:
+                    logger.error("Error sending message to client %s: %s", client_id, e, extra={"event": "send_error", "client": client_id})
+                    self.handle_client_disconnect(client_id)
+    
+    def handle_match(self, header):
+        """Start a game the hub has matched for a local client"""
+        with self.lock:
+            client_id = header["client"]
+            opponent_id = header["opponent"]
+            opponent_worker = header["opponent_worker"]
+            
+            if client_id not in self.clients:
+                # The client left while the hub was matching, free the opponent. This goes
+                # through the hub so it arrives after the opponent's own match.
+                self.hub.send({
+                    "op": "unpair",
+                    "client": opponent_id,
+                    "opponent": client_id,
+                    "worker": opponent_worker,
+                    "disconnected": True
+                })
+                return
+            
+            if opponent_worker != self.index:
+                self.clients[opponent_id] = {
+                    "socket": RelaySocket(self, opponent_worker, opponent_id),
+                    "name": header["opponent_name"],
+                    "opponent": client_id,
+                    "game_state": {
+                        "grid": [],
+                        "score": 0
+                    },
+                    "mode": "multiplayer",
+                    "remote": opponent_worker
+                }
+            elif opponent_id not in self.clients:
+                # A local opponent left before the match arrived, look for another one
+                self.start_matchmaking(client_id)
+                return
+            
+            self.start_match(client_id, opponent_id)
+            logger.info("Started multiplayer game between %s and %s (worker %d)", self.clients[client_id]['name'],
+                        header['opponent_name'], opponent_worker, extra={"event": "match", "client": client_id})
+    
+    def handle_unpair(self, header):
+        """Clear a local client's side of a match ended on another worker"""
+        with self.lock:
+            client_id = header["client"]
+            opponent_id = header["opponent"]
+            client = self.clients.get(client_id)
+            if client and client["opponent"] == opponent_id:
+                if header.get("disconnected"):
+                    self.send_message(client_id, {
+                        "type": "opponent_disconnected"
+                    })
+                client["opponent"] = None
+            
+            if opponent_id in self.clients and "remote" in self.clients[opponent_id]:
+                del self.clients[opponent_id]
+    
+    def start_matchmaking(self, client_id):
+        """Ask the hub for an opponent from any worker. Called with self.lock held"""
+        self.clients[client_id]["waiting_since"] = time.perf_counter()
+        self.hub.send({
+            "op": "wait",
+            "client": client_id,
+            "name": self.clients[client_id]["name"],
+            "worker": self.index
+        })
+        logger.info("%s is waiting for an opponent", self.clients[client_id]['name'], extra={"event": "waiting", "client": client_id})
+    
+    def cancel_matchmaking(self, client_id):
+        """Stop a client waiting for an opponent. Called with self.lock held"""
+        self.hub.send({"op": "cancel", "client": client_id})
+    
+    def end_match(self, client_id):
+        """Clear both sides of a match, including an opponent on another worker. Called with self.lock held"""
+        opponent_id = self.clients[client_id].get("opponent")
+        super().end_match(client_id)
+        
+        opponent = self.clients.get(opponent_id) if opponent_id else None
+        if opponent and "remote" in opponent:
+            # Sent on the relay link, after any message already relayed to the opponent
+            self.peer_link(opponent["remote"]).send({
+                "op": "unpair",
+                "client": opponent_id,
+                "opponent": client_id
+            })
+            del self.clients[opponent_id]
+    
+    def new_match_id(self):
+        """Prefix match ids with the worker index, so any worker can tell where a match is streamed"""
+        return f"{self.index}-{super().new_match_id()}"
+    
+    def missing_match_reason(self, match_id):
+        """
+        Spectator streams are not relayed between workers: a match on another
+        worker can only be watched by a connection the kernel gave to that worker.
+        """
+        worker, _, _ = str(match_id).partition("-")
+        if worker.isdigit() and int(worker) != self.index:
+            return "other_worker"
+        return super().missing_match_reason(match_id)
+    
+    def add_high_score(self, name, score):
+        """Add a high score locally and send it to the hub, which keeps the shared list"""
+        super().add_high_score(name, score)
+        self.hub.send({"op": "score", "name": name, "score": score})
+    
+    def save_high_scores(self):
+        """The hub saves the shared high scores file"""
+        pass
+
+class ClusterHub:
+    """
+    Matchmaking and high scores shared by the workers of a multi-process server.
+    
+    Runs in the launcher process. Workers connect over a Unix socket; the hub
+    pairs waiting players from any worker and tells both workers about the
+    match, and merges every worker's high scores into one saved list.
+    """
+    
+    def __init__(self, run_dir, scores_file="high_scores.json"):
+        self.server_socket = listen_unix(os.path.join(run_dir, "hub.sock"))
+        # Only used for its high score list and file handling
+        self.scores = TetrisServer(scores_file=scores_file)
+        self.workers = {}  # {worker index: FramedSocket}
+        self.waiting = None  # "wait" frame of the player waiting for an opponent
+        self.lock = threading.Lock()
+    
+    def serve_forever(self):
+        """Accept worker connections"""
+        while True:
+            worker_socket, _ = self.server_socket.accept()
+            worker_thread = threading.Thread(target=self.handle_worker, args=(FramedSocket(worker_socket),))
+            worker_thread.daemon = True
+            worker_thread.start()
+    
+    def handle_worker(self, link):
+        """Apply frames from one worker until it closes"""
+        while True:
+            frame = link.recv()
+            if frame is None:
+                break
+            
+            header, _ = frame
+            try:
+                with self.lock:
+                    self.handle_frame(link, header)
+            except Exception as e:
+                logger.error("Error handling %s from a worker: %s", header.get('op'), e, extra={"event": "hub_error"})
+    
+    def handle_frame(self, link, header):
+        op = header["op"]
+        if op == "hello":
+            self.workers[header["worker"]] = link
+        
+        elif op == "wait":
+            waiting = self.waiting
+            if waiting and waiting["client"] != header["client"]:
+                self.waiting = None
+                self.send_match(header, waiting)
+                self.send_match(waiting, header)
+            else:
+                self.waiting = header
+        
+        elif op == "cancel":
+            if self.waiting and self.waiting["client"] == header["client"]:
+                self.waiting = None
+        
+        elif op == "unpair":
+            self.workers[header["worker"]].send(header)
+        
+        elif op == "score":
+            self.scores.add_high_score(header["name"], header["score"])
+            for worker in self.workers.values():
+                worker.send({"op": "high_scores", "scores": self.scores.high_scores})
+    
+    def send_match(self, player, opponent):
+        self.workers[player["worker"]].send({
+            "op": "match",
+            "client": player["client"],
+            "opponent": opponent["client"],
+            "opponent_name": opponent["name"],
+            "opponent_worker": opponent["worker"]
+        })
+
+def worker_socket_path(run_dir, index):
+    return os.path.join(run_dir, f"worker-{index}.sock")
+
+def add_metrics_exporters(server, admin_port=None, metrics_file=None, interval=10.0):
+    """Attach the metrics exporters selected on the command line"""
+    if admin_port:
+        server.exporters.append(TextEndpoint(server.metrics, port=admin_port))
+    if metrics_file:
+        server.exporters.append(FileDump(server.metrics, metrics_file, interval))
+
+def run_worker(index, run_dir, host, port, scores_file, channels=None, admin_port=None, metrics_file=None,
+               metrics_interval=10.0, log_format="json", log_rate=20.0, ping_interval=5.0, idle_timeout=15.0,
+               spectate_rate=5.0):
+    """Worker process entry point; each worker exports its own metrics on admin_port + index"""
+    # The launcher's log listener thread is not carried over into this process
+    log_listener = setup_logging(json_lines=log_format == "json", rate=log_rate)
+    worker = ClusterWorker(index, run_dir, host, port, scores_file, channels, ping_interval, idle_timeout, spectate_rate)
+    if metrics_file:
+        root, ext = os.path.splitext(metrics_file)
+        metrics_file = f"{root}-{index}{ext}"
+    add_metrics_exporters(worker, admin_port + index if admin_port else None, metrics_file, metrics_interval)
+    try:
+        worker.start()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.stop()
+        log_listener.stop()
+
+def run_cluster(workers, host='0.0.0.0', port=5555, scores_file="high_scores.json", transport="uds", worker_options=None):
+    """
+    Run the hub in this process and the given number of worker processes sharing the port.
+    
+    transport selects how workers relay to each other: "uds" for Unix sockets,
+    "shm" for a pair of shared memory rings per direction between every two workers.
+    worker_options holds run_worker's metrics, logging, heartbeat and spectator arguments.
+    """
+    run_dir = tempfile.mkdtemp(prefix="tetris-server-")
+    hub = ClusterHub(run_dir, scores_file)
+    
+    channels = None
+    if transport == "shm":
+        channels = {(source, target): ShmChannel()
+                    for source in range(workers) for target in range(workers) if source != target}
+    
+    processes = []
+    for index in range(workers):
+        process = multiprocessing.Process(target=run_worker, args=(index, run_dir, host, port, scores_file, channels),
+                                          kwargs=worker_options or {})
+        process.daemon = True
+        process.start()
+        processes.append(process)
+    logger.info("Started %d workers on %s:%s", workers, host, port, extra={"event": "cluster_started"})
+    
+    # Stop the workers too when the launcher is terminated
+    signal.signal(signal.SIGTERM, lambda signum, frame: sys.exit(0))
+    try:
+        hub.serve_forever()
+    finally:
+        for process in processes:
+            process.terminate()
+        for process in processes:
+            process.join()
+        for channel in (channels or {}).values():
+            channel.unlink()
+        shutil.rmtree(run_dir, ignore_errors=True)
+
 if __name__ == "__main__":
     import argparse
     
@@ -399,14 +1160,48 @@ if __name__ == "__main__":
     parser.add_argument("--host", default="0.0.0.0", help="Host address to bind to")
     parser.add_argument("--port", type=int, default=5555, help="Port to bind to")
     parser.add_argument("--scores", default="high_scores.json", help="High scores file")
+    parser.add_argument("--workers", type=int, default=1, help="Worker processes sharing the port")
+    parser.add_argument("--transport", choices=["uds", "shm"], default="uds", help="Relay between workers over Unix sockets or shared memory")
+    parser.add_argument("--admin-port", type=int, help="Serve metrics as text on this local port (one port per worker)")
+    parser.add_argument("--metrics-file", help="Write a JSON metrics snapshot to this file periodically (one file per worker)")
+    parser.add_argument("--metrics-interval", type=float, default=10.0, help="Seconds between metrics file dumps")
+    parser.add_argument("--log-format", choices=["json", "text"], default="json", help="JSON lines or plain text log output")
+    parser.add_argument("--log-rate", type=float, default=20.0, help="Log records per second allowed for each event type")
+    parser.add_argument("--ping-interval", type=float, default=5.0, help="Seconds of client silence before a ping")
+    parser.add_argument("--idle-timeout", type=float, default=15.0, help="Seconds of client silence before disconnecting it, 0 to never")
+    parser.add_argument("--spectate-rate", type=float, default=5.0, help="Spectator frames per second for each watched match")
     args = parser.parse_args()
-    
-    # Start server
-    server = TetrisServer(args.host, args.port, args.scores)
+    worker_options = {
+        "admin_port": args.admin_port,
+        "metrics_file": args.metrics_file,
+        "metrics_interval": args.metrics_interval,
+        "log_format": args.log_format,
+        "log_rate": args.log_rate,
+        "ping_interval": args.ping_interval,
+        "idle_timeout": args.idle_timeout,
+        "spectate_rate": args.spectate_rate
+    }
+    log_listener = setup_logging(json_lines=args.log_format == "json", rate=args.log_rate)
     
     try:
-        server.start()
-    except KeyboardInterrupt:
-        print("Server stopped by user")
+        if args.workers > 1:
+            # Worker processes share the port, the hub runs in this one
+            try:
+                run_cluster(args.workers, args.host, args.port, args.scores, args.transport, worker_options)
+            except KeyboardInterrupt:
+                print("Server stopped by user")
+        else:
+            # Start server
+            server = TetrisServer(args.host, args.port, args.scores, args.ping_interval, args.idle_timeout,
+                                  args.spectate_rate)
+            add_metrics_exporters(server, args.admin_port, args.metrics_file, args.metrics_interval)
+            
+            try:
+                server.start()
+            except KeyboardInterrupt:
+                print("Server stopped by user")
+            finally:
+                server.stop()
     finally:
-        server.stop()
\ No newline at end of file
+        # Flush queued log records
+        log_listener.stop()
\ No newline at end of file
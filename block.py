@@ -1,6 +1,10 @@
 import pygame
 import random
 import time
+from collections import OrderedDict
+
+from frame_profiler import FrameProfiler
+from scaled_display import ScaledDisplay
 
 # 初始化Pygame
 pygame.init()
@@ -13,8 +17,9 @@ width = cols * block_size
 height = rows * block_size
 # 增加侧边预览区宽度
 sidebar_width = 150
-screen = pygame.display.set_mode((width + sidebar_width, height))
-pygame.display.set_caption("Tetris")
+# 画面先画到固定大小的画布上，再一次性缩放到可以调整大小的窗口
+display = ScaledDisplay((width + sidebar_width, height), "Tetris")
+screen = display.canvas
 
 # 方块颜色定义 (主色，亮色，暗色)
 colors = [
@@ -158,60 +163,187 @@ shapes = [
       [0, 1, 0, 0]]]
 ]
 
+# 用基本图形绘制一个带立体效果的方块（只在生成图集时使用）
+def draw_block(surface, rect_x, rect_y, color_id, size):
+    # 获取颜色元组
+    color_main = colors[color_id][0]
+    color_light = colors[color_id][1]
+    color_dark = colors[color_id][2]
+    
+    # 绘制主体
+    pygame.draw.rect(surface, 
+                     color_main, 
+                     (rect_x, rect_y,
+                      size, size))
+    
+    # 绘制高光（上方和左方）
+    pygame.draw.polygon(surface, 
+                        color_light,
+                        [(rect_x, rect_y),
+                         (rect_x+size-2, rect_y),
+                         (rect_x+size-2, rect_y+size-2),
+                         (rect_x, rect_y+size-2)])
+    
+    # 绘制阴影（右方和下方）
+    pygame.draw.polygon(surface, 
+                        color_dark,
+                        [(rect_x+size, rect_y),
+                         (rect_x+size, rect_y+size),
+                         (rect_x+2, rect_y+size),
+                         (rect_x+2, rect_y+2)])
+    
+    # 绘制内部亮点
+    pygame.draw.rect(surface, 
+                     color_light, 
+                     (rect_x + 4, rect_y + 4,
+                      size // 3, size // 3))
+
+# 绘制空格子 (深色背景上有细微网格)
+def draw_empty_cell(surface, rect_x, rect_y, size):
+    pygame.draw.rect(surface, 
+                     (20, 20, 20), 
+                     (rect_x, rect_y,
+                      size, size))
+    # 绘制网格线
+    pygame.draw.rect(surface, 
+                     (40, 40, 40), 
+                     (rect_x, rect_y,
+                      size, size),
+                     1)
+
+# 绘制落地位置虚线框的一个格子（只在生成图集时使用，surface需要带透明通道）
+def draw_ghost_tile(surface, rect_x, rect_y, color_id, size):
+    # 计算幽灵方块的颜色
+    color_main = colors[color_id][0]
+    # 创建一个更明显的颜色
+    ghost_color = (min(color_main[0]+50, 255), 
+                   min(color_main[1]+50, 255), 
+                   min(color_main[2]+50, 255))
+    
+    # 内缩值，使幽灵方块小一些但仍然明显
+    s = 3
+    
+    # 先绘制一个实心的半透明块作为背景（透明度50）
+    surface.fill(ghost_color + (50,), (rect_x+s, rect_y+s, size-2*s, size-2*s))
+    
+    # 绘制灰色外框，不再使用刺眼的白色
+    pygame.draw.rect(surface, 
+                    (180, 180, 180), 
+                    (rect_x+s, rect_y+s, size-2*s, size-2*s), 
+                    2)  # 线宽为2
+    
+    # 绘制内部彩色线条
+    pygame.draw.rect(surface, 
+                    ghost_color, 
+                    (rect_x+s+2, rect_y+s+2, size-2*s-4, size-2*s-4), 
+                    1)  # 线宽为1
+    
+    # 绘制角落标记，使用灰色而不是白色
+    corner_size = 4
+    corner_color = (160, 160, 160)  # 适中的灰色，不太刺眼
+    # 左上角
+    pygame.draw.line(surface, corner_color, 
+                    (rect_x+s, rect_y+s), 
+                    (rect_x+s+corner_size, rect_y+s), 2)
+    pygame.draw.line(surface, corner_color, 
+                    (rect_x+s, rect_y+s), 
+                    (rect_x+s, rect_y+s+corner_size), 2)
+    # 右上角
+    pygame.draw.line(surface, corner_color, 
+                    (rect_x+size-s, rect_y+s), 
+                    (rect_x+size-s-corner_size, rect_y+s), 2)
+    pygame.draw.line(surface, corner_color, 
+                    (rect_x+size-s, rect_y+s), 
+                    (rect_x+size-s, rect_y+s+corner_size), 2)
+    # 左下角
+    pygame.draw.line(surface, corner_color, 
+                    (rect_x+s, rect_y+size-s), 
+                    (rect_x+s+corner_size, rect_y+size-s), 2)
+    pygame.draw.line(surface, corner_color, 
+                    (rect_x+s, rect_y+size-s), 
+                    (rect_x+s, rect_y+size-s-corner_size), 2)
+    # 右下角
+    pygame.draw.line(surface, corner_color, 
+                    (rect_x+size-s, rect_y+size-s), 
+                    (rect_x+size-s-corner_size, rect_y+size-s), 2)
+    pygame.draw.line(surface, corner_color, 
+                    (rect_x+size-s, rect_y+size-s), 
+                    (rect_x+size-s, rect_y+size-s-corner_size), 2)
+
+# 方块图集：启动时（以及尺寸改变时）把每种颜色的方块预渲染到一张Surface上，
+# 绘制时只需要blit，不再每帧重复绘制多边形
+class BlockAtlas:
+    def __init__(self, size):
+        self.size = size
+        self.surface = pygame.Surface((size * len(colors), size))
+        self.rects = []
+        
+        for color_id in range(len(colors)):
+            # 每个方块单独绘制再拷贝进图集，避免阴影多出的一像素画到相邻方块上
+            tile = pygame.Surface((size, size))
+            if color_id == 0:
+                # 第0个位置存放空格子
+                draw_empty_cell(tile, 0, 0, size)
+            else:
+                draw_block(tile, 0, 0, color_id, size)
+            self.surface.blit(tile, (color_id * size, 0))
+            self.rects.append(pygame.Rect(color_id * size, 0, size, size))
+        
+        # 每种颜色的落地位置虚线框，带透明通道
+        self.ghost_tiles = [None]
+        for color_id in range(1, len(colors)):
+            tile = pygame.Surface((size, size), pygame.SRCALPHA)
+            draw_ghost_tile(tile, 0, 0, color_id, size)
+            self.ghost_tiles.append(tile)
+        
+        # 转换为显示格式，加快blit速度
+        if pygame.display.get_surface():
+            self.surface = self.surface.convert()
+            self.ghost_tiles = [tile and tile.convert_alpha() for tile in self.ghost_tiles]
+
+atlas = BlockAtlas(block_size)
+
+# 创建背景网格纹理
+def make_background():
+    background = pygame.Surface((width, height))
+    for y in range(0, height, block_size):
+        for x in range(0, width, block_size):
+            color = (15, 15, 15) if (x//block_size + y//block_size) % 2 == 0 else (25, 25, 25)
+            pygame.draw.rect(background, color, (x, y, block_size, block_size))
+    return background
+
 # 游戏板类
 class Board:
     def __init__(self):
         self.grid = [[0 for _ in range(cols)] for _ in range(rows)]
+        # 已落定方块的缓存图层，只在锁定方块和消行时更新
+        self.layer = None
+        # 每次锁定方块或消行后递增，用于判断缓存是否过期
+        self.version = 0
+        self.tops = None  # 每列最高方块所在的行
+    
+    def _build_layer(self):
+        """在背景纹理上绘制所有格子，生成缓存图层"""
+        self.layer = make_background()
+        if pygame.display.get_surface():
+            self.layer = self.layer.convert()
+        self._patch_cells([(x, y) for y in range(rows) for x in range(cols)])
+    
+    def _patch_cells(self, cells):
+        """把指定格子重新画到缓存图层上"""
+        tiles = atlas.rects
+        self.layer.blits([(atlas.surface, (x*block_size, y*block_size), tiles[self.grid[y][x]])
+                          for x, y in cells],
+                         False)
+    
+    def _check_layer(self):
+        if self.layer is None:
+            self._build_layer()
         
     def draw(self):
-        # 绘制游戏主区域
-        for y in range(rows):
-            for x in range(cols):
-                if self.grid[y][x] != 0:
-                    # 获取颜色元组
-                    color_main = colors[self.grid[y][x]][0]
-                    color_light = colors[self.grid[y][x]][1]
-                    color_dark = colors[self.grid[y][x]][2]
-                    
-                    # 绘制主体
-                    pygame.draw.rect(screen, 
-                                    color_main, 
-                                    (x*block_size, y*block_size,
-                                     block_size, block_size))
-                    
-                    # 绘制高光（上方和左方）
-                    pygame.draw.polygon(screen, 
-                                        color_light,
-                                        [(x*block_size, y*block_size),
-                                         ((x+1)*block_size-2, y*block_size),
-                                         ((x+1)*block_size-2, (y+1)*block_size-2),
-                                         (x*block_size, (y+1)*block_size-2)])
-                    
-                    # 绘制阴影（右方和下方）
-                    pygame.draw.polygon(screen, 
-                                        color_dark,
-                                        [((x+1)*block_size, y*block_size),
-                                         ((x+1)*block_size, (y+1)*block_size),
-                                         (x*block_size+2, (y+1)*block_size),
-                                         (x*block_size+2, y*block_size+2)])
-                    
-                    # 绘制内部亮点
-                    pygame.draw.rect(screen, 
-                                    color_light, 
-                                    (x*block_size + 4, y*block_size + 4,
-                                     block_size // 3, block_size // 3))
-                else:
-                    # 绘制空格子 (深色背景上有细微网格)
-                    pygame.draw.rect(screen, 
-                                    (20, 20, 20), 
-                                    (x*block_size, y*block_size,
-                                     block_size, block_size))
-                    # 绘制网格线
-                    pygame.draw.rect(screen, 
-                                    (40, 40, 40), 
-                                    (x*block_size, y*block_size,
-                                     block_size, block_size),
-                                    1)
+        # 绘制游戏主区域：直接使用缓存图层
+        self._check_layer()
+        screen.blit(self.layer, (0, 0))
 
         # 绘制游戏区域右侧边界线
         pygame.draw.line(screen, (128, 128, 128), 
@@ -230,8 +362,33 @@ class Board:
                         (pos_y >= 0 and self.grid[pos_y][pos_x])):
                         return True
         return False
+    
+    def first_block_below(self, x, y):
+        """返回第x列中位于y行下方的第一个方块所在行，没有则返回rows"""
+        if self.tops is None:
+            self.tops = [next((r for r in range(rows) if self.grid[r][c]), rows)
+                         for c in range(cols)]
+        
+        # 方块在该列最高点之上时直接使用列高
+        if y < self.tops[x]:
+            return self.tops[x]
+        
+        # 方块已经在悬空部分下面，逐行向下查找
+        for r in range(max(y + 1, 0), rows):
+            if self.grid[r][x]:
+                return r
+        return rows
+    
+    def draw_cells(self, cells):
+        """只把指定格子从缓存图层拷贝到屏幕上，返回对应的矩形列表"""
+        self._check_layer()
+        rects = [pygame.Rect(x*block_size, y*block_size, block_size, block_size)
+                 for x, y in cells if 0 <= x < cols and 0 <= y < rows]
+        screen.blits([(self.layer, rect, rect) for rect in rects], False)
+        return rects
 
     def lock_piece(self, piece):
+        locked = []
         for y in range(4):
             for x in range(4):
                 if piece.shape[piece.rotation][y][x]:
@@ -239,6 +396,13 @@ class Board:
                     pos_y = piece.y + y
                     if pos_y >= 0:  # 确保不会在屏幕外尝试锁定
                         self.grid[pos_y][pos_x] = piece.color_id
+                        locked.append((pos_x, pos_y))
+        self.version += 1
+        self.tops = None
+        
+        # 只更新缓存图层中新锁定的格子
+        if self.layer is not None:
+            self._patch_cells(locked)
 
     def clear_lines(self):
         lines_cleared = 0
@@ -256,8 +420,17 @@ class Board:
                 # 清空顶行
                 for x in range(cols):
                     self.grid[0][x] = 0
+                
+                # 缓存图层同样整体下移一行，只需要重画新的顶行
+                if self.layer is not None:
+                    self.layer.subsurface((0, 0, width, (y+1)*block_size)).scroll(0, block_size)
+                    self._patch_cells([(x, 0) for x in range(cols)])
             else:
                 y -= 1
+        
+        if lines_cleared:
+            self.version += 1
+            self.tops = None
                 
         return lines_cleared
 
@@ -269,6 +442,9 @@ class Piece:
         self.rotation = 0  # 初始旋转状态
         self.x = cols//2 - 2  # 居中出现
         self.y = -1  # 从顶部稍微露出来开始
+        # 落地位置缓存
+        self._ghost_key = None
+        self._ghost_y = None
         
     # 方向控制
     def move_left(self, board):
@@ -323,141 +499,56 @@ class Piece:
         return True
 
     def draw(self, x_offset=0, y_offset=0):
+        tile = atlas.rects[self.color_id]
+        blocks = []
         for y in range(4):
             for x in range(4):
                 if self.shape[self.rotation][y][x]:
                     # 计算位置
                     rect_x = (self.x + x) * block_size + x_offset
                     rect_y = (self.y + y) * block_size + y_offset
-                    
-                    # 获取颜色元组
-                    color_main = colors[self.color_id][0]
-                    color_light = colors[self.color_id][1]
-                    color_dark = colors[self.color_id][2]
-                    
-                    # 绘制主体
-                    pygame.draw.rect(screen, 
-                                     color_main, 
-                                     (rect_x, rect_y,
-                                      block_size, block_size))
-                    
-                    # 绘制高光（上方和左方）
-                    pygame.draw.polygon(screen, 
-                                        color_light,
-                                        [(rect_x, rect_y),
-                                         (rect_x+block_size-2, rect_y),
-                                         (rect_x+block_size-2, rect_y+block_size-2),
-                                         (rect_x, rect_y+block_size-2)])
-                    
-                    # 绘制阴影（右方和下方）
-                    pygame.draw.polygon(screen, 
-                                        color_dark,
-                                        [(rect_x+block_size, rect_y),
-                                         (rect_x+block_size, rect_y+block_size),
-                                         (rect_x+2, rect_y+block_size),
-                                         (rect_x+2, rect_y+2)])
-                    
-                    # 绘制内部亮点
-                    pygame.draw.rect(screen, 
-                                     color_light, 
-                                     (rect_x + 4, rect_y + 4,
-                                      block_size // 3, block_size // 3))
+                    blocks.append((atlas.surface, (rect_x, rect_y), tile))
+        screen.blits(blocks, False)
+    
+    def cells(self, y=None):
+        """返回方块占据的所有格子坐标"""
+        if y is None:
+            y = self.y
+        return [(self.x + dx, y + dy)
+                for dy in range(4) for dx in range(4)
+                if self.shape[self.rotation][dy][dx]]
+    
+    def get_ghost_y(self, board):
+        """计算方块落地位置的y坐标，只在方块移动、旋转或游戏板变化后重新计算"""
+        key = (self.x, self.y, self.rotation, board, board.version)
+        if key == self._ghost_key:
+            return self._ghost_y
+        
+        # 每一列只需要看方块在该列最下面的格子
+        bottoms = {}
+        for x, y in self.cells():
+            if y > bottoms.get(x, -rows):
+                bottoms[x] = y
+        
+        # 下落距离由每列下方第一个方块（或底部）决定
+        drop = rows
+        for x, y in bottoms.items():
+            drop = min(drop, board.first_block_below(x, y) - 1 - y)
+        
+        self._ghost_key = key
+        self._ghost_y = self.y + drop
+        return self._ghost_y
     
     def draw_ghost(self, board):
         """绘制方块落地位置的虚线框"""
-        # 创建一个副本来计算落地位置
-        ghost_y = self.y
+        ghost_y = self.get_ghost_y(board)
         
-        # 将副本一直向下移动直到碰撞
-        while True:
-            ghost_y += 1
-            # 检查是否碰撞
-            if self._check_collision_at_position(board, self.x, ghost_y):
-                ghost_y -= 1  # 回退一步，得到最终位置
-                break
-        
-        # 绘制虚线框
-        for y in range(4):
-            for x in range(4):
-                if self.shape[self.rotation][y][x]:
-                    rect_x = (self.x + x) * block_size
-                    rect_y = (ghost_y + y) * block_size
-                    
-                    # 计算幽灵方块的颜色
-                    color_main = colors[self.color_id][0]
-                    # 创建一个更明显的颜色
-                    ghost_color = (min(color_main[0]+50, 255), 
-                                   min(color_main[1]+50, 255), 
-                                   min(color_main[2]+50, 255))
-                    
-                    # 内缩值，使幽灵方块小一些但仍然明显
-                    s = 3
-                    
-                    # 先绘制一个实心的半透明块作为背景
-                    ghost_surface = pygame.Surface((block_size-2*s, block_size-2*s))
-                    ghost_surface.set_alpha(50)  # 设置透明度
-                    ghost_surface.fill(ghost_color)
-                    screen.blit(ghost_surface, (rect_x+s, rect_y+s))
-                    
-                    # 绘制灰色外框，不再使用刺眼的白色
-                    pygame.draw.rect(screen, 
-                                    (180, 180, 180), 
-                                    (rect_x+s, rect_y+s, block_size-2*s, block_size-2*s), 
-                                    2)  # 线宽为2
-                    
-                    # 绘制内部彩色线条
-                    pygame.draw.rect(screen, 
-                                    ghost_color, 
-                                    (rect_x+s+2, rect_y+s+2, block_size-2*s-4, block_size-2*s-4), 
-                                    1)  # 线宽为1
-                    
-                    # 绘制角落标记，使用灰色而不是白色
-                    corner_size = 4
-                    corner_color = (160, 160, 160)  # 适中的灰色，不太刺眼
-                    # 左上角
-                    pygame.draw.line(screen, corner_color, 
-                                    (rect_x+s, rect_y+s), 
-                                    (rect_x+s+corner_size, rect_y+s), 2)
-                    pygame.draw.line(screen, corner_color, 
-                                    (rect_x+s, rect_y+s), 
-                                    (rect_x+s, rect_y+s+corner_size), 2)
-                    # 右上角
-                    pygame.draw.line(screen, corner_color, 
-                                    (rect_x+block_size-s, rect_y+s), 
-                                    (rect_x+block_size-s-corner_size, rect_y+s), 2)
-                    pygame.draw.line(screen, corner_color, 
-                                    (rect_x+block_size-s, rect_y+s), 
-                                    (rect_x+block_size-s, rect_y+s+corner_size), 2)
-                    # 左下角
-                    pygame.draw.line(screen, corner_color, 
-                                    (rect_x+s, rect_y+block_size-s), 
-                                    (rect_x+s+corner_size, rect_y+block_size-s), 2)
-                    pygame.draw.line(screen, corner_color, 
-                                    (rect_x+s, rect_y+block_size-s), 
-                                    (rect_x+s, rect_y+block_size-s-corner_size), 2)
-                    # 右下角
-                    pygame.draw.line(screen, corner_color, 
-                                    (rect_x+block_size-s, rect_y+block_size-s), 
-                                    (rect_x+block_size-s-corner_size, rect_y+block_size-s), 2)
-                    pygame.draw.line(screen, corner_color, 
-                                    (rect_x+block_size-s, rect_y+block_size-s), 
-                                    (rect_x+block_size-s, rect_y+block_size-s-corner_size), 2)
-    
-    def _check_collision_at_position(self, board, test_x, test_y):
-        """检查在特定位置是否会发生碰撞"""
-        for y in range(4):
-            for x in range(4):
-                if self.shape[self.rotation][y][x]:
-                    pos_x = test_x + x
-                    pos_y = test_y + y
-                    
-                    # 检查是否超出边界或与已有方块碰撞
-                    if (pos_x < 0 or pos_x >= cols or 
-                        pos_y >= rows or 
-                        (pos_y >= 0 and board.grid[pos_y][pos_x])):
-                        return True
-        return False
-                     
+        # 使用预渲染的虚线框图块
+        tile = atlas.ghost_tiles[self.color_id]
+        screen.blits([(tile, (x*block_size, y*block_size))
+                      for x, y in self.cells(ghost_y)],
+                     False)
+    
     def draw_preview(self, x, y):
         # 绘制预览区块
         preview_block_size = block_size - 5  # 稍小一些的方块尺寸
@@ -494,8 +585,234 @@ class Piece:
                                      (rect_x, rect_y+preview_block_size), 
                                      (rect_x+preview_block_size, rect_y+preview_block_size), 2)
 
+# 字体只创建一次，避免每帧从磁盘加载
+_fonts = {}
+
+def get_font(size):
+    font = _fonts.get(size)
+    if font is None:
+        # 尝试使用系统默认字体，更好地支持中文
+        try:
+            font = pygame.font.Font(None, size)  # 使用默认字体
+        except:
+            # 如果默认字体不可用，回退到SysFont
+            font = pygame.font.SysFont(None, size)
+        _fonts[size] = font
+    return font
+
+# 文字缓存：相同字体、内容和颜色的文字只渲染一次，超出容量时淘汰最久未使用的
+class TextCache:
+    def __init__(self, max_size=256):
+        self.max_size = max_size
+        self.surfaces = OrderedDict()
+    
+    def render(self, font, text, color):
+        key = (font, text, color)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = font.render(text, True, color)
+            self.surfaces[key] = surface
+            if len(self.surfaces) > self.max_size:
+                self.surfaces.popitem(last=False)
+        else:
+            self.surfaces.move_to_end(key)
+        return surface
+
+text_cache = TextCache()
+
+# 半透明覆盖层缓存
+_overlays = {}
+
+def get_overlay(color, alpha):
+    overlay = _overlays.get((color, alpha))
+    if overlay is None or overlay.get_size() != (width, height):
+        overlay = pygame.Surface((width, height))
+        overlay.set_alpha(alpha)
+        overlay.fill(color)
+        _overlays[(color, alpha)] = overlay
+    return overlay
+
+def draw_pause_overlay(font_big, font_small):
+    # 半透明暂停覆盖层
+    screen.blit(get_overlay((0, 0, 0), 150), (0, 0))
+    
+    # 绘制暂停菜单背景
+    pause_rect = (width//2-100, height//2-70, 200, 140)
+    pygame.draw.rect(screen, (60, 60, 80), pause_rect)
+    pygame.draw.rect(screen, (100, 100, 150), pause_rect, 3)
+    
+    pause_text = text_cache.render(font_big, "PAUSED", (255, 255, 255))
+    screen.blit(pause_text, (width//2 - pause_text.get_width()//2, height//2 - 40))
+    instruction = text_cache.render(font_small, "Press P to continue", (220, 220, 220))
+    screen.blit(instruction, (width//2 - instruction.get_width()//2, height//2 + 20))
+
+def draw_game_over_overlay(score, font_big, font_small):
+    # 半透明游戏结束覆盖层
+    screen.blit(get_overlay((20, 0, 0), 180), (0, 0))
+    
+    # 绘制游戏结束菜单背景
+    gameover_rect = (width//2-120, height//2-100, 240, 200)
+    pygame.draw.rect(screen, (60, 30, 30), gameover_rect)
+    pygame.draw.rect(screen, (150, 50, 50), gameover_rect, 3)
+    
+    game_over_text = text_cache.render(font_big, "GAME OVER", (255, 200, 200))
+    screen.blit(game_over_text, (width//2 - game_over_text.get_width()//2, height//2 - 70))
+    
+    score_text = text_cache.render(font_big, f"SCORE: {score}", (255, 255, 200))
+    screen.blit(score_text, (width//2 - score_text.get_width()//2, height//2 - 10))
+    
+    restart_text = text_cache.render(font_small, "Press ENTER to restart", (220, 220, 220))
+    screen.blit(restart_text, (width//2 - restart_text.get_width()//2, height//2 + 50))
+
+# 脏矩形渲染器：记录上一帧画了什么，只重绘发生变化的格子、方块、
+# 落点虚线框和侧边栏，并把这些区域传给display.update
+class DirtyRenderer:
+    def __init__(self, font_small, font_big, profiler=None):
+        self.font_small = font_small
+        self.font_big = font_big
+        # 记录各绘制阶段的耗时
+        self.profiler = profiler or FrameProfiler()
+        self.full_redraw = True
+        
+        # 上一帧的状态
+        self.last_grid = None
+        self.last_piece = None      # (x, y, rotation, color_id)
+        self.last_ghost_y = None
+        self.last_cells = []        # 上一帧方块和虚线框占据的格子
+        self.last_sidebar = None
+        self.last_overlay = None
+    
+    def invalidate(self):
+        """下一帧重绘整个窗口"""
+        self.full_redraw = True
+    
+    def render(self, board, piece, next_piece, score, level, paused, game_over):
+        """绘制一帧，返回需要更新的矩形列表；返回None表示需要更新整个窗口"""
+        phase = self.profiler.phase
+        
+        # 覆盖层变化时整个窗口重绘
+        overlay = (paused, game_over, score if game_over else None)
+        if overlay != self.last_overlay:
+            self.last_overlay = overlay
+            self.full_redraw = True
+        
+        if paused or game_over:
+            # 覆盖层是静止的，只需要画一次
+            if not self.full_redraw:
+                return []
+            screen.fill((0, 0, 0))
+            with phase("board"):
+                board.draw()
+            with phase("sidebar"):
+                draw_sidebar(score, level, next_piece)
+            with phase("overlay"):
+                if paused:
+                    draw_pause_overlay(self.font_big, self.font_small)
+                if game_over:
+                    draw_game_over_overlay(score, self.font_big, self.font_small)
+            self.full_redraw = False
+            # 离开覆盖层后需要完整重绘
+            self.last_grid = None
+            return None
+        
+        ghost_y = piece.get_ghost_y(board)
+        piece_state = (piece.x, piece.y, piece.rotation, piece.color_id)
+        sidebar_state = (score, level, next_piece.color_id, next_piece.rotation)
+        
+        if self.full_redraw or self.last_grid is None:
+            # 填充黑色背景
+            screen.fill((0, 0, 0))
+            # 绘制游戏板（包含背景纹理）
+            with phase("board"):
+                board.draw()
+            # 绘制当前方块的落地位置预测（虚线框）
+            with phase("ghost"):
+                piece.draw_ghost(board)
+            # 绘制当前方块
+            with phase("piece"):
+                piece.draw()
+            # 绘制侧边栏
+            with phase("sidebar"):
+                draw_sidebar(score, level, next_piece)
+            self.full_redraw = False
+            rects = None
+        else:
+            dirty = set()
+            
+            # 与上一帧不同的格子
+            for y in range(rows):
+                if board.grid[y] != self.last_grid[y]:
+                    for x in range(cols):
+                        if board.grid[y][x] != self.last_grid[y][x]:
+                            dirty.add((x, y))
+            
+            # 方块移动、旋转或落点变化时，新旧位置都要重绘
+            if piece_state != self.last_piece or ghost_y != self.last_ghost_y:
+                dirty.update(self.last_cells)
+                dirty.update(piece.cells())
+                dirty.update(piece.cells(ghost_y))
+            
+            rects = []
+            if dirty:
+                # 虚线框是半透明的，所以它覆盖的格子必须先重绘
+                dirty.update(piece.cells(ghost_y))
+                dirty.update(piece.cells())
+                
+                with phase("board"):
+                    rects = board.draw_cells(dirty)
+                with phase("ghost"):
+                    piece.draw_ghost(board)
+                with phase("piece"):
+                    piece.draw()
+            
+            if sidebar_state != self.last_sidebar:
+                with phase("sidebar"):
+                    draw_sidebar(score, level, next_piece)
+                rects.append(pygame.Rect(width, 0, sidebar_width, height))
+        
+        self.last_grid = [row[:] for row in board.grid]
+        self.last_piece = piece_state
+        self.last_ghost_y = ghost_y
+        self.last_cells = piece.cells() + piece.cells(ghost_y)
+        self.last_sidebar = sidebar_state
+        return rects
+
+# 性能统计面板显示在侧边栏底部，只列出主要阶段，完整数据见导出文件
+profiler_overlay_phases = ["frame", "input", "update", "draw", "display.update"]
+
+def draw_profiler_overlay(profiler, visible_before):
+    """绘制（或清除）性能统计面板，返回需要更新的矩形"""
+    rect = pygame.Rect(width, height - 100, sidebar_width, 100)
+    if not profiler.visible and not visible_before:
+        return None
+    
+    # 先用侧边栏的静态内容擦除旧的面板
+    screen.blit(get_sidebar_static(), rect, rect.move(-width, 0))
+    if profiler.visible:
+        profiler.draw_overlay(screen, rect.x, rect.y, get_font(16), rect.width,
+                              profiler_overlay_phases)
+    return rect
+
+def update_display(rects):
+    # None表示更新整个画布，空列表表示没有变化
+    display.present(rects)
+
+# 逻辑更新使用固定时间步长（毫秒），与渲染帧率无关
+logic_step = 1000 / 120
+# 每帧最多追赶的逻辑步数，超过后丢弃积压的时间（跳帧）
+max_catch_up_steps = 10
+
 # 游戏核心逻辑
-def game_loop():
+def game_loop(max_fps=60, vsync=False, profile_path=None, profile_summary=None):
+    """max_fps为0时不限制帧率；vsync为True时尝试开启垂直同步；
+    profile_path指定时把每帧的耗时写入该文件，profile_summary指定时在退出时
+    把各阶段的百分位数写入该文件，F3显示或隐藏统计面板"""
+    global display, screen
+    if vsync:
+        # 驱动不支持垂直同步时使用普通窗口
+        display = ScaledDisplay((width + sidebar_width, height), "Tetris", vsync=True)
+        screen = display.canvas
+    
     board = Board()
     current_piece = Piece()
     next_piece = Piece()
@@ -511,34 +828,39 @@ def game_loop():
     running = True
     game_over = False
     
-    # 创建背景网格纹理
-    background = pygame.Surface((width, height))
-    for y in range(0, height, block_size):
-        for x in range(0, width, block_size):
-            color = (15, 15, 15) if (x//block_size + y//block_size) % 2 == 0 else (25, 25, 25)
-            pygame.draw.rect(background, color, (x, y, block_size, block_size))
+    font_small = get_font(24)
+    font_big = get_font(48)
     
-    # 尝试使用系统默认字体，更好地支持中文
-    try:
-        font_small = pygame.font.Font(None, 24)  # 使用默认字体
-        font_big = pygame.font.Font(None, 48)    # 使用默认字体
-    except:
-        # 如果默认字体不可用，回退到SysFont
-        font_small = pygame.font.SysFont(None, 24)
-        font_big = pygame.font.SysFont(None, 48)
+    profiler = FrameProfiler(export_path=profile_path, summary_path=profile_summary)
+    renderer = DirtyRenderer(font_small, font_big, profiler)
+    
+    # 还没有被逻辑更新消耗掉的时间
+    accumulator = 0
+    last_time = time.perf_counter()
     
     while running:
-        dt = clock.tick(60)
-        fall_time += dt
+        clock.tick(max_fps)
+        profiler.begin_frame()
+        now = time.perf_counter()
+        dt = (now - last_time) * 1000
+        last_time = now
         
         # 处理事件
+        profiler.start("input")
+        overlay_was_visible = profiler.visible
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
+            
+            # 窗口大小改变或被遮挡后恢复时，画布内容不变，只需重新完整显示
+            display.handle_event(event)
                 
             # 键盘控制
             if event.type == pygame.KEYDOWN:
-                if game_over:
+                if event.key == pygame.K_F3:
+                    # 显示或隐藏性能统计面板
+                    profiler.toggle()
+                elif game_over:
                     if event.key == pygame.K_RETURN:
                         # 重新开始游戏
                         board = Board()
@@ -619,143 +941,98 @@ def game_loop():
                         if board.is_collision(current_piece):
                             game_over = True
         
+        profiler.stop("input")
+        
         # 如果暂停或游戏结束，跳过游戏逻辑更新
         if paused or game_over:
-            # 填充黑色背景
-            screen.fill((0, 0, 0))
-            
-            # 绘制游戏板
-            board.draw()
-            
-            # 绘制侧边栏
-            draw_sidebar(score, level, next_piece)
-            
-            if paused:
-                # 半透明暂停覆盖层
-                pause_overlay = pygame.Surface((width, height))
-                pause_overlay.set_alpha(150)
-                pause_overlay.fill((0, 0, 0))
-                screen.blit(pause_overlay, (0, 0))
-                
-                # 绘制暂停菜单背景
-                pause_rect = (width//2-100, height//2-70, 200, 140)
-                pygame.draw.rect(screen, (60, 60, 80), pause_rect)
-                pygame.draw.rect(screen, (100, 100, 150), pause_rect, 3)
-                
-                pause_text = font_big.render("PAUSED", True, (255, 255, 255))
-                screen.blit(pause_text, (width//2 - pause_text.get_width()//2, height//2 - 40))
-                instruction = font_small.render("Press P to continue", True, (220, 220, 220))
-                screen.blit(instruction, (width//2 - instruction.get_width()//2, height//2 + 20))
-            
-            if game_over:
-                # 半透明游戏结束覆盖层
-                game_over_overlay = pygame.Surface((width, height))
-                game_over_overlay.set_alpha(180)
-                game_over_overlay.fill((20, 0, 0))
-                screen.blit(game_over_overlay, (0, 0))
-                
-                # 绘制游戏结束菜单背景
-                gameover_rect = (width//2-120, height//2-100, 240, 200)
-                pygame.draw.rect(screen, (60, 30, 30), gameover_rect)
-                pygame.draw.rect(screen, (150, 50, 50), gameover_rect, 3)
-                
-                game_over_text = font_big.render("GAME OVER", True, (255, 200, 200))
-                screen.blit(game_over_text, (width//2 - game_over_text.get_width()//2, height//2 - 70))
-                
-                score_text = font_big.render(f"SCORE: {score}", True, (255, 255, 200))
-                screen.blit(score_text, (width//2 - score_text.get_width()//2, height//2 - 10))
-                
-                restart_text = font_small.render("Press ENTER to restart", True, (220, 220, 220))
-                screen.blit(restart_text, (width//2 - restart_text.get_width()//2, height//2 + 50))
-                
-            pygame.display.update()
+            accumulator = 0
+            render_frame(renderer, profiler, overlay_was_visible,
+                         board, current_piece, next_piece, score, level, paused, game_over)
             continue
+        
+        # 按固定步长推进游戏逻辑，帧率高低不影响游戏速度
+        profiler.start("update")
+        accumulator += dt
+        steps = 0
+        while accumulator >= logic_step and not game_over:
+            accumulator -= logic_step
+            fall_time += logic_step
             
-        # 自动下落逻辑
-        if fall_time > fall_speed:
-            if not current_piece.move_down(board):
-                board.lock_piece(current_piece)
-                
-                lines = board.clear_lines()
-                # 使用新的得分规则
-                if lines == 1:
-                    score += 10
-                elif lines == 2:
-                    score += 30
-                elif lines == 3:
-                    score += 60
-                elif lines == 4:
-                    score += 100
+            # 自动下落逻辑，保留超出的时间而不是清零
+            while fall_time >= fall_speed and not game_over:
+                fall_time -= fall_speed
+                if not current_piece.move_down(board):
+                    board.lock_piece(current_piece)
                     
-                # 满300分升级，最高10级
-                old_level = level
-                level = min(score // 300 + 1, 10)
-                
-                # 如果升级了，调整下落速度
-                if level > old_level:
-                    # 每升一级提高5%的自然下落速度
-                    fall_speed = int(500 * (0.95 ** (level - 1)))
-                
-                current_piece = next_piece
-                next_piece = Piece()
-                
-                # 检查游戏是否结束
-                if board.is_collision(current_piece):
-                    game_over = True
+                    lines = board.clear_lines()
+                    # 使用新的得分规则
+                    if lines == 1:
+                        score += 10
+                    elif lines == 2:
+                        score += 30
+                    elif lines == 3:
+                        score += 60
+                    elif lines == 4:
+                        score += 100
+                        
+                    # 满300分升级，最高10级
+                    old_level = level
+                    level = min(score // 300 + 1, 10)
                     
-            fall_time = 0
-        
-        # 填充黑色背景
-        screen.fill((0, 0, 0))
-        # 绘制背景纹理
-        screen.blit(background, (0, 0))
-        
-        # 绘制游戏板
-        board.draw()
-        
-        # 绘制当前方块的落地位置预测（虚线框）
-        current_piece.draw_ghost(board)
-        
-        # 绘制当前方块
-        current_piece.draw()
-        
-        # 绘制侧边栏
-        draw_sidebar(score, level, next_piece)
+                    # 如果升级了，调整下落速度
+                    if level > old_level:
+                        # 每升一级提高5%的自然下落速度
+                        fall_speed = int(500 * (0.95 ** (level - 1)))
+                    
+                    current_piece = next_piece
+                    next_piece = Piece()
+                    
+                    # 检查游戏是否结束
+                    if board.is_collision(current_piece):
+                        game_over = True
+            
+            steps += 1
+            if steps >= max_catch_up_steps:
+                # 渲染严重落后时丢弃积压的时间，避免越追越慢
+                accumulator = 0
+                break
+        profiler.stop("update")
         
-        pygame.display.update()
+        # 只重绘变化的区域
+        render_frame(renderer, profiler, overlay_was_visible,
+                     board, current_piece, next_piece, score, level, paused, game_over)
     
+    profiler.close()
     pygame.quit()
 
-def draw_sidebar(score, level, next_piece):
+def render_frame(renderer, profiler, overlay_was_visible, board, piece, next_piece, score, level, paused, game_over):
+    """绘制一帧并记录各阶段耗时"""
+    with profiler.phase("draw"):
+        rects = renderer.render(board, piece, next_piece, score, level, paused, game_over)
+        overlay_rect = draw_profiler_overlay(profiler, overlay_was_visible)
+        if overlay_rect and rects is not None:
+            rects.append(overlay_rect)
+    with profiler.phase("display.update"):
+        update_display(rects)
+    profiler.end_frame()
+
+# 侧边栏中不变的部分（背景、标题和操作说明）预先合成到一张Surface上
+_sidebar_static = None
+
+def get_sidebar_static():
+    global _sidebar_static
+    if _sidebar_static is not None and _sidebar_static.get_size() == (sidebar_width, height):
+        return _sidebar_static
+    
+    sidebar = pygame.Surface((sidebar_width, height))
     # 绘制侧边栏背景
-    pygame.draw.rect(screen, (30, 30, 30), 
-                    (width, 0, sidebar_width, height))
+    sidebar.fill((30, 30, 30))
     
-    # 使用默认字体，更好地支持中文
-    try:
-        font = pygame.font.Font(None, 24)
-    except:
-        font = pygame.font.SysFont(None, 24)
+    font = get_font(24)
     
     # 绘制下一个方块文本 - 使用英文避免中文显示问题
     next_text = font.render("NEXT:", True, (255, 255, 255))
-    screen.blit(next_text, (width + 10, 20))
-    
-    # 绘制下一个方块预览
-    next_piece.draw_preview(width + 20, 50)
-    
-    # 绘制分数 - 使用英文避免中文显示问题
-    score_text = font.render(f"SCORE: {score}", True, (255, 255, 255))
-    screen.blit(score_text, (width + 10, height//2))
-    
-    # 绘制等级 - 使用英文避免中文显示问题
-    level_text = font.render(f"LEVEL: {level}", True, (255, 255, 255))
-    screen.blit(level_text, (width + 10, height//2 + 30))
-    
-    # 显示下一级所需分数
-    next_level_score = level * 300
-    next_level_text = font.render(f"NEXT LVL: {next_level_score}", True, (255, 255, 255))
-    screen.blit(next_level_text, (width + 10, height//2 + 60))
+    sidebar.blit(next_text, (10, 20))
     
     # 绘制操作说明 - 使用英文避免中文显示问题
     controls_y = height//2 + 80
@@ -769,7 +1046,44 @@ def draw_sidebar(score, level, next_piece):
     
     for i, control in enumerate(controls):
         ctrl_text = font.render(control, True, (200, 200, 200))
-        screen.blit(ctrl_text, (width + 10, controls_y + i*25))
+        sidebar.blit(ctrl_text, (10, controls_y + i*25))
+    
+    if pygame.display.get_surface():
+        sidebar = sidebar.convert()
+    _sidebar_static = sidebar
+    return sidebar
+
+def draw_sidebar(score, level, next_piece):
+    # 绘制侧边栏背景、标题和操作说明
+    screen.blit(get_sidebar_static(), (width, 0))
+    
+    font = get_font(24)
+    
+    # 绘制下一个方块预览
+    next_piece.draw_preview(width + 20, 50)
+    
+    # 绘制分数 - 使用英文避免中文显示问题
+    score_text = text_cache.render(font, f"SCORE: {score}", (255, 255, 255))
+    screen.blit(score_text, (width + 10, height//2))
+    
+    # 绘制等级 - 使用英文避免中文显示问题
+    level_text = text_cache.render(font, f"LEVEL: {level}", (255, 255, 255))
+    screen.blit(level_text, (width + 10, height//2 + 30))
+    
+    # 显示下一级所需分数
+    next_level_score = level * 300
+    next_level_text = text_cache.render(font, f"NEXT LVL: {next_level_score}", (255, 255, 255))
+    screen.blit(next_level_text, (width + 10, height//2 + 60))
 
 if __name__ == "__main__":
-    game_loop()
\ No newline at end of file
+    import argparse
+    
+    # 解析命令行参数
+    parser = argparse.ArgumentParser(description="Tetris")
+    parser.add_argument("--fps", type=int, default=60, help="Maximum frame rate, 0 for uncapped")
+    parser.add_argument("--vsync", action="store_true", help="Try to synchronise rendering with the display")
+    parser.add_argument("--profile", default=None, help="Write per-frame phase timings to this JSON-lines file")
+    parser.add_argument("--profile-summary", default=None, help="Write phase timing percentiles to this JSON file on exit")
+    args = parser.parse_args()
+    
+    game_loop(args.fps, args.vsync, args.profile, args.profile_summary)
\ No newline at end of file
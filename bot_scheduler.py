@@ -0,0 +1,297 @@
+import collections
+import itertools
+import logging
+import math
+import threading
+import time
+import concurrent.futures
+
+logger = logging.getLogger(__name__)
+
+class TimerWheel:
+    """Hashed timer wheel holding items until their delay has elapsed."""
+
+    def __init__(self, tick=0.01, slots=512):
+        """
+        Args:
+            tick (float): Length of one slot in seconds
+            slots (int): Number of slots in the wheel
+        """
+        self.tick = tick
+        self.slots = [[] for _ in range(slots)]
+        self.position = 0
+        self.count = 0
+
+    def schedule(self, delay, item):
+        """Schedule an item to become due after delay seconds."""
+        ticks = max(1, math.ceil(delay / self.tick))
+        rounds, offset = divmod(ticks, len(self.slots))
+        if offset == 0:
+            # A full turn of the wheel lands back on the current slot
+            rounds -= 1
+            offset = len(self.slots)
+        slot = (self.position + offset) % len(self.slots)
+        self.slots[slot].append([rounds, item])
+        self.count += 1
+
+    def advance(self):
+        """
+        Move the wheel on by one tick.
+
+        Returns:
+            list: Items that became due on this tick
+        """
+        self.position = (self.position + 1) % len(self.slots)
+        bucket = self.slots[self.position]
+        if not bucket:
+            return []
+
+        due = []
+        remaining = []
+        for entry in bucket:
+            if entry[0] == 0:
+                due.append(entry[1])
+            else:
+                entry[0] -= 1
+                remaining.append(entry)
+        self.slots[self.position] = remaining
+        self.count -= len(due)
+        return due
+
+class BotScheduler:
+    """
+    Drive many TetrisBot instances from one timer thread and a small worker pool.
+
+    Instead of a thread per bot sleeping for move_delay, every bot sits on a
+    timer wheel. On each tick the due bots are split into batches and each
+    batch is handed to the worker pool as a single task. Batches only save
+    dispatch overhead: the workers are threads, and a decision is pure Python
+    search, so decisions do not run in parallel. The scheduler therefore makes
+    roughly as many decisions per second as one interpreter can (a few hundred
+    at easy difficulty), and drives about that rate times move_delay bots at
+    full speed, whatever the worker count.
+
+    At most max_in_flight batches are queued on the pool at a time; due bots
+    beyond that wait in a backlog and are dispatched as batches finish. Past
+    capacity the scheduler sheds load: a bot whose decision started more than
+    its move_delay late has its interval doubled, or lengthened by the lag if
+    that is more, up to max_stretch times move_delay, and an on-time bot's
+    interval shrinks back by a tenth per decision. Bots then move more slowly instead of the backlog
+    and lag growing without bound. With more bots than max_stretch allows
+    for, lag grows again.
+    """
+
+    def __init__(self, workers=4, tick=0.01, batch_size=64, on_move=None, max_in_flight=None, max_stretch=100.0):
+        """
+        Args:
+            workers (int): Number of worker threads making decisions
+            tick (float): Timer wheel resolution in seconds
+            batch_size (int): Maximum number of bots decided in one task
+            on_move: Default callback(bot, move) for bots added without one
+            max_in_flight (int): Batches queued on the pool at once, defaults to twice the workers
+            max_stretch (float): Largest multiple of move_delay a bot's interval is stretched to under load
+        """
+        self.workers = workers
+        self.batch_size = batch_size
+        self.on_move = on_move
+        self.max_in_flight = max_in_flight or 2 * workers
+        self.max_stretch = max_stretch
+        self.wheel = TimerWheel(tick)
+        self.bots = {}  # {id(bot): (bot, on_move, token)}
+        self.tokens = itertools.count()
+        self.backlog = collections.deque()  # Due (bot, token, due time, interval) waiting for a free batch slot
+        self.in_flight = 0
+        self.lock = threading.Lock()
+        self.running = False
+        self.thread = None
+        self.executor = None
+
+        # Statistics; lag runs from when a decision was due to when it started,
+        # stretch is the interval a decision was scheduled after over move_delay
+        self.decisions = 0
+        self.total_lag = 0.0
+        self.max_lag = 0.0
+        self.total_stretch = 0.0
+
+    def add(self, bot, on_move=None, delay=None):
+        """
+        Start driving a bot.
+
+        Args:
+            bot: The TetrisBot to drive
+            on_move: Callback(bot, move) receiving each bot_move message
+            delay: Seconds before the first decision, defaults to the bot's move_delay
+        """
+        if delay is None:
+            delay = bot.settings[bot.difficulty]['move_delay']
+        with self.lock:
+            # A new token orphans the wheel entry of an earlier add of the same bot
+            token = next(self.tokens)
+            self.bots[id(bot)] = (bot, on_move or self.on_move, token)
+            self.wheel.schedule(delay, (bot, token, time.perf_counter() + delay, bot.settings[bot.difficulty]['move_delay']))
+
+    def remove(self, bot):
+        """Stop driving a bot. Any pending timer entry is dropped when it fires."""
+        with self.lock:
+            self.bots.pop(id(bot), None)
+
+    def current(self, bot, token):
+        """The bot's (bot, on_move, token) entry if token is from its latest add, else None"""
+        entry = self.bots.get(id(bot))
+        if entry and entry[0] is bot and entry[2] == token:
+            return entry
+        return None
+
+    def mean_lag(self):
+        return self.total_lag / self.decisions if self.decisions else 0.0
+
+    def mean_stretch(self):
+        return self.total_stretch / self.decisions if self.decisions else 1.0
+
+    def next_interval(self, interval, move_delay, lag):
+        """
+        The delay before a bot's next decision.
+
+        Args:
+            interval (float): Delay the decision just made was scheduled after
+            move_delay (float): The bot's difficulty setting, its interval with no load
+            lag (float): How late the decision started
+
+        Returns:
+            float: If the decision was more than move_delay late, doubled and at
+            least lengthened by the lag, else a step back towards move_delay
+        """
+        if lag > move_delay:
+            return min(max(interval * 2, interval + lag), move_delay * self.max_stretch)
+        return max(move_delay, interval * 0.9)
+
+    def start(self):
+        """Start the timer thread and worker pool."""
+        if not self.running:
+            self.running = True
+            self.executor = concurrent.futures.ThreadPoolExecutor(max_workers=self.workers)
+            self.thread = threading.Thread(target=self._run)
+            self.thread.daemon = True
+            self.thread.start()
+
+    def stop(self):
+        """Stop the timer thread and worker pool."""
+        with self.lock:
+            # Under the lock so no batch is dispatched to a pool that is shutting down
+            self.running = False
+        if self.thread:
+            self.thread.join()
+            self.thread = None
+        if self.executor:
+            self.executor.shutdown(wait=True, cancel_futures=True)
+            self.executor = None
+        self.in_flight = 0
+
+    def _run(self):
+        """Timer loop - advances the wheel and dispatches due bots in batches."""
+        tick = self.wheel.tick
+        next_tick = time.perf_counter() + tick
+        while self.running:
+            now = time.perf_counter()
+            if now < next_tick:
+                time.sleep(next_tick - now)
+                continue
+
+            # Catch up on every tick that has passed since the last one
+            with self.lock:
+                while next_tick <= now:
+                    self.backlog.extend(self.wheel.advance())
+                    next_tick += tick
+                self._dispatch()
+
+    def _dispatch(self):
+        """Hand backlogged bots to the pool while batch slots are free. Called with the lock held."""
+        while self.backlog and self.in_flight < self.max_in_flight and self.running:
+            batch = [self.backlog.popleft() for _ in range(min(self.batch_size, len(self.backlog)))]
+            self.in_flight += 1
+            self.executor.submit(self._run_batch, batch)
+
+    def _run_batch(self, batch):
+        """Make one decision for each bot in the batch and reschedule it."""
+        try:
+            for bot, token, due, interval in batch:
+                entry = self.current(bot, token)
+                if not entry or not bot.running:
+                    continue
+
+                lag = time.perf_counter() - due
+                try:
+                    move = bot.step()
+                    if move and entry[1]:
+                        entry[1](bot, move)
+                except Exception:
+                    logger.exception("Bot error")
+
+                move_delay = bot.settings[bot.difficulty]['move_delay']
+                with self.lock:
+                    self.decisions += 1
+                    self.total_lag += lag
+                    self.max_lag = max(self.max_lag, lag)
+                    self.total_stretch += interval / move_delay
+                    if self.current(bot, token):
+                        delay = self.next_interval(interval, move_delay, lag)
+                        self.wheel.schedule(delay, (bot, token, time.perf_counter() + delay, delay))
+        finally:
+            with self.lock:
+                self.in_flight -= 1
+                self._dispatch()
+
+if __name__ == "__main__":
+    import argparse
+    import random
+
+    from tetris_bot import TetrisBot, SearchPiece, SHAPES
+
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description="Run many TetrisBot instances on one scheduler")
+    parser.add_argument("--bots", type=int, default=5000, help="Number of bots")
+    parser.add_argument("--difficulty", default="easy", help="Bot difficulty")
+    parser.add_argument("--workers", type=int, default=4, help="Worker threads")
+    parser.add_argument("--batch", type=int, default=64, help="Bots decided per task")
+    parser.add_argument("--duration", type=float, default=10.0, help="Seconds to run")
+    args = parser.parse_args()
+
+    def new_piece():
+        shape_idx = random.randrange(len(SHAPES))
+        return SearchPiece(SHAPES[shape_idx], shape_idx)
+
+    def on_move(bot, move):
+        # Feed the bot a new piece so every decision does real work
+        bot.set_pieces(bot.next_piece, new_piece())
+
+    scheduler = BotScheduler(workers=args.workers, batch_size=args.batch, on_move=on_move)
+    bots = []
+    for _ in range(args.bots):
+        bot = TetrisBot(args.difficulty)
+        bot.set_pieces(new_piece(), new_piece())
+        bots.append(bot)
+
+    scheduler.start()
+    for bot in bots:
+        bot.start(scheduler)
+
+    start = time.perf_counter()
+    time.sleep(args.duration)
+    elapsed = time.perf_counter() - start
+
+    for bot in bots:
+        bot.stop()
+    scheduler.stop()
+
+    rate = scheduler.decisions / elapsed
+    move_delay = bots[0].settings[args.difficulty]['move_delay']
+    print(f"bots={args.bots} threads={threading.active_count()} "
+          f"decisions={scheduler.decisions} decisions/s={rate:.0f} "
+          f"decision_lag_ms mean={scheduler.mean_lag() * 1000:.1f} max={scheduler.max_lag * 1000:.1f} "
+          f"backlog={len(scheduler.backlog)} mean_stretch={scheduler.mean_stretch():.2f}")
+    # Decisions run one at a time under the GIL, so this is the limit for any worker count
+    if scheduler.mean_stretch() > 1.01:
+        print(f"over capacity: about {rate * move_delay:.0f} bots run at full speed (decisions/s x move_delay={move_delay}s), "
+              f"so bots were slowed to {scheduler.mean_stretch():.1f}x move_delay on average (limit {scheduler.max_stretch:g}x)")
+    else:
+        print("within capacity: bots ran at full speed")
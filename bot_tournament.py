@@ -0,0 +1,349 @@
+import hashlib
+import json
+import os
+import random
+import concurrent.futures
+
+from tetris_bot import TetrisBot, BotGame
+
+def default_weights(difficulty='medium'):
+    """Return the hand-tuned heuristic weights for a difficulty."""
+    return dict(TetrisBot(difficulty).weights)
+
+def make_bot(weights, difficulty='medium', search=None):
+    """
+    Create a bot with the given weights for headless play.
+
+    Args:
+        weights (dict): Heuristic weights, merged over the difficulty's defaults
+        difficulty (str): Difficulty whose search settings are used
+        search (dict): Optional overrides for the difficulty settings
+
+    Returns:
+        TetrisBot: The configured bot
+    """
+    bot = TetrisBot(difficulty)
+    bot.weights.update(weights)
+    bot.settings[difficulty].update(search or {})
+    return bot
+
+def play_game(weights, seed, difficulty='medium', max_pieces=500, search=None):
+    """
+    Play one seeded single-player game.
+
+    Args:
+        weights (dict): Heuristic weights for the bot
+        seed (int): Seed for the piece stream and the bot's random choices
+        difficulty (str): Difficulty whose search settings are used
+        max_pieces (int): Game length cap
+        search (dict): Optional overrides for the difficulty settings
+
+    Returns:
+        dict: Lines, score, pieces placed and survival time in seconds of play
+    """
+    # Error moves and tie-breaks use the module-level random generator
+    random.seed(seed)
+    player = BotGame(make_bot(weights, difficulty, search), seed)
+    while not player.game_over and player.pieces < max_pieces:
+        player.play_piece()
+    result = player.result()
+    result["seed"] = seed
+    return result
+
+def play_match(weights_a, weights_b, seed, difficulty='medium', max_pieces=500, search=None):
+    """
+    Play one seeded bot-vs-bot match with junk lines sent on line clears.
+
+    Both bots receive the same piece stream and take turns placing pieces.
+
+    Returns:
+        dict: Winner ('a', 'b' or None for a draw) and per-bot statistics
+    """
+    random.seed(seed)
+    junk_rng = random.Random(seed + 1)
+    a = BotGame(make_bot(weights_a, difficulty, search), seed)
+    b = BotGame(make_bot(weights_b, difficulty, search), seed)
+
+    while a.pieces < max_pieces and not a.game_over and not b.game_over:
+        for player, opponent in ((a, b), (b, a)):
+            lines = player.play_piece()
+            if player.game_over:
+                break
+            if lines:
+                opponent.add_junk_lines(lines, junk_rng)
+
+    winner = None
+    if a.game_over != b.game_over:
+        winner = 'b' if a.game_over else 'a'
+    return {"seed": seed, "winner": winner, "a": a.result(), "b": b.result()}
+
+def fingerprint(*settings):
+    """
+    Short stable hash of everything that decides a game's outcome.
+
+    It is part of every results key, so a rerun with other weights or game
+    settings plays its games again instead of reusing the logged ones.
+    """
+    return hashlib.sha1(json.dumps(settings, sort_keys=True).encode()).hexdigest()[:12]
+
+def _run_task(task):
+    """Pool entry point for one game or match task."""
+    kind, key, args = task
+    if kind == "match":
+        return key, play_match(*args)
+    return key, play_game(*args)
+
+class ResultsLog:
+    """
+    Append-only JSON-lines results file.
+
+    Every finished game is written as soon as it completes, so a run that is
+    interrupted can be resumed by skipping the keys already in the file. A
+    final line torn by the interruption is cut off before appending, so the
+    next record starts on a line of its own.
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.records = []
+        if os.path.exists(path):
+            complete = 0  # Byte offset just past the last whole line
+            with open(path, 'rb') as f:
+                for line in f:
+                    if not line.endswith(b"\n"):
+                        break
+                    complete += len(line)
+                    try:
+                        self.records.append(json.loads(line))
+                    except json.JSONDecodeError:
+                        continue
+            if complete < os.path.getsize(path):
+                with open(path, 'r+b') as f:
+                    f.truncate(complete)
+        self.file = open(path, 'a')
+
+    def append(self, record):
+        """Write one record and flush it to disk."""
+        self.records.append(record)
+        self.file.write(json.dumps(record) + "\n")
+        self.file.flush()
+
+    def completed(self, record_type):
+        """Return {key: record} for every record of a type that has a key."""
+        return {tuple(r["key"]): r for r in self.records if r.get("type") == record_type and "key" in r}
+
+    def last(self, record_type, **fields):
+        """Return the most recent record of a type whose fields have the given values, or None."""
+        for record in reversed(self.records):
+            if record.get("type") == record_type and all(record.get(k) == v for k, v in fields.items()):
+                return record
+        return None
+
+    def close(self):
+        self.file.close()
+
+def run_tasks(tasks, log, record_type, workers, extra=None):
+    """
+    Run game tasks on a process pool, streaming each result into the log.
+
+    Tasks whose key is already in the log are not played again.
+
+    Returns:
+        dict: {key: record} for every task
+    """
+    done = log.completed(record_type)
+    pending = [task for task in tasks if tuple(task[1]) not in done]
+
+    with concurrent.futures.ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [pool.submit(_run_task, task) for task in pending]
+        for future in concurrent.futures.as_completed(futures):
+            key, result = future.result()
+            record = {"type": record_type, "key": list(key)}
+            record.update(extra or {})
+            record.update(result)
+            log.append(record)
+            done[tuple(key)] = record
+
+    return {tuple(task[1]): done[tuple(task[1])] for task in tasks}
+
+def run_tournament(entrants, seeds, log, workers=None, difficulty='medium', max_pieces=500, search=None):
+    """
+    Play a round robin of seeded matches between named weight sets.
+
+    Args:
+        entrants (dict): {name: weights}
+        seeds (list): Seeds played by every pairing
+        log (ResultsLog): Where match results are streamed
+
+    Returns:
+        dict: {name: {"wins", "losses", "draws", "lines", "score"}} standings
+    """
+    names = sorted(entrants)
+    tasks = []
+    for i, name_a in enumerate(names):
+        for name_b in names[i + 1:]:
+            settings = fingerprint(entrants[name_a], entrants[name_b], difficulty, max_pieces, search)
+            for seed in seeds:
+                tasks.append(("match", (name_a, name_b, seed, settings),
+                              (entrants[name_a], entrants[name_b], seed, difficulty, max_pieces, search)))
+
+    results = run_tasks(tasks, log, "match", workers)
+
+    standings = {name: {"wins": 0, "losses": 0, "draws": 0, "lines": 0, "score": 0} for name in names}
+    for (name_a, name_b, _, _), record in results.items():
+        for name, side in ((name_a, 'a'), (name_b, 'b')):
+            standings[name]["lines"] += record[side]["lines"]
+            standings[name]["score"] += record[side]["score"]
+        if record["winner"] is None:
+            standings[name_a]["draws"] += 1
+            standings[name_b]["draws"] += 1
+        else:
+            winner, loser = (name_a, name_b) if record["winner"] == 'a' else (name_b, name_a)
+            standings[winner]["wins"] += 1
+            standings[loser]["losses"] += 1
+    return standings
+
+class GeneticTuner:
+    """
+    Genetic algorithm over the heuristic weights.
+
+    Each generation every candidate plays the same seeded games in parallel
+    and is ranked by mean lines cleared. The population is checkpointed to
+    the results log at the start of each generation, so tuning resumes from
+    the last checkpoint and skips games that were already played. Checkpoints
+    carry the tuner settings and are only resumed by a run with the same ones.
+
+    Fitness is noisy, so a later generation's best can score below an earlier
+    one. A "best" record is logged only when a generation beats every earlier
+    one, including those of resumed runs, and its weights are the result.
+    """
+
+    def __init__(self, log, population=16, elites=4, games=8, mutation=0.3,
+                 seed=0, workers=None, difficulty='medium', max_pieces=500, search=None):
+        self.log = log
+        self.population_size = population
+        self.elites = elites
+        self.games = games
+        self.mutation = mutation
+        self.seed = seed
+        self.workers = workers
+        self.difficulty = difficulty
+        self.max_pieces = max_pieces
+        self.search = search
+        self.config = {"population": population, "elites": elites, "games": games, "mutation": mutation,
+                       "seed": seed, "difficulty": difficulty, "max_pieces": max_pieces, "search": search}
+
+    def initial_population(self):
+        """Start from the hand-tuned weights and mutations of them."""
+        rng = random.Random(f"{self.seed}-init")
+        base = default_weights(self.difficulty)
+        return [base] + [self.mutate(base, rng) for _ in range(self.population_size - 1)]
+
+    def mutate(self, weights, rng):
+        return {name: round(value + rng.gauss(0, self.mutation * (abs(value) + 1.0)), 4)
+                for name, value in weights.items()}
+
+    def crossover(self, weights_a, weights_b, rng):
+        return {name: (weights_a if rng.random() < 0.5 else weights_b)[name] for name in weights_a}
+
+    def next_population(self, ranked, generation):
+        """Keep the elites and breed the rest of the population from them."""
+        rng = random.Random(f"{self.seed}-{generation}")
+        parents = ranked[:self.elites]
+        children = [dict(weights) for weights in parents]
+        while len(children) < self.population_size:
+            child = self.crossover(rng.choice(parents), rng.choice(parents), rng)
+            children.append(self.mutate(child, rng))
+        return children
+
+    def evaluate(self, population, generation):
+        """Play every candidate's games and return the mean lines cleared per candidate."""
+        seeds = [self.seed * 1000003 + generation * 1000 + i for i in range(self.games)]
+        tasks = [("game", (generation, index, seed, fingerprint(weights, self.difficulty, self.max_pieces, self.search)),
+                  (weights, seed, self.difficulty, self.max_pieces, self.search))
+                 for index, weights in enumerate(population) for seed in seeds]
+        results = run_tasks(tasks, self.log, "game", self.workers)
+
+        fitness = [0.0] * len(population)
+        for (_, index, _, _), record in results.items():
+            fitness[index] += record["lines"] / len(seeds)
+        return fitness
+
+    def run(self, generations):
+        """
+        Tune for the given number of generations, resuming from the log if possible.
+
+        Returns:
+            dict: The weights with the highest fitness in any generation
+        """
+        checkpoint = self.log.last("generation", config=self.config)
+        if checkpoint:
+            generation = checkpoint["generation"]
+            population = checkpoint["population"]
+        else:
+            generation = 0
+            population = self.initial_population()
+            self.log.append({"type": "generation", "generation": 0, "population": population, "config": self.config})
+
+        best = self.log.last("best", config=self.config)
+        while generation < generations:
+            fitness = self.evaluate(population, generation)
+            order = sorted(range(len(population)), key=lambda i: fitness[i], reverse=True)
+            ranked = [population[i] for i in order]
+
+            if best is None or fitness[order[0]] > best["fitness"]:
+                best = {"type": "best", "generation": generation,
+                        "fitness": fitness[order[0]], "weights": ranked[0], "config": self.config}
+                self.log.append(best)
+            print(f"Generation {generation}: best {fitness[order[0]]:.1f} lines, "
+                  f"mean {sum(fitness) / len(fitness):.1f}, "
+                  f"overall {best['fitness']:.1f} (generation {best['generation']})")
+
+            generation += 1
+            population = self.next_population(ranked, generation)
+            self.log.append({"type": "generation", "generation": generation, "population": population,
+                             "config": self.config})
+
+        return best["weights"] if best else population[0]
+
+if __name__ == "__main__":
+    import argparse
+
+    # Parse command line arguments
+    parser = argparse.ArgumentParser(description="Headless TetrisBot tournaments and weight tuning")
+    parser.add_argument("command", choices=["tournament", "tune"], help="What to run")
+    parser.add_argument("--results", default="bot_results.jsonl", help="Append-only results file")
+    parser.add_argument("--workers", type=int, default=None, help="Worker processes")
+    parser.add_argument("--difficulty", default="medium", help="Difficulty whose search settings are used")
+    parser.add_argument("--max-pieces", type=int, default=500, help="Game length cap")
+    parser.add_argument("--depth", type=int, default=1, help="Search depth (1 keeps games fast and deterministic)")
+    parser.add_argument("--seed", type=int, default=0, help="Base seed")
+    parser.add_argument("--games", type=int, default=8, help="Seeded games per pairing or candidate")
+    parser.add_argument("--generations", type=int, default=20, help="Tuner generations")
+    parser.add_argument("--population", type=int, default=16, help="Tuner population size")
+    args = parser.parse_args()
+
+    # A large budget means games are limited by depth, not wall-clock time
+    search = {"search_depth": args.depth, "search_budget": 60.0, "error_rate": 0.0}
+    log = ResultsLog(args.results)
+
+    try:
+        if args.command == "tournament":
+            entrants = {difficulty: default_weights(difficulty) for difficulty in ("easy", "medium", "hard")}
+            best = log.last("best")
+            if best:
+                entrants["tuned"] = best["weights"]
+            seeds = [args.seed + i for i in range(args.games)]
+            standings = run_tournament(entrants, seeds, log, args.workers, args.difficulty,
+                                       args.max_pieces, search)
+            for name, stats in sorted(standings.items(), key=lambda item: item[1]["wins"], reverse=True):
+                print(f"{name:>8}: {stats['wins']}W {stats['losses']}L {stats['draws']}D "
+                      f"lines={stats['lines']} score={stats['score']}")
+        else:
+            tuner = GeneticTuner(log, population=args.population, games=args.games, seed=args.seed,
+                                 workers=args.workers, difficulty=args.difficulty,
+                                 max_pieces=args.max_pieces, search=search)
+            weights = tuner.run(args.generations)
+            print(json.dumps(weights, indent=2))
+    finally:
+        log.close()
@@ -0,0 +1,153 @@
+import json
+import time
+from collections import deque
+from contextlib import contextmanager
+
+import pygame
+
+class FrameProfiler:
+    """
+    Per-phase frame timing with rolling percentiles and an on-screen overlay.
+
+    Each frame is wrapped in begin_frame()/end_frame() and its phases in
+    phase(name). The last `window` samples of every phase are kept for
+    p50/p95/p99, and every frame can be streamed to a JSON-lines file for
+    offline analysis. The percentiles can also be written as a JSON summary
+    when the profiler is closed.
+    """
+
+    def __init__(self, window=600, export_path=None, summary_path=None):
+        """
+        Args:
+            window (int): Number of recent frames kept per phase
+            export_path (str): Optional JSON-lines file that every frame is appended to
+            summary_path (str): Optional JSON file the percentiles are written to by close()
+        """
+        self.window = window
+        self.samples = {}  # {phase: deque of nanoseconds}
+        self.current = {}
+        self.started = {}
+        self.frame_start = None
+        self.frames = 0
+        self.visible = False
+
+        self.export_path = export_path
+        self.export_file = open(export_path, 'a') if export_path else None
+        self.summary_path = summary_path
+
+        # Percentiles are recomputed at most a few times per second
+        self._summary = []
+        self._summary_time = 0
+
+    def start(self, name):
+        """Start timing a phase of the current frame."""
+        self.started[name] = time.perf_counter_ns()
+
+    def stop(self, name):
+        """Stop timing a phase; repeated phases within a frame are summed."""
+        start = self.started.pop(name, None)
+        if start is not None:
+            self.current[name] = self.current.get(name, 0) + time.perf_counter_ns() - start
+
+    @contextmanager
+    def phase(self, name):
+        """Time a block of code as part of the current frame."""
+        self.start(name)
+        try:
+            yield
+        finally:
+            self.stop(name)
+
+    def begin_frame(self):
+        self.frame_start = time.perf_counter_ns()
+
+    def end_frame(self):
+        """Record the finished frame's phases."""
+        if self.frame_start is None:
+            return
+        now = time.perf_counter_ns()
+        self.current["frame"] = now - self.frame_start
+
+        for name, elapsed in self.current.items():
+            samples = self.samples.get(name)
+            if samples is None:
+                samples = self.samples[name] = deque(maxlen=self.window)
+            samples.append(elapsed)
+
+        if self.export_file:
+            record = {"index": self.frames, "t_ns": now}
+            record.update(self.current)
+            self.export_file.write(json.dumps(record) + "\n")
+
+        self.current = {}
+        self.frame_start = None
+        self.frames += 1
+
+    def percentiles(self, name):
+        """Return (p50, p95, p99) in milliseconds for a phase."""
+        samples = sorted(self.samples.get(name, ()))
+        if not samples:
+            return (0.0, 0.0, 0.0)
+        last = len(samples) - 1
+        return tuple(samples[int(last * q)] / 1e6 for q in (0.50, 0.95, 0.99))
+
+    def summary(self):
+        """Return [(phase, (p50, p95, p99))] with the whole frame first."""
+        now = time.perf_counter()
+        if now - self._summary_time >= 0.25:
+            names = sorted(self.samples, key=lambda name: name != "frame")
+            self._summary = [(name, self.percentiles(name)) for name in names]
+            self._summary_time = now
+        return self._summary
+
+    def toggle(self):
+        """Show or hide the on-screen overlay."""
+        self.visible = not self.visible
+
+    def draw_overlay(self, surface, x, y, font, width=None, names=None):
+        """
+        Draw the percentile table onto a surface.
+
+        Args:
+            names: Optional list of phases to show, defaults to all of them
+
+        Returns:
+            pygame.Rect: The area drawn over
+        """
+        lines = ["phase  p50/p95/p99 ms"]
+        for name, (p50, p95, p99) in self.summary():
+            if names is not None and name not in names:
+                continue
+            lines.append(f"{name[:10]:<10} {p50:.2f}/{p95:.2f}/{p99:.2f}")
+
+        rendered = [font.render(line, True, (220, 220, 120)) for line in lines]
+        line_height = font.get_linesize()
+        if width is None:
+            width = max(text.get_width() for text in rendered) + 8
+        rect = pygame.Rect(x, y, width, line_height * len(rendered) + 6)
+
+        panel = pygame.Surface(rect.size)
+        panel.set_alpha(200)
+        panel.fill((0, 0, 0))
+        surface.blit(panel, rect)
+        for i, text in enumerate(rendered):
+            surface.blit(text, (x + 4, y + 3 + i * line_height))
+        return rect
+
+    def export(self, path):
+        """Write the current percentiles for every phase as JSON."""
+        with open(path, 'w') as f:
+            json.dump({
+                "frames": self.frames,
+                "window": self.window,
+                "phases": {name: dict(zip(("p50_ms", "p95_ms", "p99_ms"), self.percentiles(name)))
+                           for name in self.samples}
+            }, f, indent=2)
+
+    def close(self):
+        if self.summary_path and self.frames:
+            self.export(self.summary_path)
+            self.summary_path = None
+        if self.export_file:
+            self.export_file.close()
+            self.export_file = None
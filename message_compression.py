@@ -0,0 +1,239 @@
+import json
+import threading
+import zlib
+
+# Raw deflate with a 4 KB window and small hash tables: about 32 KB of zlib state per
+# connection on the server, and the window still spans several full-board messages
+WINDOW_BITS = -12
+MEM_LEVEL = 5
+LEVEL = 6
+
+# Sent uncompressed by the server in reply to a join asking for "compression": "zlib".
+# Every byte after it is compressed; it is a fixed string so the client can find that point.
+COMPRESSION_ACK = b'{"type": "compression", "algorithm": "zlib"}'
+
+def typical_grid(filled_rows):
+    """A board as seen mid-game: empty above a partly filled stack"""
+    grid = [[0] * 10 for _ in range(20 - filled_rows)]
+    patterns = [[1, 1, 0, 2, 2, 2, 3, 3, 0, 4], [5, 5, 5, 0, 6, 6, 7, 7, 7, 0], [8, 8, 8, 8, 0, 8, 8, 8, 8, 8]]
+    grid += [patterns[i % len(patterns)] for i in range(filled_rows)]
+    return grid
+
+def build_dictionary():
+    """
+    Preset dictionary of the messages the server sends most.
+
+    zlib finds matches in the dictionary as if it had just been sent, and
+    nearer bytes are cheaper to refer to, so the most common message, an
+    opponent_update with a full board, comes last.
+    """
+    samples = [
+        {"type": "player_id", "id": "00000000-0000-0000-0000-000000000000"},
+        {"type": "high_scores", "scores": [["Player", 1200], ["Player", 800]]},
+        {"type": "game_start", "opponent_name": "Player"},
+        {"type": "game_over", "winner": "00000000-0000-0000-0000-000000000000"},
+        {"type": "opponent_disconnected"},
+        {"type": "add_lines", "lines": 2},
+        {"type": "ping", "t": 12345.678901},
+        {"type": "spectate_frame", "match": "0123abcd", "seq": 1, "key": False,
+         "players": [{"score": 100, "rows": [[19, [1, 1, 0, 2, 2, 2, 3, 3, 0, 4]]]}]},
+        {"type": "opponent_update", "grid": typical_grid(6), "score": 1200, "t": 12345.678901,
+         "piece": {"shape": [[1, 1, 1, 1]], "color": 0, "x": 3, "y": 0, "fall": 0.25}, "fall_speed": 0.5}
+    ]
+    dictionary = b"".join(json.dumps(sample).encode() for sample in samples)
+    # Only the last window's worth of the dictionary can be referenced
+    return dictionary[-(1 << -WINDOW_BITS):]
+
+PRESET_DICTIONARY = build_dictionary()
+
+def compressor():
+    return zlib.compressobj(LEVEL, zlib.DEFLATED, WINDOW_BITS, MEM_LEVEL, zlib.Z_DEFAULT_STRATEGY, PRESET_DICTIONARY)
+
+def decompressor():
+    return zlib.decompressobj(WINDOW_BITS, PRESET_DICTIONARY)
+
+def split_after_ack(data):
+    """
+    Split received bytes at the end of COMPRESSION_ACK.
+
+    Returns:
+        tuple: (bytes up to and including the acknowledgement, compressed bytes after it),
+               or None if the acknowledgement is not in data
+    """
+    index = data.find(COMPRESSION_ACK)
+    if index < 0:
+        return None
+    end = index + len(COMPRESSION_ACK)
+    return data[:end], data[end:]
+
+class CompressedSocket:
+    """
+    Wraps a client socket so everything sent on it is one zlib stream.
+
+    Each message is flushed with Z_SYNC_FLUSH, so the client can decode it as
+    soon as it arrives while later messages still refer back to earlier
+    ones. Sends are serialized by a lock, since the compressor state must
+    follow the order the bytes go out in.
+
+    Broadcast frames can instead be compressed once by a FrameCompressor and
+    spliced into every subscriber's stream with send_frame().
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.compressor = compressor()
+        self.lock = threading.Lock()
+        self.pending = b""  # Compressed bytes a non-blocking send() could not write yet
+        self.reset = False  # No message since the last full flush
+
+    def compress(self, data):
+        self.reset = False
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def sendall(self, data):
+        with self.lock:
+            if self.pending:
+                self.sock.sendall(self.pending)
+                self.pending = b""
+            self.sock.sendall(self.compress(data))
+
+    def send(self, data, flags=0):
+        """
+        Send one whole message without waiting, for the spectator broadcast.
+
+        The message is either taken - compressed, with any part the socket
+        buffer could not hold kept and written before the next message - or
+        skipped and left out of the stream.
+
+        Returns:
+            int: len(data) if the message was taken, 0 if it was skipped
+        """
+        return self._send_whole(data, lambda: self.compress(data), flags)
+
+    def send_frame(self, data, frame, flags=0):
+        """
+        Send a message compressed by a FrameCompressor, the same way as send().
+
+        The frame refers to nothing before it, so it follows a full flush of
+        this connection's compressor, which keeps later messages from
+        referring back into bytes the compressor did not produce.
+
+        Args:
+            data: The message
+            frame: data as compressed by FrameCompressor.compress()
+
+        Returns:
+            int: len(data) if the message was taken, 0 if it was skipped
+        """
+        def splice():
+            if self.reset:
+                return frame
+            self.reset = True
+            return self.compressor.flush(zlib.Z_FULL_FLUSH) + frame
+        return self._send_whole(data, splice, flags)
+
+    def _send_whole(self, data, encode, flags):
+        """Send encode() after anything pending, keeping what the socket does not take"""
+        if not self.lock.acquire(blocking=False):
+            return 0
+        try:
+            if not self._send_pending(flags):
+                return 0
+
+            out = encode()
+            try:
+                sent = self.sock.send(out, flags)
+            except BlockingIOError:
+                sent = 0
+            self.pending = out[sent:]
+            return len(data)
+        finally:
+            self.lock.release()
+
+    def flush(self, flags=0):
+        """
+        Write what send() left pending, without waiting.
+
+        Until it is written the client holds a message cut short, so the
+        sender calls this again on later ticks while nothing else is sent.
+
+        Returns:
+            bool: Whether nothing is left pending
+        """
+        if not self.lock.acquire(blocking=False):
+            return False
+        try:
+            return self._send_pending(flags)
+        finally:
+            self.lock.release()
+
+    def _send_pending(self, flags):
+        """Called with the lock held. Returns whether nothing is left pending"""
+        if self.pending:
+            try:
+                self.pending = self.pending[self.sock.send(self.pending, flags):]
+            except BlockingIOError:
+                pass
+        return not self.pending
+
+    def fileno(self):
+        return self.sock.fileno()
+
+    def shutdown(self, how):
+        self.sock.shutdown(how)
+
+    def close(self):
+        self.sock.close()
+
+class FrameCompressor:
+    """
+    Compresses each broadcast frame once for all compressed subscribers.
+
+    Every frame ends with a full flush, so it refers to nothing before it and
+    decodes the same whatever stream it is spliced into. Without the history
+    of a connection's own stream or the dictionary, a frame compresses less
+    well than it would per connection, but the cost no longer grows with the
+    number of subscribers.
+    """
+
+    def __init__(self):
+        # No dictionary: the spliced frame cannot know where it sits in a stream
+        self.compressor = zlib.compressobj(LEVEL, zlib.DEFLATED, WINDOW_BITS, MEM_LEVEL, zlib.Z_DEFAULT_STRATEGY)
+
+    def compress(self, data):
+        return self.compressor.compress(data) + self.compressor.flush(zlib.Z_FULL_FLUSH)
+
+class Decompressor:
+    """Client side: decodes received bytes once the server has acknowledged compression"""
+
+    def __init__(self):
+        self.decompressor = None
+        self.held = b""  # Received bytes that may be the start of the acknowledgement
+        self.compressed_bytes = 0
+        self.plain_bytes = 0
+
+    def feed(self, data):
+        """
+        Returns:
+            bytes: The plain bytes received, decompressed where needed
+        """
+        if self.decompressor is None:
+            data = self.held + data
+            split = split_after_ack(data)
+            if split is None:
+                # Hold back a tail that could be the acknowledgement split across two recv() calls
+                for keep in range(min(len(COMPRESSION_ACK) - 1, len(data)), 0, -1):
+                    if data.endswith(COMPRESSION_ACK[:keep]):
+                        self.held = data[-keep:]
+                        return data[:-keep]
+                self.held = b""
+                return data
+            self.held = b""
+            plain, data = split
+            self.decompressor = decompressor()
+        else:
+            plain = b""
+        self.compressed_bytes += len(data)
+        decoded = self.decompressor.decompress(data)
+        self.plain_bytes += len(decoded)
+        return plain + decoded
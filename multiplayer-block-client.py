@@ -1,11 +1,18 @@
-import pygame
+import os
+import queue
 import random
-import socket
-import threading
-import json
 import sys
+import threading
 import time
-import copy
+from collections import deque
+
+import pygame
+
+from frame_profiler import FrameProfiler
+from network_session import NetworkSession
+from scaled_display import ScaledDisplay
+from snapshot_buffer import SnapshotBuffer
+from tetris_bot import TetrisBot, BotGame
 
 # Constants for the game
 SCREEN_WIDTH = 800
@@ -41,72 +48,90 @@ SHAPES = [
 # Define colors for shapes
 SHAPE_COLORS = [CYAN, YELLOW, MAGENTA, ORANGE, BLUE, GREEN, RED]
 
-class SimpleTetrisBot:
-    def __init__(self, difficulty='medium'):
+class BotOpponent:
+    """
+    Runs a TetrisBot on its own simulated board and piece stream in a background thread.
+    
+    The render thread never touches the bot's board. Every placement is
+    published as an immutable snapshot through a queue, and junk lines sent
+    by the player travel to the bot through a second queue.
+    """
+    def __init__(self, difficulty='medium', seed=None):
         self.difficulty = difficulty
+        if seed is None:
+            seed = random.randrange(2 ** 32)
+        self.game = BotGame(TetrisBot(difficulty), seed)
+        self.junk_rng = random.Random(seed + 1)
         self.running = False
+        self.stopped = threading.Event()  # Wakes the bot thread from its move delay
         self.thread = None
-        self.opponent_grid = None
-        
-        # Adjust timings based on difficulty
-        if difficulty == 'easy':
-            self.move_delay = 1.5
-            self.attack_chance = 0.3
-            self.clear_chance = 0.1
-        elif difficulty == 'medium':
-            self.move_delay = 1.0
-            self.attack_chance = 0.5
-            self.clear_chance = 0.2
-        else:  # hard
-            self.move_delay = 0.5
-            self.attack_chance = 0.7
-            self.clear_chance = 0.3
+        
+        self.events = queue.SimpleQueue()         # Bot thread -> render thread
+        self.incoming_junk = queue.SimpleQueue()  # Render thread -> bot thread
     
-    def start(self, opponent_grid, attack_callback):
-        """Start the bot with references to game state"""
-        self.opponent_grid = opponent_grid
-        self.attack_callback = attack_callback
+    def start(self):
+        """Start the bot"""
         self.running = True
         self.thread = threading.Thread(target=self._run)
         self.thread.daemon = True
         self.thread.start()
     
     def stop(self):
-        """Stop the bot"""
+        """Stop the bot and wait for its thread, so it posts no events afterwards"""
         self.running = False
+        self.stopped.set()
+        if self.thread and self.thread is not threading.current_thread():
+            # At most one decision's search budget
+            self.thread.join(timeout=1.0)
         self.thread = None
     
+    def send_junk_lines(self, num_lines):
+        """Queue junk lines for the bot's board"""
+        if num_lines > 0:
+            self.incoming_junk.put(num_lines)
+    
+    def poll(self):
+        """Return every event published since the last call"""
+        events = []
+        while True:
+            try:
+                events.append(self.events.get_nowait())
+            except queue.Empty:
+                return events
+    
+    def _publish_board(self):
+        snapshot = tuple(tuple(row) for row in self.game.bot.grid)
+        self.events.put(("board", snapshot, self.game.score))
+    
     def _run(self):
         """Main bot loop"""
+        move_delay = self.game.bot.settings[self.difficulty]['move_delay']
+        self._publish_board()
+        
         while self.running:
+            # Wait before next move
+            if self.stopped.wait(move_delay):
+                break
+            
+            # Apply junk lines from the player
+            while True:
+                try:
+                    num_lines = self.incoming_junk.get_nowait()
+                except queue.Empty:
+                    break
+                self.game.add_junk_lines(num_lines, self.junk_rng)
+            
             # Make a move
-            if self.opponent_grid:
-                self._make_move()
+            lines_cleared = self.game.play_piece()
+            if not self.running:
+                break
             
-            # Wait before next move
-            time.sleep(self.move_delay)
-    
-    def _make_move(self):
-        """Make a move in the game"""
-        # Randomly decide whether to clear lines
-        if random.random() < self.clear_chance:
-            # Clear a random line
-            lines_cleared = random.randint(1, 2)
-            
-            # Add some completed lines
-            for _ in range(lines_cleared):
-                line_index = random.randint(GRID_HEIGHT - 5, GRID_HEIGHT - 1)
-                self.opponent_grid[line_index] = [random.randint(1, 7) for _ in range(GRID_WIDTH)]
-            
-            # Then clear them
-            for y in range(GRID_HEIGHT):
-                if all(cell != 0 for cell in self.opponent_grid[y]):
-                    self.opponent_grid.pop(y)
-                    self.opponent_grid.insert(0, [0 for _ in range(GRID_WIDTH)])
-            
-            # Maybe attack player
-            if random.random() < self.attack_chance:
-                self.attack_callback(lines_cleared)
+            self._publish_board()
+            if lines_cleared > 0:
+                self.events.put(("attack", lines_cleared))
+            if self.game.game_over:
+                self.events.put(("game_over",))
+                self.running = False
 
 class Tetromino:
     def __init__(self, x, y, shape_idx=None):
@@ -142,8 +167,9 @@ class Tetromino:
         return positions
 
 class MainMenu:
-    def __init__(self, screen):
-        self.screen = screen
+    def __init__(self, display):
+        self.display = display
+        self.screen = display.canvas
         self.font = pygame.font.SysFont(None, 36)
         self.title_font = pygame.font.SysFont(None, 64)
         self.selected = 0
@@ -164,10 +190,11 @@ class MainMenu:
             rect = text.get_rect(center=(SCREEN_WIDTH // 2, 300 + i * 50))
             self.screen.blit(text, rect)
         
-        pygame.display.flip()
+        self.display.present()
     
     def handle_input(self):
         for event in pygame.event.get():
+            self.display.handle_event(event)
             if event.type == pygame.QUIT:
                 return "exit"
             
@@ -199,8 +226,9 @@ class MainMenu:
             clock.tick(60)
 
 class BotDifficultyMenu:
-    def __init__(self, screen):
-        self.screen = screen
+    def __init__(self, display):
+        self.display = display
+        self.screen = display.canvas
         self.font = pygame.font.SysFont(None, 36)
         self.title_font = pygame.font.SysFont(None, 48)
         self.selected = 0
@@ -221,10 +249,11 @@ class BotDifficultyMenu:
             rect = text.get_rect(center=(SCREEN_WIDTH // 2, 300 + i * 50))
             self.screen.blit(text, rect)
         
-        pygame.display.flip()
+        self.display.present()
     
     def handle_input(self):
         for event in pygame.event.get():
+            self.display.handle_event(event)
             if event.type == pygame.QUIT:
                 return "exit"
             
@@ -258,12 +287,17 @@ class BotDifficultyMenu:
             clock.tick(60)
 
 class TetrisGame:
-    def __init__(self, server_host='127.0.0.1', server_port=5555, game_mode="single"):
+    def __init__(self, server_host='127.0.0.1', server_port=5555, game_mode="single", display=None, session=None):
         # Initialize Pygame
         pygame.init()
-        self.screen = pygame.display.set_mode((SCREEN_WIDTH, SCREEN_HEIGHT))
-        pygame.display.set_caption("Tetris")
+        
+        # The game is drawn at 800x600 and scaled to the (resizable) window
+        self.display = display or ScaledDisplay((SCREEN_WIDTH, SCREEN_HEIGHT))
+        self.screen = self.display.canvas
         self.clock = pygame.time.Clock()
+        
+        # Pre-rendered blocks, one per color
+        self.tiles = {color: self.make_tile(color) for color in SHAPE_COLORS + [GRAY]}
 
         # Game state
         self.player_grid = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
@@ -288,84 +322,77 @@ class TetrisGame:
         # High scores (for single player mode)
         self.high_scores = []
         
-        # Network
-        self.client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        self.server_host = server_host
-        self.server_port = server_port
-        self.connected = False
-        self.player_id = None
+        # Network, the session stays connected across games when one is passed in
+        self.owns_session = session is None
+        self.session = session or NetworkSession(server_host, server_port)
+        self.player_id = self.session.player_id
         
-        # Message queue
-        self.message_queue = []
-        self.lock = threading.Lock()
+        # Network statistics
+        self.messages_received = 0
+        self.updates_coalesced = 0
+        self.queue_depth = 0
+        self.max_queue_depth = 0
+        self.message_latency = deque(maxlen=600)  # seconds from recv() to being applied
+        
+        # Grid updates are sent at a fixed rate, the opponent's are played back smoothly
+        self.grid_update_interval = 0.1
+        self.last_grid_update = 0
+        self.opponent_snapshots = SnapshotBuffer()
+        self.opponent_piece = None
         
         # Fonts
         self.font = pygame.font.SysFont(None, 24)
         self.title_font = pygame.font.SysFont(None, 36)
+        self.profiler_font = pygame.font.SysFont(None, 18)
+        
+        # Frame profiler, F3 toggles the overlay, TETRIS_PROFILE streams frames to a file
+        # and TETRIS_PROFILE_SUMMARY gets the percentiles when the game ends
+        self.profiler = FrameProfiler(export_path=os.environ.get("TETRIS_PROFILE"),
+                                      summary_path=os.environ.get("TETRIS_PROFILE_SUMMARY"))
 
     def initialize_bot(self):
         """Initialize the bot player."""
-        self.bot = SimpleTetrisBot(self.bot_difficulty)
+        self.bot = BotOpponent(self.bot_difficulty)
         self.opponent_name = f"Bot ({self.bot_difficulty})"
         
         # Start bot in a separate thread
-        self.bot.start(self.opponent_grid, self.add_junk_lines)
+        self.bot.start()
+
+    @property
+    def connected(self):
+        return self.session.connected
 
     def connect_to_server(self):
-        try:
-            self.client_socket.connect((self.server_host, self.server_port))
-            self.connected = True
-            print("Connected to server")
-            
-            # Start a thread to receive messages from the server
-            receive_thread = threading.Thread(target=self.receive_messages)
-            receive_thread.daemon = True
-            receive_thread.start()
-            
-            # Request player ID from server and specify game mode
-            self.send_message({
-                "type": "join", 
-                "name": self.player_name,
-                "mode": self.game_mode
-            })
-            
-            return True
-        except Exception as e:
-            print(f"Connection error: {e}")
+        if not self.session.connect():
             return False
+        
+        # Drop anything left over from the previous game
+        self.session.drain()
+        
+        # Request player ID from server and specify game mode
+        self.session.join(self.player_name, self.game_mode)
+        return True
 
     def send_message(self, message):
-        try:
-            self.client_socket.send(json.dumps(message).encode())
-        except Exception as e:
-            print(f"Send error: {e}")
-            self.connected = False
-
-    def receive_messages(self):
-        while self.connected:
-            try:
-                data = self.client_socket.recv(4096)
-                if not data:
-                    print("Server disconnected")
-                    self.connected = False
-                    break
-                
-                message = json.loads(data.decode())
-                
-                with self.lock:
-                    self.message_queue.append(message)
-                    
-            except Exception as e:
-                print(f"Receive error: {e}")
-                self.connected = False
-                break
+        self.session.send(message)
 
     def process_messages(self):
-        with self.lock:
-            messages = self.message_queue.copy()
-            self.message_queue.clear()
-        
-        for message in messages:
+        messages = self.session.drain()
+        self.queue_depth = len(messages)
+        if not messages:
+            return
+        
+        self.messages_received += len(messages)
+        self.max_queue_depth = max(self.max_queue_depth, len(messages))
+        
+        # Every opponent board goes to the interpolation buffer, but a frame draws
+        # only one state, so all but one update of a batch are never seen on screen
+        updates = sum(message.get("type") == "opponent_update" for _, message in messages)
+        self.updates_coalesced += max(0, updates - 1)
+        
+        now = time.perf_counter()
+        for received, message in messages:
+            self.message_latency.append(now - received)
             message_type = message.get("type")
             
             if message_type == "player_id":
@@ -374,11 +401,12 @@ class TetrisGame:
             
             elif message_type == "game_start":
                 self.opponent_name = message["opponent_name"]
+                self.opponent_snapshots.clear()
+                self.opponent_piece = None
                 print(f"Game started against {self.opponent_name}")
             
             elif message_type == "opponent_update":
-                self.opponent_grid = message["grid"]
-                self.opponent_score = message["score"]
+                self.opponent_snapshots.push(received, message)
             
             elif message_type == "add_lines":
                 if self.game_mode == "multiplayer":
@@ -397,6 +425,35 @@ class TetrisGame:
                 self.high_scores = message.get("scores", [])
                 print("Received high scores from server")
                 
+    def process_bot_events(self):
+        for event in self.bot.poll():
+            event_type = event[0]
+            
+            if event_type == "board":
+                # Snapshots are immutable, so they can be drawn as they are
+                self.opponent_grid = event[1]
+                self.opponent_score = event[2]
+            
+            elif event_type == "attack":
+                self.add_junk_lines(event[1])
+            
+            elif event_type == "game_over":
+                print("You won!")
+                self.game_over = True
+                
+    def network_stats(self):
+        """Return message counts, queue depth and recv-to-apply latency percentiles in ms."""
+        latency = sorted(self.message_latency)
+        last = len(latency) - 1
+        return {
+            "received": self.messages_received,
+            "coalesced": self.updates_coalesced,
+            "queue_depth": self.queue_depth,
+            "max_queue_depth": self.max_queue_depth,
+            "latency_p50_ms": latency[last // 2] * 1000 if latency else 0.0,
+            "latency_p99_ms": latency[int(last * 0.99)] * 1000 if latency else 0.0
+        }
+
     def add_junk_lines(self, num_lines):
         # Shift the grid up by num_lines
         for i in range(num_lines):
@@ -416,6 +473,9 @@ class TetrisGame:
         # If it does, move it up
         while self.check_collision():
             self.current_piece.y -= 1
+        
+        # Send the changed grid straight away
+        self.last_grid_update = 0
 
     def check_collision(self):
         positions = self.current_piece.get_positions()
@@ -468,22 +528,11 @@ class TetrisGame:
                     "lines": lines_cleared
                 })
             # In bot mode, send cleared lines to bot opponent
-            elif self.game_mode == "bot" and lines_cleared > 0:
-                # Add junk lines to bot's grid
-                for i in range(lines_cleared):
-                    # Remove bot's top line
-                    self.opponent_grid.pop(0)
-                    
-                    # Add a junk line at the bottom
-                    new_line = [0] * GRID_WIDTH
-                    gap = random.randint(0, GRID_WIDTH - 1)
-                    for j in range(GRID_WIDTH):
-                        if j != gap:
-                            new_line[j] = 8  # Gray blocks
-                    self.opponent_grid.append(new_line)
-                
-                # Increase opponent score a bit anyway
-                self.opponent_score += lines_cleared * 50
+            elif self.game_mode == "bot" and self.bot:
+                self.bot.send_junk_lines(lines_cleared)
+        
+        # Send the changed grid straight away
+        self.last_grid_update = 0
         
         # Update level
         self.level = max(1, self.lines_cleared // 10 + 1)
@@ -522,6 +571,12 @@ class TetrisGame:
         
         return len(lines_to_clear)
 
+    def make_tile(self, color):
+        tile = pygame.Surface((GRID_SIZE, GRID_SIZE)).convert()
+        tile.fill(color)
+        pygame.draw.rect(tile, WHITE, (0, 0, GRID_SIZE, GRID_SIZE), 1)
+        return tile
+
     def draw_grid(self, grid, x_offset, y_offset, title):
         # Draw title
         title_text = self.title_font.render(title, True, WHITE)
@@ -534,7 +589,8 @@ class TetrisGame:
                          GRID_WIDTH * GRID_SIZE + 2, GRID_HEIGHT * GRID_SIZE + 2), 
                         1)
         
-        # Draw grid cells
+        # Draw grid cells in one batch
+        blocks = []
         for y in range(GRID_HEIGHT):
             for x in range(GRID_WIDTH):
                 cell_value = grid[y][x]
@@ -543,28 +599,19 @@ class TetrisGame:
                         color = GRAY
                     else:
                         color = SHAPE_COLORS[cell_value - 1]
-                    pygame.draw.rect(self.screen, color, 
-                                   (x_offset + x * GRID_SIZE, y_offset + y * GRID_SIZE, 
-                                    GRID_SIZE, GRID_SIZE))
-                    pygame.draw.rect(self.screen, WHITE, 
-                                   (x_offset + x * GRID_SIZE, y_offset + y * GRID_SIZE, 
-                                    GRID_SIZE, GRID_SIZE), 
-                                   1)
+                    blocks.append((self.tiles[color], (x_offset + x * GRID_SIZE, y_offset + y * GRID_SIZE)))
+        self.screen.blits(blocks, False)
 
     def draw_piece(self, piece, x_offset, y_offset):
-        shape = piece.get_shape()
+        self.draw_shape(piece.get_shape(), piece.color, piece.x, piece.y, x_offset, y_offset)
+
+    def draw_shape(self, shape, color, piece_x, piece_y, x_offset, y_offset):
+        tile = self.tiles[color]
         for y, row in enumerate(shape):
             for x, cell in enumerate(row):
                 if cell:
-                    pygame.draw.rect(self.screen, piece.color, 
-                                   (x_offset + (piece.x + x) * GRID_SIZE, 
-                                    y_offset + (piece.y + y) * GRID_SIZE, 
-                                    GRID_SIZE, GRID_SIZE))
-                    pygame.draw.rect(self.screen, WHITE, 
-                                   (x_offset + (piece.x + x) * GRID_SIZE, 
-                                    y_offset + (piece.y + y) * GRID_SIZE, 
-                                    GRID_SIZE, GRID_SIZE), 
-                                   1)
+                    self.screen.blit(tile, (x_offset + (piece_x + x) * GRID_SIZE, 
+                                            y_offset + (piece_y + y) * GRID_SIZE))
 
     def draw_next_piece(self, x_offset, y_offset):
         # Draw next piece box
@@ -578,19 +625,7 @@ class TetrisGame:
         self.screen.blit(next_text, next_rect)
         
         # Draw next piece
-        shape = self.next_piece.get_shape()
-        for y, row in enumerate(shape):
-            for x, cell in enumerate(row):
-                if cell:
-                    pygame.draw.rect(self.screen, self.next_piece.color, 
-                                   (x_offset + (x + 1) * GRID_SIZE, 
-                                    y_offset + (y + 1) * GRID_SIZE, 
-                                    GRID_SIZE, GRID_SIZE))
-                    pygame.draw.rect(self.screen, WHITE, 
-                                   (x_offset + (x + 1) * GRID_SIZE, 
-                                    y_offset + (y + 1) * GRID_SIZE, 
-                                    GRID_SIZE, GRID_SIZE), 
-                                   1)
+        self.draw_shape(self.next_piece.get_shape(), self.next_piece.color, 1, 1, x_offset, y_offset)
 
     def draw_stats(self, x_offset, y_offset):
         # Draw stats box
@@ -633,6 +668,7 @@ class TetrisGame:
             y_pos += 30
 
     def draw(self):
+        phase = self.profiler.phase
         self.screen.fill(BLACK)
         
         if self.game_mode == "single":
@@ -641,20 +677,25 @@ class TetrisGame:
             grid_offset_y = 50
             
             # Draw player grid
-            self.draw_grid(self.player_grid, grid_offset_x, grid_offset_y, f"{self.player_name}")
+            with phase("board"):
+                self.draw_grid(self.player_grid, grid_offset_x, grid_offset_y, f"{self.player_name}")
             
             # Draw current piece
-            self.draw_piece(self.current_piece, grid_offset_x, grid_offset_y)
+            with phase("piece"):
+                self.draw_piece(self.current_piece, grid_offset_x, grid_offset_y)
             
             # Draw next piece
-            self.draw_next_piece(grid_offset_x + GRID_WIDTH * GRID_SIZE + 20, grid_offset_y)
+            with phase("sidebar"):
+                self.draw_next_piece(grid_offset_x + GRID_WIDTH * GRID_SIZE + 20, grid_offset_y)
             
             # Draw stats
-            self.draw_stats(grid_offset_x + GRID_WIDTH * GRID_SIZE + 20, grid_offset_y + 7 * GRID_SIZE)
+            with phase("sidebar"):
+                self.draw_stats(grid_offset_x + GRID_WIDTH * GRID_SIZE + 20, grid_offset_y + 7 * GRID_SIZE)
             
             # Draw high scores
-            if self.high_scores:
-                self.draw_high_scores(grid_offset_x - SIDEBAR_WIDTH - 20, grid_offset_y)
+            with phase("sidebar"):
+                if self.high_scores:
+                    self.draw_high_scores(grid_offset_x - SIDEBAR_WIDTH - 20, grid_offset_y)
         else:
             # Multiplayer or Bot mode - two grids side by side
             player_offset_x = 50
@@ -662,39 +703,65 @@ class TetrisGame:
             grid_offset_y = 50
             
             # Draw player grid
-            self.draw_grid(self.player_grid, player_offset_x, grid_offset_y, f"{self.player_name}")
+            with phase("board"):
+                self.draw_grid(self.player_grid, player_offset_x, grid_offset_y, f"{self.player_name}")
             
             # Draw current piece
-            self.draw_piece(self.current_piece, player_offset_x, grid_offset_y)
+            with phase("piece"):
+                self.draw_piece(self.current_piece, player_offset_x, grid_offset_y)
             
             # Draw opponent grid
-            self.draw_grid(self.opponent_grid, opponent_offset_x, grid_offset_y, f"{self.opponent_name}")
+            with phase("board"):
+                self.draw_grid(self.opponent_grid, opponent_offset_x, grid_offset_y, f"{self.opponent_name}")
+            
+            # Draw opponent's falling piece
+            with phase("piece"):
+                if self.opponent_piece:
+                    piece = self.opponent_piece
+                    self.draw_shape(piece["shape"], SHAPE_COLORS[piece["color"]], piece["x"], piece["y"],
+                                    opponent_offset_x, grid_offset_y)
             
             # Draw next piece
-            self.draw_next_piece(player_offset_x + GRID_WIDTH * GRID_SIZE + 20, grid_offset_y)
+            with phase("sidebar"):
+                self.draw_next_piece(player_offset_x + GRID_WIDTH * GRID_SIZE + 20, grid_offset_y)
             
             # Draw stats
-            self.draw_stats(player_offset_x + GRID_WIDTH * GRID_SIZE + 20, grid_offset_y + 7 * GRID_SIZE)
+            with phase("sidebar"):
+                self.draw_stats(player_offset_x + GRID_WIDTH * GRID_SIZE + 20, grid_offset_y + 7 * GRID_SIZE)
         
         # Draw game over message
-        if self.game_over:
-            game_over_text = self.title_font.render("GAME OVER", True, RED)
-            game_over_rect = game_over_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
-            self.screen.blit(game_over_text, game_over_rect)
-            
-            restart_text = self.font.render("Press R to restart or ESC to exit", True, WHITE)
-            restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 40))
-            self.screen.blit(restart_text, restart_rect)
-        
-        pygame.display.flip()
+        with phase("overlay"):
+            if self.game_over:
+                game_over_text = self.title_font.render("GAME OVER", True, RED)
+                game_over_rect = game_over_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2))
+                self.screen.blit(game_over_text, game_over_rect)
+            
+                restart_text = self.font.render("Press R to restart or ESC to exit", True, WHITE)
+                restart_rect = restart_text.get_rect(center=(SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2 + 40))
+                self.screen.blit(restart_text, restart_rect)
+        
+        # Draw frame profiler overlay
+        with phase("overlay"):
+            if self.profiler.visible:
+                rect = self.profiler.draw_overlay(self.screen, 5, 5, self.profiler_font)
+                if self.connected:
+                    stats = self.network_stats()
+                    net_text = self.profiler_font.render(
+                        f"net q={stats['queue_depth']}/{stats['max_queue_depth']} "
+                        f"lat={stats['latency_p50_ms']:.1f}/{stats['latency_p99_ms']:.1f}ms "
+                        f"skip={stats['coalesced']}", True, (220, 220, 120))
+                    self.screen.blit(net_text, (rect.x + 4, rect.bottom + 2))
 
     def handle_input(self):
         for event in pygame.event.get():
+            self.display.handle_event(event)
             if event.type == pygame.QUIT:
                 return False
             
             if event.type == pygame.KEYDOWN:
-                if not self.game_over:
+                if event.key == pygame.K_F3:
+                    self.profiler.toggle()
+                elif not self.game_over:
                     if event.key == pygame.K_LEFT:
                         self.move_piece(-1, 0)
                     elif event.key == pygame.K_RIGHT:
@@ -719,6 +786,8 @@ class TetrisGame:
     def reset_game(self):
         self.player_grid = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
         self.opponent_grid = [[0 for _ in range(GRID_WIDTH)] for _ in range(GRID_HEIGHT)]
+        self.opponent_snapshots.clear()
+        self.opponent_piece = None
         self.current_piece = Tetromino(GRID_WIDTH // 2 - 1, 0)
         self.next_piece = Tetromino(GRID_WIDTH // 2 - 1, 0)
         self.game_over = False
@@ -739,4 +808,137 @@ class TetrisGame:
         if self.game_mode == "multiplayer" and self.connected:
             self.send_message({
                 "type": "ready_for_new_game"
-            })
\ No newline at end of file
+            })
+
+    def update(self):
+        # Process network messages
+        if self.connected:
+            with self.profiler.phase("network"):
+                self.process_messages()
+            
+            # Show the opponent's board as it was a moment ago
+            opponent = self.opponent_snapshots.sample(time.perf_counter())
+            if opponent:
+                self.opponent_grid, self.opponent_score, self.opponent_piece = opponent
+        
+        # Apply the bot opponent's moves
+        if self.game_mode == "bot" and self.bot:
+            self.process_bot_events()
+        
+        if not self.game_over:
+            # Check if it's time to move the piece down
+            current_time = time.time()
+            if current_time - self.last_fall_time >= self.fall_speed:
+                if not self.move_piece(0, 1):
+                    self.lock_piece()
+                self.last_fall_time = current_time
+            
+            # Send periodic grid updates to server
+            if self.connected and current_time - self.last_grid_update >= self.grid_update_interval:
+                self.send_message({
+                    "type": "grid_update",
+                    "grid": self.player_grid,
+                    "score": self.score,
+                    "mode": self.game_mode,
+                    # Sender clock, falling piece and gravity for the opponent's interpolation
+                    "t": time.perf_counter(),
+                    "piece": {
+                        "shape": self.current_piece.shape,
+                        "color": self.current_piece.shape_idx,
+                        "x": self.current_piece.x,
+                        "y": self.current_piece.y,
+                        "fall": current_time - self.last_fall_time
+                    },
+                    "fall_speed": self.fall_speed
+                })
+                self.last_grid_update = current_time
+
+    def run(self):
+        if self.game_mode == "bot":
+            # Bot games are played locally
+            self.initialize_bot()
+        elif not self.connect_to_server():
+            # Connect to server first
+            print("Failed to connect to server. Running in offline mode.")
+        
+        # Main game loop
+        running = True
+        while running:
+            self.profiler.begin_frame()
+            with self.profiler.phase("input"):
+                running = self.handle_input()
+            with self.profiler.phase("update"):
+                self.update()
+            with self.profiler.phase("draw"):
+                self.draw()
+            with self.profiler.phase("display.update"):
+                self.display.present()
+            self.profiler.end_frame()
+            self.clock.tick(60)
+        
+        # Clean up
+        self.profiler.close()
+        if self.bot:
+            self.bot.stop()
+        if self.owns_session:
+            self.session.close()
+        else:
+            self.session.leave()
+        
+        return "menu"  # Return to menu
+
+if __name__ == "__main__":
+    # Initialize pygame
+    pygame.init()
+    display = ScaledDisplay((SCREEN_WIDTH, SCREEN_HEIGHT), "Tetris")
+    
+    # Parse command line arguments for server host and port
+    server_host = '127.0.0.1'
+    server_port = 5555
+    
+    if len(sys.argv) > 1:
+        server_host = sys.argv[1]
+    if len(sys.argv) > 2:
+        server_port = int(sys.argv[2])
+    
+    # Get player name
+    player_name = "Player"
+    if len(sys.argv) > 3:
+        player_name = sys.argv[3]
+    
+    # Optional "zlib" to have the server compress what it sends
+    compression = len(sys.argv) > 4 and sys.argv[4] == "zlib"
+    
+    # One server connection for the whole run, opened by the first network game
+    session = NetworkSession(server_host, server_port, compression)
+    
+    while True:
+        # Show main menu
+        menu = MainMenu(display)
+        choice = menu.run()
+        
+        if choice == "exit":
+            break
+        
+        # Pick the bot's difficulty
+        bot_difficulty = None
+        if choice == "bot":
+            bot_difficulty = BotDifficultyMenu(display).run()
+            if bot_difficulty == "exit":
+                break
+            if bot_difficulty == "back":
+                continue
+        
+        # Start game based on choice
+        game = TetrisGame(server_host, server_port, choice, display, session)
+        game.player_name = player_name
+        if bot_difficulty:
+            game.bot_difficulty = bot_difficulty
+        result = game.run()
+        
+        if result != "menu":
+            break
+    
+    session.close()
+    pygame.quit()
+    sys.exit()
@@ -0,0 +1,180 @@
+import json
+import queue
+import socket
+import threading
+import time
+
+from message_compression import Decompressor
+
+class NetworkSession:
+    """
+    Long-lived connection to the TetrisServer, shared by every game.
+
+    The socket and its receive thread are opened on the first connect() and
+    kept across the menu and later games, so starting another game is a
+    join message on the existing connection rather than a reconnect. The
+    server identifies players by connection, so the player id from the first
+    handshake stays valid for the whole session.
+    """
+
+    def __init__(self, host='127.0.0.1', port=5555, compression=False):
+        self.host = host
+        self.port = port
+        self.compression = compression  # Ask the server to zlib-compress what it sends
+        self.compression_requested = False
+        self.decompressor = None
+        self.client_socket = None
+        self.connected = False
+        self.player_id = None
+        self.receive_thread = None
+        self.send_lock = threading.Lock()  # The receive thread sends pongs alongside the game loop
+
+        # Messages handed from the receive thread to the game loop as (receive time, message)
+        self.messages = queue.SimpleQueue()
+
+    def connect(self):
+        """
+        Connect to the server unless already connected.
+
+        Returns:
+            bool: Whether the session is connected
+        """
+        if self.connected:
+            return True
+
+        # A connection that dropped is closed, and its receive thread finished, before a new one opens
+        self.disconnect()
+        client_socket = None
+        try:
+            client_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+            client_socket.connect((self.host, self.port))
+        except Exception as e:
+            print(f"Connection error: {e}")
+            if client_socket:
+                client_socket.close()
+            return False
+
+        self.client_socket = client_socket
+        self.connected = True
+        self.compression_requested = False
+        self.decompressor = Decompressor()
+        print("Connected to server")
+
+        # One receive thread for the lifetime of the connection, tied to its socket
+        self.receive_thread = threading.Thread(target=self.receive_messages, args=(client_socket, self.decompressor))
+        self.receive_thread.daemon = True
+        self.receive_thread.start()
+        return True
+
+    def send(self, message):
+        self.send_on(self.client_socket, message)
+
+    def send_on(self, client_socket, message):
+        """Send a message on the given connection; a failure only ends it if it is still the current one"""
+        try:
+            with self.send_lock:
+                client_socket.sendall(json.dumps(message).encode())
+        except Exception as e:
+            print(f"Send error: {e}")
+            if client_socket is self.client_socket:
+                self.connected = False
+
+    def join(self, name, mode):
+        """Start a game in the given mode on the existing connection."""
+        message = {
+            "type": "join",
+            "name": name,
+            "mode": mode
+        }
+        # Compression stays on for the rest of the connection once the server has switched
+        if self.compression and not self.compression_requested:
+            message["compression"] = "zlib"
+            self.compression_requested = True
+        self.send(message)
+
+    def leave(self):
+        """Tell the server this player left the current game, keeping the connection open."""
+        if self.connected:
+            self.send({"type": "leave_game"})
+
+    def drain(self):
+        """
+        Take every message received so far.
+
+        Returns:
+            list: (receive time, message) pairs in arrival order
+        """
+        messages = []
+        while True:
+            try:
+                messages.append(self.messages.get_nowait())
+            except queue.Empty:
+                return messages
+
+    def receive_messages(self, client_socket, decompressor):
+        """
+        Receive thread of one connection.
+
+        It only changes the session while its socket is the current one, so a
+        thread still finishing after a reconnect cannot end the new connection.
+        """
+        decoder = json.JSONDecoder()
+        buffer = ""
+        while self.connected and client_socket is self.client_socket:
+            try:
+                data = client_socket.recv(4096)
+                if client_socket is not self.client_socket:
+                    break
+                if not data:
+                    print("Server disconnected")
+                    self.connected = False
+                    break
+
+                received = time.perf_counter()
+                buffer += decompressor.feed(data).decode()
+
+                # One recv() can hold several messages, or only part of the last one
+                while True:
+                    buffer = buffer.lstrip()
+                    if not buffer:
+                        break
+                    try:
+                        message, end = decoder.raw_decode(buffer)
+                    except json.JSONDecodeError:
+                        break
+                    buffer = buffer[end:]
+
+                    if message.get("type") == "ping":
+                        # Answered here so a busy or paused game loop does not delay it
+                        self.send_on(client_socket, {"type": "pong", "t": message["t"]})
+                        continue
+                    if message.get("type") == "compression":
+                        continue
+                    if message.get("type") == "player_id":
+                        self.player_id = message["id"]
+                    self.messages.put((received, message))
+
+            except Exception as e:
+                if client_socket is self.client_socket:
+                    if self.connected:
+                        print(f"Receive error: {e}")
+                    self.connected = False
+                break
+
+    def disconnect(self):
+        """Close the current socket, if any, and wait for its receive thread to finish."""
+        self.connected = False
+        client_socket, self.client_socket = self.client_socket, None
+        if client_socket:
+            try:
+                client_socket.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+            client_socket.close()
+        receive_thread, self.receive_thread = self.receive_thread, None
+        if receive_thread and receive_thread is not threading.current_thread():
+            receive_thread.join(timeout=1.0)
+
+    def close(self):
+        """Close the connection."""
+        self.disconnect()
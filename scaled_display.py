@@ -0,0 +1,107 @@
+import pygame
+
+class ScaledDisplay:
+    """
+    Fixed-size off-screen canvas presented to a resizable window.
+
+    The game always draws into `canvas` at its native resolution, so tiles
+    are rendered once at one size and the per-frame drawing cost does not
+    depend on the window. present() copies the canvas to the window with a
+    single blit when the sizes match, or a single scale into the centred,
+    aspect-correct area of the window otherwise.
+    """
+
+    def __init__(self, size, caption="Tetris", vsync=False):
+        """
+        Args:
+            size (tuple): Native (width, height) of the canvas
+            caption (str): Window title
+            vsync (bool): Try a vsynced window scaled by SDL instead of by present()
+        """
+        self.size = size
+        self.sdl_scaled = False
+        self.window = None
+        if vsync:
+            try:
+                # SDL scales SCALED windows itself, so the canvas is presented 1:1
+                self.window = pygame.display.set_mode(size, pygame.SCALED | pygame.RESIZABLE, vsync=1)
+                self.sdl_scaled = True
+            except pygame.error:
+                # The driver does not support vsync, fall back to a normal window
+                pass
+        if self.window is None:
+            self.window = pygame.display.set_mode(size, pygame.RESIZABLE)
+        pygame.display.set_caption(caption)
+
+        self.canvas = pygame.Surface(size).convert()
+        self.layout()
+
+    def layout(self):
+        """Work out where the canvas goes after the window has been resized."""
+        self.window = pygame.display.get_surface()
+        window_width, window_height = self.window.get_size()
+        canvas_width, canvas_height = self.size
+
+        if self.sdl_scaled or (window_width, window_height) == self.size:
+            self.scale = 1.0
+            self.target = pygame.Rect((0, 0), self.size)
+        else:
+            self.scale = min(window_width / canvas_width, window_height / canvas_height)
+            target_size = (max(1, int(canvas_width * self.scale)), max(1, int(canvas_height * self.scale)))
+            self.target = pygame.Rect((0, 0), target_size)
+            self.target.center = (window_width // 2, window_height // 2)
+
+        # Nearest-neighbour keeps integer scales crisp, anything else is filtered
+        self.smooth = self.scale != int(self.scale) and self.window.get_bitsize() >= 24
+
+        # Letterbox bars are cleared once here and never drawn over
+        self.window.fill((0, 0, 0))
+        self.full_update = True
+
+    def handle_event(self, event):
+        """
+        Pass every pygame event through here.
+
+        Returns:
+            bool: True if the window was resized
+        """
+        if event.type == pygame.VIDEORESIZE or event.type == getattr(pygame, "WINDOWSIZECHANGED", None):
+            self.layout()
+            return True
+        if event.type == pygame.VIDEOEXPOSE:
+            self.full_update = True
+        return False
+
+    def present(self, rects=None):
+        """
+        Show the canvas in the window.
+
+        Args:
+            rects: Changed canvas areas, None if the whole canvas changed
+                   or [] if nothing did
+        """
+        if self.full_update:
+            rects = None
+            self.full_update = False
+        elif rects is not None and not rects:
+            return
+
+        if self.scale == 1.0:
+            if rects is None:
+                self.window.blit(self.canvas, self.target)
+                pygame.display.flip()
+            else:
+                self.window.blits([(self.canvas, rect, rect) for rect in rects], False)
+                pygame.display.update(rects)
+            return
+
+        # Scaling the whole canvas in one call avoids seams between dirty areas
+        target = self.window.subsurface(self.target)
+        if self.smooth:
+            pygame.transform.smoothscale(self.canvas, self.target.size, target)
+        else:
+            pygame.transform.scale(self.canvas, self.target.size, target)
+        if rects is None:
+            pygame.display.flip()
+        else:
+            pygame.display.update(self.target)
@@ -0,0 +1,80 @@
+import json
+import os
+import socket
+import struct
+import threading
+import time
+
+# Frame prefix: JSON header length, payload length
+FRAME_PREFIX = struct.Struct("!II")
+
+class FramedSocket:
+    """
+    Length-prefixed frames over a stream socket.
+
+    Each frame is a small JSON header describing the operation plus an
+    optional raw payload. Payloads such as already-encoded client messages
+    are passed through as bytes, so relaying a message never re-encodes it.
+    """
+
+    def __init__(self, sock):
+        self.sock = sock
+        self.reader = sock.makefile('rb')
+        self.send_lock = threading.Lock()
+
+    def send(self, header, payload=b""):
+        """Send one frame. Safe to call from several threads."""
+        data = json.dumps(header).encode()
+        with self.send_lock:
+            self.sock.sendall(FRAME_PREFIX.pack(len(data), len(payload)) + data + payload)
+
+    def recv(self):
+        """
+        Receive one frame.
+
+        Returns:
+            tuple: (header, payload), or None once the other end has closed
+        """
+        prefix = self.reader.read(FRAME_PREFIX.size)
+        if len(prefix) < FRAME_PREFIX.size:
+            return None
+        header_length, payload_length = FRAME_PREFIX.unpack(prefix)
+        header = json.loads(self.reader.read(header_length))
+        payload = self.reader.read(payload_length) if payload_length else b""
+        return header, payload
+
+    def close(self):
+        try:
+            self.sock.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass
+        self.reader.close()
+        self.sock.close()
+
+def listen_unix(path, backlog=64):
+    """Create a Unix domain socket listening at path, replacing any stale socket file."""
+    if os.path.exists(path):
+        os.unlink(path)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    server.bind(path)
+    server.listen(backlog)
+    return server
+
+def connect_unix(path, timeout=10.0):
+    """
+    Connect to a Unix domain socket, waiting for the listener to appear.
+
+    Returns:
+        FramedSocket: The connected socket
+    """
+    deadline = time.monotonic() + timeout
+    while True:
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        try:
+            sock.connect(path)
+            return FramedSocket(sock)
+        except (FileNotFoundError, ConnectionRefusedError):
+            sock.close()
+            if time.monotonic() >= deadline:
+                raise
+            time.sleep(0.05)
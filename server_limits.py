@@ -0,0 +1,116 @@
+import math
+import time
+
+# Largest message a client may send, in bytes; a grid_update is about 1 KB
+MAX_FRAME_SIZE = 8192
+
+# Per-client token buckets: {message type: (messages per second, burst)}
+# Clients send grid_update at 10 Hz plus one on every lock and junk line
+RATE_LIMITS = {
+    "join": (2.0, 5),
+    "grid_update": (30.0, 60),
+    "clear_lines": (10.0, 20),
+    "game_over": (2.0, 5),
+    "ready_for_new_game": (2.0, 5),
+    "leave_game": (2.0, 5),
+    "pong": (2.0, 5),
+    "list_matches": (2.0, 5),
+    "spectate": (2.0, 5),
+    "stop_spectating": (2.0, 5)
+}
+
+GRID_WIDTH = 10
+GRID_HEIGHT = 20
+CELL_VALUES = frozenset(range(9))  # Empty, the seven piece colors, junk
+PIECE_COLORS = 7  # Index into the clients' SHAPE_COLORS
+
+class TokenBucket:
+    """Allows rate events per second on average, with bursts of up to burst"""
+
+    def __init__(self, rate, burst):
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.monotonic()
+
+    def take(self):
+        """
+        Returns:
+            bool: Whether the event is within the limit
+        """
+        now = time.monotonic()
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+class ClientLimits:
+    """
+    Rate limits of one connection.
+
+    Only used by the connection's handler thread, so it needs no lock.
+    """
+
+    def __init__(self, limits=None):
+        self.buckets = {message_type: TokenBucket(rate, burst)
+                        for message_type, (rate, burst) in (limits or RATE_LIMITS).items()}
+
+    def allow(self, message_type):
+        """Whether a message of this type may be processed now; unknown types never are"""
+        bucket = self.buckets.get(message_type)
+        return bucket is not None and bucket.take()
+
+def valid_grid(grid):
+    """Whether grid is a GRID_HEIGHT x GRID_WIDTH board of valid cell values"""
+    if type(grid) is not list or len(grid) != GRID_HEIGHT:
+        return False
+    try:
+        for row in grid:
+            if type(row) is not list or len(row) != GRID_WIDTH or not CELL_VALUES.issuperset(row):
+                return False
+            # True, False and 1.0 hash like the cell values they equal
+            for cell in row:
+                if type(cell) is not int:
+                    return False
+    except TypeError:  # An unhashable cell such as a list
+        return False
+    return True
+
+def valid_number(value):
+    """Whether value is a finite int or float; bools and the NaN and Infinity JSON allows are not"""
+    return type(value) in (int, float) and math.isfinite(value)
+
+def valid_piece(piece):
+    """Whether piece is a falling piece description as sent by the clients"""
+    if type(piece) is not dict:
+        return False
+    shape = piece.get("shape")
+    if type(shape) is not list or not 0 < len(shape) <= 4:
+        return False
+    for row in shape:
+        if type(row) is not list or len(row) > 4:
+            return False
+        for cell in row:
+            if type(cell) is not int or cell not in (0, 1):
+                return False
+    color = piece.get("color")
+    if type(color) is not int or not 0 <= color < PIECE_COLORS:
+        return False
+    if type(piece.get("x")) is not int or type(piece.get("y")) is not int:
+        return False
+    # Seconds since the piece last fell
+    return valid_number(piece.get("fall")) and piece["fall"] >= 0
+
+def valid_grid_update(message):
+    """Cheap shape check of a grid_update before it is stored and forwarded"""
+    if type(message.get("score")) is not int or not valid_grid(message.get("grid")):
+        return False
+    if "piece" not in message:
+        return True
+    # Gravity interval the opponent divides by when extrapolating the piece
+    fall_speed = message.get("fall_speed")
+    if fall_speed is not None and not (valid_number(fall_speed) and fall_speed > 0):
+        return False
+    return valid_piece(message["piece"])
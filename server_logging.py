@@ -0,0 +1,131 @@
+import json
+import logging
+import logging.handlers
+import queue
+import sys
+import threading
+import time
+
+# Attributes every LogRecord has; anything else was passed in extra= and is a structured field
+STANDARD_ATTRIBUTES = set(logging.LogRecord("", 0, "", 0, "", (), None).__dict__) | {"message", "asctime"}
+
+class JsonLinesFormatter(logging.Formatter):
+    """Format each record as one JSON object per line, including fields passed in extra="""
+
+    def format(self, record):
+        entry = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "thread": record.threadName,
+            "msg": record.getMessage()
+        }
+        for key, value in record.__dict__.items():
+            if key not in STANDARD_ATTRIBUTES:
+                entry[key] = value
+        if record.exc_info:
+            entry["exc"] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+class RateLimitFilter(logging.Filter):
+    """
+    Token bucket per event type.
+
+    The event type is the record's "event" extra field, or its unformatted
+    message, which is constant per call site. Records over the limit are
+    dropped and counted; the next record of that type let through carries
+    the number suppressed since the last one.
+    """
+
+    def __init__(self, rate=20.0, burst=100):
+        super().__init__()
+        self.rate = rate
+        self.burst = burst
+        self.buckets = {}  # {event type: [tokens, last refill time]}
+        self.dropped = {}  # {event type: records dropped in total}
+        self.suppressed = {}  # {event type: records dropped since the last one let through}
+        self.lock = threading.Lock()
+
+    def filter(self, record):
+        key = getattr(record, "event", None) or record.msg
+        now = time.monotonic()
+        with self.lock:
+            bucket = self.buckets.get(key)
+            if bucket is None:
+                bucket = self.buckets[key] = [self.burst, now]
+            bucket[0] = min(self.burst, bucket[0] + (now - bucket[1]) * self.rate)
+            bucket[1] = now
+            if bucket[0] < 1:
+                self.dropped[key] = self.dropped.get(key, 0) + 1
+                self.suppressed[key] = self.suppressed.get(key, 0) + 1
+                return False
+            bucket[0] -= 1
+            suppressed = self.suppressed.pop(key, 0)
+        if suppressed:
+            record.suppressed = suppressed
+        return True
+
+class AsyncLogHandler(logging.handlers.QueueHandler):
+    """
+    Hands records to a QueueListener thread through a bounded queue.
+
+    The calling thread only builds the record and enqueues it: formatting
+    and I/O happen on the listener thread, so logging while holding the
+    server lock costs microseconds. A full queue drops the record and counts
+    it instead of blocking.
+    """
+
+    def __init__(self, maxsize=10000):
+        super().__init__(queue.Queue(maxsize))
+        self.queue_dropped = 0
+
+    def prepare(self, record):
+        # Formatting is left to the listener; the records stay in this process
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.queue_dropped += 1
+
+    def dropped_total(self):
+        dropped = self.queue_dropped
+        for log_filter in self.filters:
+            if isinstance(log_filter, RateLimitFilter):
+                dropped += sum(log_filter.dropped.values())
+        return dropped
+
+def setup_logging(level=logging.INFO, json_lines=True, stream=None, rate=20.0, burst=100):
+    """
+    Route the root logger through an AsyncLogHandler and start its listener.
+
+    Call once per process, including in each worker after the fork, since
+    the listener thread does not survive one.
+
+    Returns:
+        logging.handlers.QueueListener: The started listener; stop() it to flush
+    """
+    output = logging.StreamHandler(stream or sys.stderr)
+    if json_lines:
+        output.setFormatter(JsonLinesFormatter())
+    else:
+        output.setFormatter(logging.Formatter('%(asctime)s - %(levelname)s - %(message)s'))
+
+    handler = AsyncLogHandler()
+    handler.addFilter(RateLimitFilter(rate, burst))
+
+    root = logging.getLogger()
+    for old_handler in list(root.handlers):
+        root.removeHandler(old_handler)
+    root.addHandler(handler)
+    root.setLevel(level)
+
+    listener = logging.handlers.QueueListener(handler.queue, output)
+    listener.start()
+    return listener
+
+def dropped_logs():
+    """Records dropped by rate limiting or a full queue, across the root logger's async handlers"""
+    return sum(handler.dropped_total() for handler in logging.getLogger().handlers
+               if isinstance(handler, AsyncLogHandler))
@@ -0,0 +1,306 @@
+import json
+import os
+import socket
+import struct
+import threading
+import time
+
+try:
+    import fcntl
+    import termios
+except ImportError:  # Windows
+    fcntl = None
+
+# Histogram bucket i counts durations below 2**i microseconds
+HISTOGRAM_BUCKETS = 40
+
+class Histogram:
+    """Log2-bucketed duration histogram, in microseconds"""
+
+    def __init__(self):
+        self.buckets = [0] * HISTOGRAM_BUCKETS
+        self.total = 0.0
+        self.maximum = 0.0
+
+    def observe(self, seconds):
+        micros = seconds * 1e6
+        self.buckets[min(int(micros).bit_length(), HISTOGRAM_BUCKETS - 1)] += 1
+        self.total += micros
+        if micros > self.maximum:
+            self.maximum = micros
+
+    def merge(self, other):
+        for i, count in enumerate(list(other.buckets)):
+            self.buckets[i] += count
+        self.total += other.total
+        self.maximum = max(self.maximum, other.maximum)
+
+    def percentile(self, p):
+        """Upper bound of the bucket holding the p-th percentile, in microseconds"""
+        count = sum(self.buckets)
+        rank = count * p / 100
+        seen = 0
+        for i, bucket in enumerate(self.buckets):
+            seen += bucket
+            if bucket and seen >= rank:
+                return min(float(2 ** i), self.maximum)
+        return 0.0
+
+    def summary(self):
+        count = sum(self.buckets)
+        return {
+            "count": count,
+            "mean_us": self.total / count if count else 0.0,
+            "p50_us": self.percentile(50),
+            "p95_us": self.percentile(95),
+            "p99_us": self.percentile(99),
+            "max_us": self.maximum
+        }
+
+class MetricsShard:
+    """Counters and histograms written by a single thread, so recording needs no lock"""
+
+    def __init__(self, thread):
+        self.thread = thread
+        self.counters = {}
+        self.histograms = {}
+
+    def merge(self, other):
+        for name, value in dict(other.counters).items():
+            self.counters[name] = self.counters.get(name, 0) + value
+        for name, histogram in dict(other.histograms).items():
+            self.histograms.setdefault(name, Histogram()).merge(histogram)
+
+class ServerMetrics:
+    """
+    Counters, duration histograms and gauges for the server.
+
+    Every thread records into its own shard, found through a thread-local,
+    so the hot path is a dict update with no lock. Readers merge the shards
+    when they take a snapshot, and fold the shards of finished threads into
+    one so the list stays as long as the number of live client threads.
+    Gauges are functions sampled at snapshot time.
+    """
+
+    def __init__(self):
+        self.started = time.time()
+        self.local = threading.local()
+        self.shards = []
+        self.retired = MetricsShard(None)
+        self.shards_lock = threading.Lock()  # Only taken by a thread's first record and by snapshots
+        self.gauges = {}
+
+    def shard(self):
+        try:
+            return self.local.shard
+        except AttributeError:
+            shard = self.local.shard = MetricsShard(threading.current_thread())
+            with self.shards_lock:
+                self.shards.append(shard)
+            return shard
+
+    def count(self, name, amount=1):
+        counters = self.shard().counters
+        counters[name] = counters.get(name, 0) + amount
+
+    def observe(self, name, seconds):
+        histograms = self.shard().histograms
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = histograms[name] = Histogram()
+        histogram.observe(seconds)
+
+    def gauge(self, name, function):
+        """Register a function returning the current value of a gauge"""
+        self.gauges[name] = function
+
+    def snapshot(self):
+        """
+        Returns:
+            dict: Merged counters, histogram summaries and gauge values
+        """
+        merged = MetricsShard(None)
+        with self.shards_lock:
+            live = []
+            for shard in self.shards:
+                if shard.thread.is_alive():
+                    live.append(shard)
+                else:
+                    self.retired.merge(shard)
+            self.shards = live
+            merged.merge(self.retired)
+            for shard in live:
+                merged.merge(shard)
+
+        gauges = {}
+        for name, function in list(self.gauges.items()):
+            try:
+                gauges[name] = function()
+            except Exception:
+                gauges[name] = None
+
+        now = time.time()
+        return {
+            "time": now,
+            "uptime": now - self.started,
+            "counters": dict(sorted(merged.counters.items())),
+            "gauges": gauges,
+            "histograms": {name: histogram.summary() for name, histogram in sorted(merged.histograms.items())}
+        }
+
+class InstrumentedLock:
+    """
+    Re-entrant lock that records contention.
+
+    An uncontended acquire only counts; a thread that has to wait records
+    how long it waited in the "<name>.wait" histogram.
+    """
+
+    def __init__(self, metrics, name="lock"):
+        self.lock = threading.RLock()
+        self.metrics = metrics
+        self.acquired_name = f"{name}.acquired"
+        self.wait_name = f"{name}.wait"
+
+    def acquire(self, blocking=True, timeout=-1):
+        self.metrics.count(self.acquired_name)
+        if self.lock.acquire(False):
+            return True
+        start = time.perf_counter()
+        acquired = self.lock.acquire(blocking, timeout)
+        self.metrics.observe(self.wait_name, time.perf_counter() - start)
+        return acquired
+
+    def release(self):
+        self.lock.release()
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+def unsent_bytes(sock):
+    """Bytes queued in a socket's kernel send buffer and not yet acknowledged, or 0 if unknown"""
+    sock = getattr(sock, "sock", sock)  # The socket under a CompressedSocket
+    if fcntl is None or not isinstance(sock, socket.socket):
+        return 0
+    try:
+        return struct.unpack("i", fcntl.ioctl(sock.fileno(), termios.TIOCOUTQ, b"\0\0\0\0"))[0]
+    except OSError:
+        return 0
+
+def add_rates(snapshot, previous):
+    """Add per-second counter rates since the previous snapshot, or since start"""
+    if previous:
+        elapsed = snapshot["time"] - previous["time"]
+        before = previous["counters"]
+    else:
+        elapsed = snapshot["uptime"]
+        before = {}
+    snapshot["rates"] = {name: (value - before.get(name, 0)) / elapsed if elapsed > 0 else 0.0
+                         for name, value in snapshot["counters"].items()}
+    return snapshot
+
+def format_text(snapshot):
+    """Render a snapshot with rates as plain text, one metric per line"""
+    lines = [f"uptime {snapshot['uptime']:.1f}"]
+    for name, value in snapshot["counters"].items():
+        lines.append(f"counter {name} {value} {snapshot['rates'][name]:.1f}/s")
+    for name, value in snapshot["gauges"].items():
+        lines.append(f"gauge {name} {value}")
+    for name, summary in snapshot["histograms"].items():
+        lines.append(f"histogram {name} count={summary['count']} mean={summary['mean_us']:.0f}us "
+                     f"p50={summary['p50_us']:.0f}us p95={summary['p95_us']:.0f}us "
+                     f"p99={summary['p99_us']:.0f}us max={summary['max_us']:.0f}us")
+    return "\n".join(lines) + "\n"
+
+class TextEndpoint:
+    """
+    Exporter serving the metrics as text on a local admin port.
+
+    Each connection gets one report and is closed; an HTTP GET gets the same
+    report with a response header, so both nc and curl work. Rates are since
+    the previous request.
+    """
+
+    def __init__(self, metrics, host="127.0.0.1", port=5599):
+        self.metrics = metrics
+        self.host = host
+        self.port = port
+        self.server_socket = None
+        self.previous = None
+
+    def start(self):
+        self.server_socket = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+        self.server_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+        self.server_socket.bind((self.host, self.port))
+        self.server_socket.listen(8)
+        thread = threading.Thread(target=self.serve)
+        thread.daemon = True
+        thread.start()
+
+    def serve(self):
+        while self.server_socket:
+            try:
+                connection, _ = self.server_socket.accept()
+            except OSError:
+                break
+            try:
+                connection.settimeout(0.2)
+                try:
+                    request = connection.recv(1024)
+                except socket.timeout:
+                    request = b""
+                snapshot = add_rates(self.metrics.snapshot(), self.previous)
+                self.previous = snapshot
+                body = format_text(snapshot).encode()
+                if request.startswith(b"GET"):
+                    body = (b"HTTP/1.0 200 OK\r\nContent-Type: text/plain\r\n"
+                            b"Content-Length: " + str(len(body)).encode() + b"\r\n\r\n" + body)
+                connection.sendall(body)
+            except OSError:
+                pass
+            finally:
+                connection.close()
+
+    def stop(self):
+        if self.server_socket:
+            server_socket, self.server_socket = self.server_socket, None
+            server_socket.close()
+
+class FileDump:
+    """Exporter writing a JSON snapshot to a file every interval seconds, replacing the previous one"""
+
+    def __init__(self, metrics, path="metrics.json", interval=10.0):
+        self.metrics = metrics
+        self.path = path
+        self.interval = interval
+        self.stopped = threading.Event()
+        self.thread = None
+        self.previous = None
+
+    def start(self):
+        self.thread = threading.Thread(target=self.run)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def run(self):
+        while not self.stopped.wait(self.interval):
+            self.dump()
+
+    def dump(self):
+        snapshot = add_rates(self.metrics.snapshot(), self.previous)
+        self.previous = snapshot
+        temp_path = f"{self.path}.tmp"
+        with open(temp_path, 'w') as f:
+            json.dump(snapshot, f, indent=1)
+        os.replace(temp_path, self.path)
+
+    def stop(self):
+        """Stop and write a final snapshot"""
+        if self.thread and not self.stopped.is_set():
+            self.stopped.set()
+            self.thread.join()
+            self.dump()
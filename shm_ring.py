@@ -0,0 +1,237 @@
+import collections
+import json
+import os
+import struct
+import threading
+import time
+from multiprocessing import shared_memory
+
+from server_ipc import FRAME_PREFIX
+
+# Empty polls before a waiting reader starts yielding; spinning only helps when the writer has a CPU of its own
+SPIN_POLLS = 200 if (os.cpu_count() or 1) > 1 else 0
+
+# Ring header: the write and read counters sit in separate cache lines
+HEADER_SIZE = 128
+HEAD_INDEX = 0   # Counter index of the next slot to write
+TAIL_INDEX = 8   # Counter index of the next slot to read
+SLOT_LENGTH = struct.Struct("I")
+SEQUENCE = struct.Struct("Q")  # Leads every ShmChannel frame
+
+class ShmRing:
+    """
+    Single-producer, single-consumer ring of fixed-size slots in shared memory.
+
+    The producer copies a message into the next free slot and then bumps the
+    head counter; the consumer reads the slot in place through a memoryview
+    and bumps the tail counter once it is done with it. The counters only
+    ever increase, so full and empty are head - tail == slots and head ==
+    tail. Publishing relies on the slot bytes becoming visible before the
+    head store, which holds on x86-64.
+    """
+
+    def __init__(self, slots=256, slot_size=2048, name=None):
+        """
+        Args:
+            slots (int): Number of slots
+            slot_size (int): Bytes per slot, including a 4-byte length
+            name (str): Attach to an existing ring instead of creating one
+        """
+        self.slots = slots
+        self.slot_size = slot_size
+        self.created = name is None
+        self.shm = shared_memory.SharedMemory(name=name, create=self.created,
+                                              size=HEADER_SIZE + slots * slot_size)
+        self.buf = self.shm.buf
+        self.counters = self.buf[:HEADER_SIZE].cast("Q")
+        if self.created:
+            self.counters[HEAD_INDEX] = 0
+            self.counters[TAIL_INDEX] = 0
+
+    def __reduce__(self):
+        # Child processes started with spawn attach to the same segment by name
+        return (ShmRing, (self.slots, self.slot_size, self.shm.name))
+
+    @property
+    def capacity(self):
+        """Largest message that fits in one slot."""
+        return self.slot_size - SLOT_LENGTH.size
+
+    def write(self, *parts):
+        """
+        Copy the concatenation of parts into the next slot.
+
+        Returns:
+            bool: False if the ring is full
+        """
+        length = sum(len(part) for part in parts)
+        if length > self.capacity:
+            raise ValueError(f"Message of {length} bytes does not fit in a {self.slot_size}-byte slot")
+
+        head = self.counters[HEAD_INDEX]
+        if head - self.counters[TAIL_INDEX] >= self.slots:
+            return False
+
+        offset = HEADER_SIZE + (head % self.slots) * self.slot_size
+        SLOT_LENGTH.pack_into(self.buf, offset, length)
+        offset += SLOT_LENGTH.size
+        for part in parts:
+            self.buf[offset:offset + len(part)] = part
+            offset += len(part)
+
+        # Publish the slot
+        self.counters[HEAD_INDEX] = head + 1
+        return True
+
+    def read(self):
+        """
+        Return the oldest unread message in place, without copying it.
+
+        The view is only valid until release() is called.
+
+        Returns:
+            memoryview: The message, or None if the ring is empty
+        """
+        tail = self.counters[TAIL_INDEX]
+        if tail == self.counters[HEAD_INDEX]:
+            return None
+        offset = HEADER_SIZE + (tail % self.slots) * self.slot_size
+        length = SLOT_LENGTH.unpack_from(self.buf, offset)[0]
+        start = offset + SLOT_LENGTH.size
+        return self.buf[start:start + length]
+
+    def release(self):
+        """Hand the slot returned by read() back to the producer."""
+        self.counters[TAIL_INDEX] = self.counters[TAIL_INDEX] + 1
+
+    def close(self):
+        self.counters.release()
+        self.buf = None
+        self.shm.close()
+
+    def unlink(self):
+        """Free the segment; call once, from the process that created it."""
+        self.shm.unlink()
+
+class ShmChannel:
+    """
+    One direction of a relay link between two local processes over shared memory.
+
+    Has the same send()/recv() interface as server_ipc.FramedSocket. Frames
+    go to the compact event ring when they fit and to the ring of larger,
+    board-snapshot-sized slots otherwise. recv() returns payloads as views
+    into the ring, so a relayed message can be written straight to a client
+    socket without an intermediate copy.
+
+    Every frame carries a sequence number and the reader only takes the
+    frame with the next one, so frames come out in the order they were sent
+    whichever ring they went through. send() never waits: when a ring is
+    full the frame and all later ones are queued in process memory and
+    written by a background thread as the reader makes room, so a sender
+    holding the server lock cannot deadlock against a peer doing the same.
+    """
+
+    def __init__(self, events=None, snapshots=None):
+        self.events = events or ShmRing(slots=256, slot_size=256)
+        self.snapshots = snapshots or ShmRing(slots=128, slot_size=2048)
+        self.send_lock = threading.Lock()
+        self.sequence = 0  # Sequence number of the next frame written
+        self.expected = 0  # Sequence number of the next frame returned
+        self.outbox = collections.deque()  # Frames waiting for room, as (ring, parts)
+        self.outbox_ready = threading.Condition(self.send_lock)
+        self.flusher = None
+        self.pending = None  # Ring whose slot the last recv() returned
+        self.closed = False
+
+    def __reduce__(self):
+        return (ShmChannel, (self.events, self.snapshots))
+
+    def send(self, header, payload=b""):
+        """Write one frame, or queue it if its ring is full. Safe to call from several threads."""
+        data = json.dumps(header).encode()
+        prefix = FRAME_PREFIX.pack(len(data), len(payload))
+        size = SEQUENCE.size + len(prefix) + len(data) + len(payload)
+        ring = self.events if size <= self.events.capacity else self.snapshots
+        with self.send_lock:
+            if not self.outbox and self._write(ring, (prefix, data, payload)):
+                return
+            # The payload may be a view into another ring, only valid until that ring moves on
+            self.outbox.append((ring, (prefix, data, bytes(payload))))
+            if self.flusher is None:
+                self.flusher = threading.Thread(target=self._flush, daemon=True)
+                self.flusher.start()
+            self.outbox_ready.notify()
+
+    def _write(self, ring, parts):
+        """Write a frame with the next sequence number. Called with send_lock held"""
+        if not ring.write(SEQUENCE.pack(self.sequence), *parts):
+            return False
+        self.sequence += 1
+        return True
+
+    def _flush(self):
+        """Flusher thread - writes queued frames in order as the rings drain"""
+        with self.send_lock:
+            while not self.closed:
+                if not self.outbox:
+                    self.outbox_ready.wait(0.1)
+                elif self._write(*self.outbox[0]):
+                    self.outbox.popleft()
+                else:
+                    # Releases the lock, so senders only ever wait for a queue append
+                    self.outbox_ready.wait(0.0001)
+
+    def poll(self):
+        """
+        Return the next frame if one is ready.
+
+        Returns:
+            tuple: (header, payload view), or None if the next frame has not arrived
+        """
+        if self.pending:
+            self.pending.release()
+            self.pending = None
+
+        # A later frame can be visible in one ring before an earlier one is in the other
+        for ring in (self.events, self.snapshots):
+            view = ring.read()
+            if view is not None and SEQUENCE.unpack_from(view)[0] == self.expected:
+                self.expected += 1
+                header_length, payload_length = FRAME_PREFIX.unpack_from(view, SEQUENCE.size)
+                start = SEQUENCE.size + FRAME_PREFIX.size
+                header = json.loads(bytes(view[start:start + header_length]))
+                payload = view[start + header_length:start + header_length + payload_length]
+                self.pending = ring
+                return header, payload
+        return None
+
+    def recv(self, spin=SPIN_POLLS):
+        """
+        Wait for the next frame.
+
+        Polls without sleeping for `spin` empty checks, then yields the CPU,
+        then backs off to sub-millisecond sleeps while the channel stays idle.
+
+        Returns:
+            tuple: (header, payload view), or None once the channel is closed
+        """
+        idle = 0
+        while not self.closed:
+            frame = self.poll()
+            if frame is not None:
+                return frame
+            idle += 1
+            if idle > spin + 2000:
+                time.sleep(0.0005)
+            elif idle > spin:
+                os.sched_yield()
+        return None
+
+    def close(self):
+        self.closed = True
+
+    def unlink(self):
+        """Free both rings; call once, from the process that created them."""
+        for ring in (self.events, self.snapshots):
+            ring.close()
+            ring.unlink()
@@ -0,0 +1,96 @@
+from collections import deque
+
+def piece_fits(grid, shape, x, y):
+    """Check whether a shape matrix fits on the grid at (x, y)."""
+    for r, row in enumerate(shape):
+        for c, cell in enumerate(row):
+            if not cell:
+                continue
+            gx, gy = x + c, y + r
+            if gx < 0 or gx >= len(grid[0]) or gy >= len(grid):
+                return False
+            if gy >= 0 and grid[gy][gx] != 0:
+                return False
+    return True
+
+class SnapshotBuffer:
+    """
+    Timestamped opponent snapshots, played back a short delay behind real time.
+
+    Each opponent_update carries the sender's clock ("t"). The receiver maps
+    it onto its own clock with the smallest transit offset seen so far and
+    shows the snapshot that was current `delay` seconds ago, so updates sent
+    at 10 Hz with some network jitter always have a successor queued. In
+    between, the falling piece is moved down with the sender's gravity until
+    it lands.
+    """
+
+    def __init__(self, delay=0.15, size=32, max_extrapolation=1.0):
+        """
+        Args:
+            delay (float): Seconds the playback runs behind the newest snapshot
+            size (int): Number of snapshots kept for the clock offset estimate
+            max_extrapolation (float): Longest time the piece is predicted past a snapshot
+        """
+        self.delay = delay
+        self.max_extrapolation = max_extrapolation
+        self.snapshots = deque(maxlen=size)  # (sent, received, message)
+
+    def clear(self):
+        """Forget all snapshots, e.g. when a new game starts."""
+        self.snapshots.clear()
+
+    def push(self, received, message):
+        """
+        Add an opponent_update message.
+
+        Args:
+            received (float): Local time.perf_counter() when the message arrived
+            message (dict): The opponent_update message
+        """
+        # Messages without a sender clock are placed at their arrival time
+        sent = message.get("t", received)
+        self.snapshots.append((sent, received, message))
+
+    def sample(self, now):
+        """
+        Return the opponent's state at the playback time.
+
+        Args:
+            now (float): Local time.perf_counter()
+
+        Returns:
+            tuple: (grid, score, piece) where piece is a dict with shape, color,
+                   x and y or None, or None if no snapshot has arrived yet
+        """
+        if not self.snapshots:
+            return None
+
+        # Smallest receive-minus-send time is the best estimate of the clock offset
+        offset = min(received - sent for sent, received, _ in self.snapshots)
+        playback = now - offset - self.delay
+
+        # Latest snapshot at or before the playback time, or the oldest one at start-up
+        current = self.snapshots[0]
+        for snapshot in self.snapshots:
+            if snapshot[0] > playback:
+                break
+            current = snapshot
+
+        sent, _, message = current
+        grid = message["grid"]
+        piece = message.get("piece")
+        if piece:
+            piece = self.extrapolate(grid, piece, message.get("fall_speed"), playback - sent)
+        return grid, message["score"], piece
+
+    def extrapolate(self, grid, piece, fall_speed, elapsed):
+        """Move a piece down by the gravity steps due after elapsed seconds, stopping where it lands."""
+        y = piece["y"]
+        if fall_speed:
+            elapsed = min(max(elapsed, 0.0), self.max_extrapolation)
+            steps = int((piece.get("fall", 0.0) + elapsed) / fall_speed)
+            while steps > 0 and piece_fits(grid, piece["shape"], piece["x"], y + 1):
+                y += 1
+                steps -= 1
+        return {"shape": piece["shape"], "color": piece["color"], "x": piece["x"], "y": y}
@@ -0,0 +1,135 @@
+import json
+
+GRID_WIDTH = 10
+GRID_HEIGHT = 20
+
+def empty_grid():
+    return [[0] * GRID_WIDTH for _ in range(GRID_HEIGHT)]
+
+class MatchStream:
+    """
+    Shared spectator stream of one match.
+
+    Player boards are recorded as grid_updates arrive, and once per broadcast
+    tick the change since the previous tick is encoded a single time as a
+    delta frame holding only the changed rows. Every subscriber is sent the
+    same bytes, so the cost of a tick does not grow with the number of
+    spectators beyond the sends themselves. A spectator that has just joined,
+    or fell behind, is sent a keyframe of the full boards instead, and it is
+    also encoded at most once per tick.
+
+    Frames carry a sequence number: a delta with seq n applies to the boards
+    of the keyframe or delta with seq n - 1.
+    """
+
+    def __init__(self, match_id, players):
+        """
+        Args:
+            match_id (str): Match identifier
+            players (list): (client_id, name) of both players
+        """
+        self.match_id = match_id
+        self.players = [client_id for client_id, _ in players]
+        self.names = dict(players)
+        self.current = {client_id: (empty_grid(), 0) for client_id in self.players}
+        self.sent = dict(self.current)  # Boards as of seq, what the spectators have
+        self.seq = 0
+        self.dirty = False
+        self.ended = False
+        self.spectators = {}  # {client_id: socket}
+        self.need_keyframe = set()  # Spectators to send a keyframe on the next tick
+
+    def update(self, player_id, grid, score):
+        """Record a player's board; grid must not be modified afterwards"""
+        self.current[player_id] = (grid, score)
+        self.dirty = True
+
+    def subscribe(self, client_id, sock):
+        self.spectators[client_id] = sock
+        self.need_keyframe.add(client_id)
+
+    def unsubscribe(self, client_id):
+        self.spectators.pop(client_id, None)
+        self.need_keyframe.discard(client_id)
+
+    def keyframe(self):
+        return {
+            "type": "spectate_frame",
+            "match": self.match_id,
+            "seq": self.seq,
+            "key": True,
+            "players": [{"name": self.names[client_id], "score": self.sent[client_id][1], "grid": self.sent[client_id][0]}
+                        for client_id in self.players]
+        }
+
+    def tick(self):
+        """
+        Advance the stream by one broadcast tick.
+
+        Returns:
+            tuple: (delta bytes or None, keyframe bytes or None, [(client_id, socket, gets keyframe)])
+        """
+        delta = None
+        if self.dirty:
+            players = []
+            for client_id in self.players:
+                grid, score = self.current[client_id]
+                sent_grid = self.sent[client_id][0]
+                rows = [[y, row] for y, row in enumerate(grid) if row != sent_grid[y]]
+                players.append({"score": score, "rows": rows})
+                self.sent[client_id] = (grid, score)
+            self.seq += 1
+            self.dirty = False
+            delta = json.dumps({
+                "type": "spectate_frame",
+                "match": self.match_id,
+                "seq": self.seq,
+                "key": False,
+                "players": players
+            }).encode()
+
+        keyframe = None
+        if self.need_keyframe:
+            # Boards as of this tick's seq, so the next delta applies to it
+            keyframe = json.dumps(self.keyframe()).encode()
+
+        targets = [(client_id, sock, client_id in self.need_keyframe) for client_id, sock in self.spectators.items()]
+        self.need_keyframe.clear()
+        return delta, keyframe, targets
+
+    def summary(self):
+        """Entry of the match list sent to clients"""
+        return {
+            "match": self.match_id,
+            "players": [self.names[client_id] for client_id in self.players],
+            "scores": [self.current[client_id][1] for client_id in self.players],
+            "spectators": len(self.spectators)
+        }
+
+class SpectatorView:
+    """Client side of a spectator stream: rebuilds both boards from keyframes and deltas"""
+
+    def __init__(self):
+        self.seq = None
+        self.players = []  # [{"name", "score", "grid"}]
+
+    def apply(self, frame):
+        """
+        Apply a spectate_frame message.
+
+        Returns:
+            bool: False if a delta did not follow the frame it applies to and was ignored
+        """
+        if frame["key"]:
+            self.players = [dict(player) for player in frame["players"]]
+            self.seq = frame["seq"]
+            return True
+
+        if self.seq is None or frame["seq"] != self.seq + 1:
+            return False
+        for player, change in zip(self.players, frame["players"]):
+            player["score"] = change["score"]
+            for y, row in change["rows"]:
+                player["grid"][y] = row
+        self.seq = frame["seq"]
+        return True
@@ -0,0 +1,105 @@
+import time
+
+from bot_scheduler import TimerWheel, BotScheduler
+
+class FakeBot:
+    difficulty = 'easy'
+
+    def __init__(self, move_delay=0.01):
+        self.settings = {'easy': {'move_delay': move_delay}}
+        self.running = True
+        self.steps = 0
+
+    def step(self):
+        self.steps += 1
+        return {'type': 'bot_move'}
+
+def advance(wheel, ticks):
+    due = []
+    for _ in range(ticks):
+        due.extend(wheel.advance())
+    return due
+
+def test_wheel_releases_items_after_their_delay():
+    wheel = TimerWheel(tick=0.01, slots=8)
+    wheel.schedule(0.03, "a")
+    wheel.schedule(0.01, "b")
+    assert advance(wheel, 1) == ["b"]
+    assert advance(wheel, 1) == []
+    assert advance(wheel, 1) == ["a"]
+    assert wheel.count == 0
+
+def test_wheel_delays_longer_than_one_turn():
+    wheel = TimerWheel(tick=0.01, slots=8)
+    wheel.schedule(0.08, "full turn")
+    wheel.schedule(0.2, "two and a half turns")
+    assert advance(wheel, 7) == []
+    assert advance(wheel, 1) == ["full turn"]
+    assert advance(wheel, 11) == []
+    assert advance(wheel, 1) == ["two and a half turns"]
+
+def test_readded_bot_is_driven_once_per_delay():
+    scheduler = BotScheduler(tick=0.01)
+    bot = FakeBot()
+    scheduler.add(bot, delay=0.01)
+    scheduler.remove(bot)
+    scheduler.add(bot, delay=0.01)
+
+    due = scheduler.wheel.advance()
+    assert len(due) == 2  # The entry of the first add is still on the wheel
+    scheduler._run_batch(due)
+    assert bot.steps == 1
+    assert scheduler.wheel.count == 1
+
+def test_removed_bot_is_not_driven_or_rescheduled():
+    scheduler = BotScheduler(tick=0.01)
+    bot = FakeBot()
+    scheduler.add(bot, delay=0.01)
+    scheduler.remove(bot)
+    scheduler._run_batch(scheduler.wheel.advance())
+    assert bot.steps == 0
+    assert scheduler.wheel.count == 0
+
+def test_failing_bot_is_logged_and_kept(caplog):
+    scheduler = BotScheduler(tick=0.01)
+    bot = FakeBot()
+    bot.step = lambda: 1 / 0
+    scheduler.add(bot, delay=0.01)
+    scheduler._run_batch(scheduler.wheel.advance())
+    assert "ZeroDivisionError" in caplog.text
+    assert scheduler.wheel.count == 1
+
+def test_in_flight_batches_are_bounded():
+    scheduler = BotScheduler(workers=1, tick=0.01, batch_size=1, max_in_flight=1)
+    bots = [FakeBot(move_delay=0.05) for _ in range(4)]
+    for bot in bots:
+        bot.step = lambda bot=bot: (time.sleep(0.02), setattr(bot, 'steps', bot.steps + 1))
+        scheduler.add(bot, delay=0.01)
+    scheduler.start()
+    try:
+        deadline = time.perf_counter() + 2
+        while scheduler.decisions < 8 and time.perf_counter() < deadline:
+            assert scheduler.in_flight <= 1
+            time.sleep(0.005)
+    finally:
+        scheduler.stop()
+    assert all(bot.steps >= 1 for bot in bots)
+    assert scheduler.max_lag > 0
+
+def test_late_bots_are_slowed_and_recover():
+    scheduler = BotScheduler(max_stretch=10)
+    assert scheduler.next_interval(0.5, 0.5, lag=0.1) == 0.5
+    assert scheduler.next_interval(2.0, 0.5, lag=0.6) == 4.0  # Doubled
+    assert scheduler.next_interval(0.5, 0.5, lag=2.0) == 2.5  # Lengthened by the lag
+    assert scheduler.next_interval(4.0, 0.5, lag=3.0) == 5.0  # Capped at max_stretch
+    assert scheduler.next_interval(2.0, 0.5, lag=0.0) == 1.8  # Shrinks back once on time
+
+def test_late_decision_is_rescheduled_with_a_longer_interval():
+    scheduler = BotScheduler(tick=0.01)
+    bot = FakeBot(move_delay=0.01)
+    scheduler.add(bot, delay=0.01)
+    time.sleep(0.05)
+    scheduler._run_batch(scheduler.wheel.advance())
+    entries = [entry for slot in scheduler.wheel.slots for _, entry in slot]
+    assert len(entries) == 1
+    assert entries[0][3] > 0.05
@@ -0,0 +1,92 @@
+import json
+
+from bot_tournament import ResultsLog, GeneticTuner, fingerprint, run_tasks
+
+def test_resume_reads_every_record(tmp_path):
+    path = tmp_path / "results.jsonl"
+    log = ResultsLog(str(path))
+    log.append({"type": "game", "key": [0, 0, 1, "x"], "lines": 3})
+    log.append({"type": "game", "key": [0, 1, 1, "x"], "lines": 5})
+    log.close()
+
+    log = ResultsLog(str(path))
+    assert set(log.completed("game")) == {(0, 0, 1, "x"), (0, 1, 1, "x")}
+    log.close()
+
+def test_torn_tail_is_cut_before_appending(tmp_path):
+    path = tmp_path / "results.jsonl"
+    log = ResultsLog(str(path))
+    log.append({"type": "game", "key": [0, 0, 1, "x"], "lines": 3})
+    log.close()
+    with open(path, 'a') as f:
+        f.write('{"type": "game", "key": [0, 1')
+
+    log = ResultsLog(str(path))
+    assert len(log.records) == 1
+    log.append({"type": "game", "key": [0, 2, 1, "x"], "lines": 7})
+    log.close()
+
+    # The record after the crash survives a second resume
+    log = ResultsLog(str(path))
+    assert set(log.completed("game")) == {(0, 0, 1, "x"), (0, 2, 1, "x")}
+    log.close()
+    assert all(json.loads(line) for line in path.read_text().splitlines())
+
+def test_unparsable_line_does_not_hide_later_records(tmp_path):
+    path = tmp_path / "results.jsonl"
+    path.write_text('{"type": "game", "key": [1]}\nnot json\n{"type": "game", "key": [2]}\n')
+    log = ResultsLog(str(path))
+    assert set(log.completed("game")) == {(1,), (2,)}
+    log.close()
+
+def test_fingerprint_depends_on_weights_and_settings():
+    weights = {"holes": -1.0, "lines": 2.0}
+    assert fingerprint(weights, "medium", 500, None) == fingerprint(dict(reversed(weights.items())), "medium", 500, None)
+    assert fingerprint(weights, "medium", 500, None) != fingerprint({"holes": -1.5, "lines": 2.0}, "medium", 500, None)
+    assert fingerprint(weights, "medium", 500, None) != fingerprint(weights, "medium", 200, None)
+
+def test_logged_results_are_reused_only_for_the_same_key(tmp_path):
+    log = ResultsLog(str(tmp_path / "results.jsonl"))
+    log.append({"type": "game", "key": [0, 0, 1, "old"], "lines": 99})
+    tasks = [("game", (0, 0, 1, "old"), None)]
+    assert run_tasks(tasks, log, "game", workers=1)[(0, 0, 1, "old")]["lines"] == 99
+    log.close()
+
+def test_tuner_ignores_checkpoints_of_other_settings(tmp_path):
+    log = ResultsLog(str(tmp_path / "results.jsonl"))
+    old = GeneticTuner(log, population=4, elites=2)
+    log.append({"type": "generation", "generation": 5, "population": [{}] * 4, "config": old.config})
+    new = GeneticTuner(log, population=6, elites=2)
+    assert log.last("generation", config=old.config)["generation"] == 5
+    assert log.last("generation", config=new.config) is None
+    log.close()
+
+class ScriptedTuner(GeneticTuner):
+    """Scores each generation from a fixed table instead of playing games"""
+
+    def __init__(self, log, scores):
+        super().__init__(log, population=3, elites=1)
+        self.scores = scores
+
+    def evaluate(self, population, generation):
+        return self.scores[generation]
+
+def test_tuner_returns_the_best_of_all_generations(tmp_path):
+    log = ResultsLog(str(tmp_path / "results.jsonl"))
+    tuner = ScriptedTuner(log, {0: [1.0, 9.0, 2.0], 1: [3.0, 4.0, 5.0]})
+    champion = tuner.initial_population()[1]
+    assert tuner.run(2) == champion
+    assert log.last("best")["generation"] == 0
+    log.close()
+
+def test_resumed_tuner_keeps_an_earlier_champion(tmp_path):
+    path = str(tmp_path / "results.jsonl")
+    log = ResultsLog(path)
+    champion = ScriptedTuner(log, {0: [1.0, 9.0, 2.0]}).initial_population()[1]
+    assert ScriptedTuner(log, {0: [1.0, 9.0, 2.0]}).run(1) == champion
+    log.close()
+
+    log = ResultsLog(path)
+    assert ScriptedTuner(log, {1: [3.0, 4.0, 5.0], 2: [6.0, 7.0, 8.0]}).run(3) == champion
+    assert ScriptedTuner(log, {3: [1.0, 10.0, 2.0]}).run(4) != champion
+    log.close()
@@ -0,0 +1,35 @@
+import json
+
+from frame_profiler import FrameProfiler
+
+def test_repeated_phases_are_summed_per_frame():
+    profiler = FrameProfiler()
+    profiler.begin_frame()
+    for _ in range(3):
+        with profiler.phase("sidebar"):
+            pass
+    profiler.end_frame()
+    assert len(profiler.samples["sidebar"]) == 1
+    assert profiler.frames == 1
+
+def test_frames_stream_to_file_and_summary_is_written_on_close(tmp_path):
+    frames, summary = tmp_path / "frames.jsonl", tmp_path / "summary.json"
+    profiler = FrameProfiler(export_path=str(frames), summary_path=str(summary))
+    for _ in range(5):
+        profiler.begin_frame()
+        with profiler.phase("board"):
+            pass
+        profiler.end_frame()
+    profiler.close()
+
+    records = [json.loads(line) for line in frames.read_text().splitlines()]
+    assert [record["index"] for record in records] == list(range(5))
+    result = json.loads(summary.read_text())
+    assert result["frames"] == 5
+    assert set(result["phases"]) == {"frame", "board"}
+    assert set(result["phases"]["board"]) == {"p50_ms", "p95_ms", "p99_ms"}
+
+def test_no_summary_without_frames(tmp_path):
+    summary = tmp_path / "summary.json"
+    FrameProfiler(summary_path=str(summary)).close()
+    assert not summary.exists()
@@ -0,0 +1,137 @@
+import json
+import socket
+
+from message_compression import COMPRESSION_ACK, CompressedSocket, Decompressor, FrameCompressor, split_after_ack
+
+def messages():
+    grid = [[0] * 10 for _ in range(14)] + [[1, 2, 3, 4, 5, 6, 7, 8, 0, 1]] * 6
+    return [json.dumps({"type": "opponent_update", "grid": grid, "score": i * 100, "t": 1000.0 + i}).encode()
+            for i in range(20)]
+
+class Recorder:
+    """Stands in for a socket, keeping what was sent and taking at most `room` bytes per send()"""
+
+    def __init__(self, room=None):
+        self.data = b""
+        self.room = room
+
+    def sendall(self, data):
+        self.data += data
+
+    def send(self, data, flags=0):
+        taken = data if self.room is None else data[:self.room]
+        if not taken and data:
+            raise BlockingIOError
+        self.data += taken
+        return len(taken)
+
+def feed_in_chunks(decompressor, data, size):
+    return b"".join(decompressor.feed(data[i:i + size]) for i in range(0, len(data), size))
+
+def test_round_trip_across_split_reads():
+    recorder = Recorder()
+    recorder.sendall(b'{"type": "player_id", "id": "x"}')
+    recorder.sendall(COMPRESSION_ACK)
+    compressed = CompressedSocket(recorder)
+    for message in messages():
+        compressed.sendall(message)
+
+    plain = b'{"type": "player_id", "id": "x"}' + COMPRESSION_ACK + b"".join(messages())
+    for size in (1, 7, 45, 4096):
+        assert feed_in_chunks(Decompressor(), recorder.data, size) == plain
+    assert len(recorder.data) < len(plain) / 4
+
+def test_decompressor_passes_plain_bytes_through_without_an_ack():
+    data = b'{"type": "player_id", "id": "x"}{"type": "compression_other"}'
+    assert feed_in_chunks(Decompressor(), data, 5) == data
+
+def test_split_after_ack():
+    assert split_after_ack(b"abc") is None
+    assert split_after_ack(b"a" + COMPRESSION_ACK + b"z") == (b"a" + COMPRESSION_ACK, b"z")
+
+def test_partial_send_is_kept_and_flushed():
+    recorder = Recorder(room=10)
+    compressed = CompressedSocket(recorder)
+    message = messages()[0]
+    assert compressed.send(message) == len(message)
+    assert compressed.pending
+
+    recorder.room = None
+    assert compressed.flush()
+    assert not compressed.pending
+    decompressor = Decompressor()
+    assert decompressor.feed(COMPRESSION_ACK + recorder.data) == COMPRESSION_ACK + message
+
+def test_message_is_skipped_while_a_previous_one_is_pending():
+    recorder = Recorder(room=10)
+    compressed = CompressedSocket(recorder)
+    first, second = messages()[:2]
+    compressed.send(first)
+    recorder.room = 0
+    assert compressed.send(second) == 0
+    recorder.room = None
+    compressed.sendall(second)
+    assert Decompressor().feed(COMPRESSION_ACK + recorder.data) == COMPRESSION_ACK + first + second
+
+def test_nonblocking_socket_tail_is_finished_by_flush():
+    a, b = socket.socketpair()
+    a.setsockopt(socket.SOL_SOCKET, socket.SO_SNDBUF, 4096)
+    b.setblocking(False)
+    compressed = CompressedSocket(a)
+    sent = []
+    # Incompressible frames, so the socket buffer fills
+    for i in range(200):
+        frame = json.dumps({"type": "spectate_frame", "seq": i, "noise": [hash((i, j)) for j in range(40)]}).encode()
+        if compressed.send(frame, socket.MSG_DONTWAIT):
+            sent.append(frame)
+        if compressed.pending:
+            break
+    assert compressed.pending
+
+    decompressor = Decompressor()
+    received = decompressor.feed(COMPRESSION_ACK)
+    for _ in range(10000):
+        if not compressed.pending and received == COMPRESSION_ACK + b"".join(sent):
+            break
+        compressed.flush(socket.MSG_DONTWAIT)
+        try:
+            received += decompressor.feed(b.recv(65536))
+        except BlockingIOError:
+            pass
+    assert received == COMPRESSION_ACK + b"".join(sent)
+    a.close()
+    b.close()
+
+def test_shared_frames_splice_into_every_stream():
+    frames = FrameCompressor()
+    recorders = [Recorder() for _ in range(3)]
+    connections = [CompressedSocket(recorder) for recorder in recorders]
+    own = messages()
+    expected = [b"" for _ in connections]
+    for i, message in enumerate(own):
+        # Every connection's own messages differ, and go between the shared frames
+        for k, connection in enumerate(connections):
+            if (i + k) % 3:
+                mine = message.replace(b"opponent_update", b"opponent_update%d" % k)
+                connection.sendall(mine)
+                expected[k] += mine
+        frame = json.dumps({"type": "spectate_frame", "seq": i, "players": [{"score": i, "rows": []}]}).encode()
+        compressed = frames.compress(frame)
+        for k, connection in enumerate(connections):
+            assert connection.send_frame(frame, compressed) == len(frame)
+            expected[k] += frame
+
+    for recorder, plain in zip(recorders, expected):
+        assert Decompressor().feed(COMPRESSION_ACK + recorder.data) == COMPRESSION_ACK + plain
+
+def test_consecutive_shared_frames_need_one_full_flush():
+    frames = FrameCompressor()
+    recorder = Recorder()
+    connection = CompressedSocket(recorder)
+    connection.sendall(messages()[0])
+    first = frames.compress(b'{"seq": 1}')
+    second = frames.compress(b'{"seq": 2}')
+    connection.send_frame(b'{"seq": 1}', first)
+    before = len(recorder.data)
+    connection.send_frame(b'{"seq": 2}', second)
+    assert len(recorder.data) - before == len(second)
@@ -0,0 +1,81 @@
+import json
+import socket
+import time
+
+from network_session import NetworkSession
+
+def listener():
+    server = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    server.bind(("127.0.0.1", 0))
+    server.listen()
+    return server
+
+def wait_for(condition, timeout=2.0):
+    deadline = time.perf_counter() + timeout
+    while not condition() and time.perf_counter() < deadline:
+        time.sleep(0.01)
+    return condition()
+
+def test_failed_connect_leaves_the_session_closed():
+    server = listener()
+    port = server.getsockname()[1]
+    server.close()
+    session = NetworkSession("127.0.0.1", port)
+    assert not session.connect()
+    assert session.client_socket is None and not session.connected
+
+def test_reconnect_replaces_the_dropped_connection():
+    server = listener()
+    session = NetworkSession("127.0.0.1", server.getsockname()[1])
+    try:
+        assert session.connect()
+        first, _ = server.accept()
+        old_thread = session.receive_thread
+
+        # The server drops the first connection
+        first.close()
+        assert wait_for(lambda: not session.connected)
+
+        assert session.connect()
+        second, _ = server.accept()
+        assert not old_thread.is_alive()
+        second.sendall(json.dumps({"type": "player_id", "id": "p2"}).encode())
+        assert wait_for(lambda: session.player_id == "p2")
+        assert session.connected
+        second.close()
+    finally:
+        session.close()
+        server.close()
+
+def test_stale_receive_thread_does_not_end_the_new_connection():
+    server = listener()
+    session = NetworkSession("127.0.0.1", server.getsockname()[1])
+    try:
+        assert session.connect()
+        first, _ = server.accept()
+        old_socket, old_thread = session.client_socket, session.receive_thread
+
+        # The session has moved to another connection while the old thread is still in recv()
+        session.client_socket = socket.socket()
+        first.close()
+        old_thread.join(timeout=2.0)
+        assert not old_thread.is_alive()
+        assert session.connected
+
+        session.client_socket.close()
+        session.client_socket = old_socket
+    finally:
+        session.close()
+        server.close()
+
+def test_close_waits_for_the_receive_thread():
+    server = listener()
+    session = NetworkSession("127.0.0.1", server.getsockname()[1])
+    assert session.connect()
+    connection, _ = server.accept()
+    thread = session.receive_thread
+    session.close()
+    assert not thread.is_alive()
+    assert session.client_socket is None
+    connection.close()
+    server.close()
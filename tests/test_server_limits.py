@@ -0,0 +1,92 @@
+import server_limits
+from server_limits import TokenBucket, ClientLimits, valid_grid, valid_grid_update
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+def fake_clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(server_limits.time, "monotonic", clock)
+    return clock
+
+def empty_grid():
+    return [[0] * 10 for _ in range(20)]
+
+def test_bucket_allows_a_burst_then_refuses(monkeypatch):
+    fake_clock(monkeypatch)
+    bucket = TokenBucket(rate=2.0, burst=3)
+    assert [bucket.take() for _ in range(4)] == [True, True, True, False]
+
+def test_bucket_refills_at_rate(monkeypatch):
+    clock = fake_clock(monkeypatch)
+    bucket = TokenBucket(rate=2.0, burst=3)
+    for _ in range(3):
+        bucket.take()
+    clock.now += 0.25
+    assert not bucket.take()
+    clock.now += 0.3
+    assert bucket.take()
+    assert not bucket.take()
+
+def test_bucket_never_holds_more_than_burst(monkeypatch):
+    clock = fake_clock(monkeypatch)
+    bucket = TokenBucket(rate=100.0, burst=2)
+    clock.now += 60
+    assert [bucket.take() for _ in range(3)] == [True, True, False]
+
+def test_client_limits_are_per_type_and_refuse_unknown_types(monkeypatch):
+    fake_clock(monkeypatch)
+    limits = ClientLimits({"ping": (1.0, 1), "pong": (1.0, 1)})
+    assert limits.allow("ping")
+    assert not limits.allow("ping")
+    assert limits.allow("pong")
+    assert not limits.allow("join")
+
+def test_grid_validation():
+    assert valid_grid(empty_grid())
+    assert not valid_grid(empty_grid()[:19])
+    bad = empty_grid()
+    bad[0][0] = 9
+    assert not valid_grid(bad)
+    bad[0][0] = [1]
+    assert not valid_grid(bad)
+
+def test_grid_validation_rejects_cells_that_only_hash_like_values():
+    for cell in (True, False, 1.0):
+        bad = empty_grid()
+        bad[5][5] = cell
+        assert not valid_grid(bad)
+
+PIECE = {"shape": [[1, 1], [1, 1]], "color": 1, "x": 4, "y": 0, "fall": 0.1}
+
+def piece_update(**changes):
+    return {"grid": empty_grid(), "score": 0, "piece": dict(PIECE, **changes), "fall_speed": 0.5}
+
+def test_grid_update_validation():
+    assert valid_grid_update(piece_update())
+    assert valid_grid_update({"grid": empty_grid(), "score": 0})
+    assert not valid_grid_update({"grid": empty_grid(), "score": "0"})
+    assert not valid_grid_update(piece_update(x="4"))
+
+def test_grid_update_rejects_colors_outside_the_palette():
+    assert valid_grid_update(piece_update(color=6))
+    for color in (7, 99, -1, 1.0, True):
+        assert not valid_grid_update(piece_update(color=color))
+
+def test_grid_update_rejects_non_integer_positions():
+    for changes in ({"x": 2.5}, {"y": 0.5}, {"x": True}, {"y": None}):
+        assert not valid_grid_update(piece_update(**changes))
+
+def test_grid_update_rejects_shape_cells_other_than_0_and_1():
+    for shape in ([["x", {}]], [[2]], [[True]], [[1.0]], [[None]]):
+        assert not valid_grid_update(piece_update(shape=shape))
+
+def test_grid_update_rejects_bad_fall_timing():
+    for fall in (float("nan"), float("inf"), -1.0, True, "0"):
+        assert not valid_grid_update(piece_update(fall=fall))
+    for fall_speed in (0, -0.5, float("nan"), "0.5", True):
+        assert not valid_grid_update(dict(piece_update(), fall_speed=fall_speed))
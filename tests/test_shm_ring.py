@@ -0,0 +1,70 @@
+import time
+
+import pytest
+
+from shm_ring import ShmRing, ShmChannel
+
+@pytest.fixture
+def ring():
+    ring = ShmRing(slots=4, slot_size=64)
+    yield ring
+    ring.close()
+    ring.unlink()
+
+@pytest.fixture
+def channel():
+    channel = ShmChannel(ShmRing(slots=4, slot_size=64), ShmRing(slots=4, slot_size=512))
+    yield channel
+    channel.close()
+    if channel.flusher:
+        channel.flusher.join()
+    channel.pending = None
+    channel.unlink()
+
+def take(ring):
+    view = ring.read()
+    data = bytes(view)
+    view.release()
+    ring.release()
+    return data
+
+def test_ring_wraps_around(ring):
+    for i in range(10):
+        assert ring.write(b"message ", str(i).encode())
+        assert take(ring) == f"message {i}".encode()
+    assert ring.read() is None
+
+def test_ring_reports_full_until_a_slot_is_released(ring):
+    for i in range(4):
+        assert ring.write(bytes([i]))
+    assert not ring.write(b"x")
+    assert take(ring) == b"\0"
+    assert ring.write(b"x")
+    assert [take(ring) for _ in range(4)] == [b"\1", b"\2", b"\3", b"x"]
+
+def test_ring_rejects_messages_larger_than_a_slot(ring):
+    with pytest.raises(ValueError):
+        ring.write(b"x" * ring.capacity, b"y")
+
+def test_small_frame_does_not_overtake_a_large_one(channel):
+    channel.send({"op": "relay", "n": 0}, b"b" * 300)
+    channel.send({"op": "unpair", "n": 1})
+    channel.send({"op": "relay", "n": 2}, b"b" * 300)
+    frames = [channel.poll() for _ in range(3)]
+    assert [header["n"] for header, _ in frames[:3]] == [0, 1, 2]
+    assert channel.poll() is None
+
+def test_send_queues_instead_of_waiting_when_the_ring_is_full(channel):
+    start = time.perf_counter()
+    for n in range(12):
+        channel.send({"n": n})
+    assert time.perf_counter() - start < 0.5
+    assert len(channel.outbox) > 0
+
+    received = []
+    deadline = time.perf_counter() + 5
+    while len(received) < 12 and time.perf_counter() < deadline:
+        frame = channel.poll()
+        if frame is not None:
+            received.append(frame[0]["n"])
+    assert received == list(range(12))
@@ -0,0 +1,59 @@
+from snapshot_buffer import SnapshotBuffer, piece_fits
+
+def empty_grid():
+    return [[0] * 10 for _ in range(20)]
+
+def update(t, score, piece=None, fall_speed=None):
+    message = {"type": "opponent_update", "grid": empty_grid(), "score": score, "t": t}
+    if piece:
+        message["piece"] = piece
+        message["fall_speed"] = fall_speed
+    return message
+
+def test_empty_buffer_has_nothing_to_show():
+    assert SnapshotBuffer().sample(10.0) is None
+
+def test_playback_runs_delay_behind_the_sender():
+    buffer = SnapshotBuffer(delay=0.15)
+    # Sender clock is 100 s behind the receiver, with 10 ms transit
+    for i in range(5):
+        buffer.push(100.01 + i * 0.1, update(i * 0.1, score=i))
+    assert buffer.sample(100.01 + 0.30)[1] == 1
+    assert buffer.sample(100.01 + 0.40)[1] == 2
+    assert buffer.sample(100.01 + 10.0)[1] == 4
+
+def test_clock_offset_uses_the_fastest_transit():
+    buffer = SnapshotBuffer(delay=0.0)
+    buffer.push(100.05, update(0.0, score=0))  # Delayed in transit
+    buffer.push(100.11, update(0.1, score=1))
+    assert buffer.sample(100.08)[1] == 0
+    assert buffer.sample(100.13)[1] == 1
+
+def test_oldest_snapshot_is_shown_at_start_up():
+    buffer = SnapshotBuffer(delay=0.15)
+    buffer.push(5.0, update(0.0, score=7))
+    assert buffer.sample(5.0)[1] == 7
+
+def test_falling_piece_is_extrapolated_until_it_lands():
+    buffer = SnapshotBuffer(delay=0.0, max_extrapolation=10.0)
+    piece = {"shape": [[1, 1], [1, 1]], "color": 1, "x": 4, "y": 0, "fall": 0.0}
+    buffer.push(1.0, update(0.0, 0, piece, fall_speed=0.5))
+    assert buffer.sample(1.0)[2]["y"] == 0
+    assert buffer.sample(2.1)[2]["y"] == 2
+    assert buffer.sample(11.0)[2]["y"] == 18  # Resting on the floor
+
+def test_clear_forgets_snapshots_and_clock_offset():
+    buffer = SnapshotBuffer(delay=0.0)
+    buffer.push(100.0, update(0.0, score=1))
+    buffer.clear()
+    assert buffer.sample(100.0) is None
+    buffer.push(5.0, update(0.0, score=2))
+    assert buffer.sample(5.0)[1] == 2
+
+def test_piece_fits():
+    grid = empty_grid()
+    grid[19][0] = 1
+    assert piece_fits(grid, [[1, 1]], 1, 19)
+    assert not piece_fits(grid, [[1, 1]], 0, 19)
+    assert not piece_fits(grid, [[1, 1]], 9, 0)
+    assert piece_fits(grid, [[1], [1]], 5, -1)
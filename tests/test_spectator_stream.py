@@ -0,0 +1,98 @@
+import json
+
+from spectator_stream import MatchStream, SpectatorView, empty_grid
+
+def new_stream():
+    return MatchStream("m1", [("a", "Alice"), ("b", "Bob")])
+
+def play(stream, player, y, x, value, score):
+    grid = [list(row) for row in stream.current[player][0]]
+    grid[y][x] = value
+    stream.update(player, grid, score)
+    return grid
+
+def frames(delta, keyframe, targets, client_id):
+    """The frames a spectator was sent on one tick"""
+    sent = []
+    for target, _, wants_keyframe in targets:
+        if target == client_id:
+            if wants_keyframe and keyframe:
+                sent.append(json.loads(keyframe))
+            elif delta:
+                sent.append(json.loads(delta))
+    return sent
+
+def boards(view):
+    return [(player["grid"], player["score"]) for player in view.players]
+
+def test_keyframe_then_deltas_rebuild_both_boards():
+    stream = new_stream()
+    stream.subscribe("s1", None)
+    view = SpectatorView()
+
+    for frame in frames(*stream.tick(), "s1"):
+        assert view.apply(frame)
+    assert boards(view) == [(empty_grid(), 0), (empty_grid(), 0)]
+
+    grid_a = play(stream, "a", 19, 0, 3, 10)
+    grid_b = play(stream, "b", 18, 5, 2, 20)
+    sent = frames(*stream.tick(), "s1")
+    assert [frame["key"] for frame in sent] == [False]
+    assert view.apply(sent[0])
+    assert boards(view) == [(grid_a, 10), (grid_b, 20)]
+
+def test_delta_holds_only_changed_rows():
+    stream = new_stream()
+    stream.subscribe("s1", None)
+    stream.tick()
+    play(stream, "a", 19, 0, 3, 10)
+    delta, _, _ = stream.tick()
+    players = json.loads(delta)["players"]
+    assert [row[0] for row in players[0]["rows"]] == [19]
+    assert players[1]["rows"] == []
+
+def test_idle_tick_sends_nothing():
+    stream = new_stream()
+    stream.subscribe("s1", None)
+    stream.tick()
+    delta, keyframe, _ = stream.tick()
+    assert delta is None and keyframe is None
+
+def test_late_subscriber_gets_a_keyframe_of_the_current_boards():
+    stream = new_stream()
+    stream.subscribe("s1", None)
+    stream.tick()
+    grid_a = play(stream, "a", 19, 0, 3, 10)
+    stream.tick()
+
+    stream.subscribe("s2", None)
+    grid_b = play(stream, "b", 19, 9, 4, 5)
+    delta, keyframe, targets = stream.tick()
+    late = frames(delta, keyframe, targets, "s2")
+    assert [frame["key"] for frame in late] == [True]
+    view = SpectatorView()
+    assert view.apply(late[0])
+    assert boards(view) == [(grid_a, 10), (grid_b, 5)]
+
+    # The next delta follows the keyframe
+    grid_a = play(stream, "a", 18, 0, 1, 11)
+    assert view.apply(frames(*stream.tick(), "s2")[0])
+    assert boards(view) == [(grid_a, 11), (grid_b, 5)]
+
+def test_view_ignores_a_delta_after_a_missed_frame():
+    stream = new_stream()
+    stream.subscribe("s1", None)
+    view = SpectatorView()
+    view.apply(frames(*stream.tick(), "s1")[0])
+
+    play(stream, "a", 19, 0, 3, 10)
+    stream.tick()  # Missed
+    play(stream, "a", 18, 0, 3, 20)
+    assert not view.apply(frames(*stream.tick(), "s1")[0])
+    assert view.seq == 0
+
+def test_summary_lists_players_scores_and_spectators():
+    stream = new_stream()
+    stream.subscribe("s1", None)
+    play(stream, "b", 19, 0, 1, 7)
+    assert stream.summary() == {"match": "m1", "players": ["Alice", "Bob"], "scores": [0, 7], "spectators": 1}
@@ -0,0 +1,31 @@
+import time
+
+import tetris_bot
+from tetris_bot import TetrisBot, SearchPiece, SHAPES, get_search_pool, shutdown_search_pools
+
+def parallel_bot():
+    bot = TetrisBot('hard', search_workers=2)
+    bot.settings['hard'].update({'search_budget': 30.0, 'search_depth': 2, 'beam_width': 4, 'error_rate': 0.0})
+    bot.set_grid([[0] * 10 for _ in range(20)])
+    bot.set_pieces(SearchPiece(SHAPES[2], 2), SearchPiece(SHAPES[0], 0))
+    return bot
+
+def test_search_survives_a_dead_pool_worker():
+    bot = parallel_bot()
+    try:
+        assert bot.find_best_move() is not None
+        pool = get_search_pool(2)
+        for process in list(pool._processes.values()):
+            process.kill()
+            process.join()
+        time.sleep(0.2)
+
+        # Falls back to a local search and drops the broken pool
+        assert bot.find_best_move() is not None
+        assert tetris_bot._search_pools.get(2) is not pool
+
+        # The next search runs on a fresh pool
+        assert bot.find_best_move() is not None
+        assert get_search_pool(2) is not pool
+    finally:
+        shutdown_search_pools()
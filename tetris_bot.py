@@ -2,48 +2,139 @@ import random
 import time
 import copy
 import threading
+import concurrent.futures
+
+# Tetromino shapes, indexed by shape_idx as in the multiplayer client
+SHAPES = [
+    [[1, 1, 1, 1]],  # I
+    [[1, 1], [1, 1]],  # O
+    [[1, 1, 1], [0, 1, 0]],  # T
+    [[1, 1, 1], [1, 0, 0]],  # L
+    [[1, 1, 1], [0, 0, 1]],  # J
+    [[1, 1, 0], [0, 1, 1]],  # S
+    [[0, 1, 1], [1, 1, 0]]   # Z
+]
+
+JUNK_BLOCK = 8  # Gray junk blocks, as in the clients
+
+# Warm process pools shared by every bot, keyed by worker count
+_search_pools = {}
+_search_pools_lock = threading.Lock()
+
+# Bot used by search calls inside a pool worker process
+_worker_bot = None
+
+def get_search_pool(workers):
+    """Return the shared process pool with the given number of workers, creating it on first use."""
+    with _search_pools_lock:
+        pool = _search_pools.get(workers)
+        if pool is None:
+            pool = concurrent.futures.ProcessPoolExecutor(max_workers=workers)
+            _search_pools[workers] = pool
+        return pool
+
+def discard_search_pool(workers, pool):
+    """Drop a pool that failed, so the next search starts a fresh one."""
+    with _search_pools_lock:
+        if _search_pools.get(workers) is pool:
+            del _search_pools[workers]
+    pool.shutdown(wait=False, cancel_futures=True)
+
+def shutdown_search_pools():
+    """Shut down all shared search pools."""
+    with _search_pools_lock:
+        for pool in _search_pools.values():
+            pool.shutdown(wait=False, cancel_futures=True)
+        _search_pools.clear()
+
+def encode_grid(grid):
+    """Pack a grid into one byte per cell, row by row."""
+    return bytes(cell for row in grid for cell in row)
+
+def decode_grid(data, width=10):
+    """Unpack a grid produced by encode_grid."""
+    return [list(data[i:i + width]) for i in range(0, len(data), width)]
+
+class SearchPiece:
+    """Minimal piece used to ship pieces to search workers."""
+    
+    def __init__(self, shape, shape_idx, x=0, y=0):
+        self.shape = shape
+        self.shape_idx = shape_idx
+        self.x = x
+        self.y = y
+
+def _search_worker(weights, discount, grid_data, pieces_data, moves, beam_width, max_depth, budget):
+    """Run the search for a subset of first moves inside a pool worker."""
+    global _worker_bot
+    if _worker_bot is None:
+        _worker_bot = TetrisBot()
+    _worker_bot.weights = weights
+    _worker_bot.discount = discount
+    
+    deadline = time.perf_counter() + budget
+    grid = decode_grid(grid_data)
+    pieces = [SearchPiece([list(row) for row in shape], shape_idx)
+              for shape, shape_idx in pieces_data]
+    
+    moves = set(moves)
+    root_children = [child for child in _worker_bot._expand(grid, pieces[0])
+                     if child[0] in moves]
+    return _worker_bot.search_depths(root_children, pieces, beam_width, max_depth, deadline)
 
 class TetrisBot:
-    def __init__(self, difficulty='medium'):
+    def __init__(self, difficulty='medium', search_workers=0):
         """
         Initialize a Tetris bot with a specific difficulty level.
         
         Args:
             difficulty (str): 'easy', 'medium', or 'hard' to determine bot skill
+            search_workers (int): Number of processes to split the move search
+                across; 0 or 1 searches in the calling thread
         """
         self.difficulty = difficulty
+        self.search_workers = search_workers
         self.grid = [[0 for _ in range(10)] for _ in range(20)]  # Standard 10x20 grid
         self.current_piece = None
         self.next_piece = None
+        self.preview_pieces = []  # Pieces queued after next_piece
         self.score = 0
         self.lines_cleared = 0
         self.level = 1
         self.fall_time = 0
         self.running = False
         self.bot_thread = None
+        self.scheduler = None
         
-        # Difficulty settings
+        # Difficulty settings. Strength comes from how much search the bot
+        # is allowed per decision rather than from sleeping.
         self.settings = {
             'easy': {
-                'move_delay': 0.5,  # Slower moves
-                'think_delay': 0.3,  # Longer thinking time
-                'error_rate': 0.3,   # 30% chance of suboptimal move
-                'look_ahead': False  # Doesn't consider next piece
+                'move_delay': 0.5,      # Slower moves
+                'search_budget': 0.02,  # Seconds of search per decision
+                'search_depth': 1,      # Only places the current piece
+                'beam_width': 1,
+                'error_rate': 0.3       # 30% chance of suboptimal move
             },
             'medium': {
                 'move_delay': 0.3,
-                'think_delay': 0.2,
-                'error_rate': 0.15,
-                'look_ahead': True   # Considers next piece
+                'search_budget': 0.05,
+                'search_depth': 2,      # Considers next piece
+                'beam_width': 4,
+                'error_rate': 0.15
             },
             'hard': {
-                'move_delay': 0.1,   # Fast moves
-                'think_delay': 0.1,  # Quick thinking
-                'error_rate': 0.05,  # Rarely makes mistakes
-                'look_ahead': True   # Considers next piece
+                'move_delay': 0.1,      # Fast moves
+                'search_budget': 0.15,
+                'search_depth': 3,      # Uses the preview queue
+                'beam_width': 8,
+                'error_rate': 0.05      # Rarely makes mistakes
             }
         }
         
+        # Discount applied to each deeper ply of the search
+        self.discount = 0.5
+        
         # Heuristic weights for evaluating moves
         self.weights = {
             'height': -4.5,         # Maximum height penalty
@@ -70,41 +161,66 @@ class TetrisBot:
         """Set the current grid state from external source."""
         self.grid = copy.deepcopy(grid)
     
-    def set_pieces(self, current_piece, next_piece):
-        """Set the current and next pieces from external source."""
+    def set_pieces(self, current_piece, next_piece, preview_pieces=None):
+        """Set the current, next and any further previewed pieces from external source."""
         self.current_piece = current_piece
         self.next_piece = next_piece
+        self.preview_pieces = list(preview_pieces or [])
     
-    def start(self):
-        """Start the bot in a separate thread."""
+    def start(self, scheduler=None):
+        """
+        Start the bot in a separate thread, or on a shared scheduler.
+        
+        Args:
+            scheduler: Optional BotScheduler that drives this bot instead
+                of a dedicated thread
+        """
         if not self.running:
             self.running = True
-            self.bot_thread = threading.Thread(target=self.run)
-            self.bot_thread.daemon = True
-            self.bot_thread.start()
+            if scheduler:
+                self.scheduler = scheduler
+                scheduler.add(self)
+            else:
+                self.bot_thread = threading.Thread(target=self.run)
+                self.bot_thread.daemon = True
+                self.bot_thread.start()
     
     def stop(self):
         """Stop the bot thread."""
         self.running = False
         if self.bot_thread:
             self.bot_thread = None
+        if self.scheduler:
+            self.scheduler.remove(self)
+            self.scheduler = None
     
     def run(self):
         """Main bot loop - continuously decides and makes moves."""
         while self.running:
-            if self.current_piece:
-                # Decide on the best move
-                best_move = self.find_best_move()
-                
-                # Execute the move
-                if best_move:
-                    rotations, position = best_move
-                    # Apply bot's moves with a delay to make it feel more natural
-                    self.execute_move(rotations, position)
+            self.step()
             
             # Small delay between moves
             time.sleep(self.settings[self.difficulty]['move_delay'])
     
+    def step(self):
+        """
+        Decide on and execute one move for the current piece.
+        
+        Returns:
+            dict: The bot_move message, or None if there was nothing to do
+        """
+        if not self.current_piece:
+            return None
+        
+        # Decide on the best move
+        best_move = self.find_best_move()
+        
+        # Execute the move
+        if best_move:
+            rotations, position = best_move
+            return self.execute_move(rotations, position)
+        return None
+    
     def execute_move(self, rotations, position):
         """
         Simulate execution of moves, but in reality return the moves for the game to execute.
@@ -125,105 +241,219 @@ class TetrisBot:
         """
         Find the best move (rotation and position) for the current piece.
         
+        Runs an iteratively deepened beam search over the current piece and
+        the previewed pieces. Each iteration searches one piece deeper; once
+        the difficulty's search budget runs out the move from the deepest
+        completed iteration is returned, so decision latency stays bounded.
+        
         Returns:
             tuple: (rotations, x_position) for the best move
         """
         if not self.current_piece:
             return None
         
-        # Add a thinking delay based on difficulty
-        time.sleep(self.settings[self.difficulty]['think_delay'])
+        settings = self.settings[self.difficulty]
+        deadline = time.perf_counter() + settings['search_budget']
         
-        # Get all possible moves
-        possible_moves = self.get_possible_moves()
+        # Get all possible placements for the current piece
+        root_children = self._expand(self.grid, self.current_piece)
         
-        if not possible_moves:
+        if not root_children:
             return None
         
         # For easy difficulty, sometimes make suboptimal moves
-        if random.random() < self.settings[self.difficulty]['error_rate']:
-            return random.choice(possible_moves)
-        
-        best_score = float('-inf')
-        best_moves = []
+        if random.random() < settings['error_rate']:
+            return random.choice(root_children)[0]
+        
+        pieces = [self.current_piece]
+        if self.next_piece:
+            pieces.append(self.next_piece)
+        pieces.extend(self.preview_pieces)
+        max_depth = max(1, min(settings['search_depth'], len(pieces)))
+        
+        if self.search_workers > 1 and len(root_children) > 1:
+            results = self._parallel_search(root_children, pieces, settings['beam_width'],
+                                            max_depth, deadline)
+        else:
+            results = self.search_depths(root_children, pieces, settings['beam_width'],
+                                         max_depth, deadline)
+        
+        # Play the move from the deepest completed iteration. If multiple
+        # moves have the same score, choose one randomly
+        best_moves = results[-1][1] if results else None
+        return random.choice(best_moves) if best_moves else None
+    
+    def search_depths(self, root_children, pieces, beam_width, max_depth, deadline):
+        """
+        Iteratively deepen the beam search until max_depth or the deadline.
         
-        for move in possible_moves:
-            rotations, position = move
-            
-            # Create a copy of the grid to simulate the move
-            test_grid = copy.deepcopy(self.grid)
-            
-            # Simulate placing the piece with these rotations and position
-            test_piece = copy.deepcopy(self.current_piece)
-            
-            # Apply rotations
-            for _ in range(rotations):
-                test_piece.shape = self.rotate_shape(test_piece.shape)
+        Args:
+            root_children: (move, grid, lines_cleared) placements of the current piece
+            pieces: The current piece followed by the pieces to search after it
+            beam_width: Number of nodes kept at each ply
+            max_depth: Maximum number of pieces to search
+            deadline: perf_counter() value at which deeper iterations stop
             
-            # Set position
-            test_piece.x = position
+        Returns:
+            list: (best_score, best_moves) for each completed depth, shallowest first
+        """
+        results = []
+        for depth in range(1, max_depth + 1):
+            # The first ply always completes so the bot never stalls
+            result = self.beam_search(root_children, pieces[1:depth], beam_width,
+                                      deadline if depth > 1 else None)
+            if result is None:
+                break
+            results.append(result)
+            if time.perf_counter() >= deadline:
+                break
+        return results
+    
+    def _parallel_search(self, root_children, pieces, beam_width, max_depth, deadline):
+        """
+        Split the first moves across the process pool and merge the results.
+        
+        Each worker searches a share of the first moves with a share of the
+        beam, so the total work matches a serial search of the same width.
+        
+        Returns:
+            list: (best_score, best_moves) for each depth completed by every worker
+        """
+        pool = get_search_pool(self.search_workers)
+        chunks = min(self.search_workers, len(root_children))
+        chunk_beam = max(1, -(-beam_width // chunks))
+        
+        # Boards and pieces travel to the workers in a compact form
+        grid_data = encode_grid(self.grid)
+        pieces_data = [(tuple(tuple(row) for row in piece.shape), piece.shape_idx)
+                       for piece in pieces[:max_depth]]
+        budget = max(0.0, deadline - time.perf_counter())
+        
+        try:
+            futures = []
+            for i in range(chunks):
+                moves = [child[0] for child in root_children[i::chunks]]
+                futures.append(pool.submit(_search_worker, self.weights, self.discount,
+                                           grid_data, pieces_data, moves, chunk_beam,
+                                           max_depth, budget))
+            worker_results = [future.result() for future in futures]
+        except Exception:
+            # A pool whose worker died is broken for good: replace it on the next
+            # search and fall back to searching locally for this one
+            discard_search_pool(self.search_workers, pool)
+            return self.search_depths(root_children, pieces, beam_width, max_depth, deadline)
+        
+        # Only depths every worker finished are comparable
+        depth = min(len(result) for result in worker_results)
+        results = []
+        for level in range(depth):
+            best_score = max(result[level][0] for result in worker_results)
+            best_moves = []
+            for result in worker_results:
+                if result[level][0] == best_score:
+                    best_moves.extend(result[level][1])
+            results.append((best_score, best_moves))
+        return results
+    
+    def beam_search(self, root_children, pieces, beam_width, deadline=None):
+        """
+        Search placements of the given pieces, keeping only the best nodes per ply.
+        
+        Args:
+            root_children: (move, grid, lines_cleared) placements of the current piece
+            pieces: Pieces to place after the current one, in order
+            beam_width: Number of nodes kept at each ply
+            deadline: perf_counter() value after which the search is abandoned
             
-            # Drop the piece to find its final position
-            test_piece.y = 0
-            while not self.check_collision(test_grid, test_piece, 0, 1):
-                test_piece.y += 1
+        Returns:
+            tuple: (best_score, best_moves) where best_moves lists the
+            (rotations, x_position) first moves reaching best_score, or None
+            if the deadline passed before the search finished
+        """
+        # Each node is (value, first_move, grid)
+        frontier = [(self.evaluate_position(grid, lines), move, grid)
+                    for move, grid, lines in root_children]
+        
+        weight = 1.0
+        for piece in pieces:
+            weight *= self.discount
             
-            # Place the piece on the test grid
-            self.place_piece(test_grid, test_piece)
+            # Only the most promising nodes are expanded
+            frontier.sort(key=lambda node: node[0], reverse=True)
+            frontier = frontier[:beam_width]
             
-            # Clear any completed lines
-            lines_cleared = self.clear_lines(test_grid)
+            children = []
+            for value, first_move, grid in frontier:
+                if deadline is not None and time.perf_counter() >= deadline:
+                    return None
+                for _, child_grid, lines in self._expand(grid, piece):
+                    child_value = value + weight * self.evaluate_position(child_grid, lines)
+                    children.append((child_value, first_move, child_grid))
             
-            # Calculate score for this move
-            move_score = self.evaluate_position(test_grid, lines_cleared)
+            # A node with no legal placement keeps its value so that
+            # topping out is not mistaken for an empty search
+            frontier = children or frontier
+        
+        best_score = max(node[0] for node in frontier)
+        best_moves = []
+        for value, first_move, _ in frontier:
+            if value == best_score and first_move not in best_moves:
+                best_moves.append(first_move)
+        return best_score, best_moves
+    
+    def _expand(self, grid, piece):
+        """
+        Simulate every possible move of a piece on a grid.
+        
+        Args:
+            grid: The game grid to place the piece on
+            piece: The tetromino piece to place
             
-            # If we're considering the next piece too (look-ahead)
-            if self.settings[self.difficulty]['look_ahead'] and self.next_piece:
-                # For each possible placement of the next piece
-                next_piece_moves = self.get_possible_moves_for_piece(test_grid, self.next_piece)
-                best_next_score = float('-inf')
-                
-                for next_move in next_piece_moves:
-                    next_rotations, next_position = next_move
-                    
-                    # Create another test grid
-                    next_test_grid = copy.deepcopy(test_grid)
-                    next_test_piece = copy.deepcopy(self.next_piece)
-                    
-                    # Apply rotations
-                    for _ in range(next_rotations):
-                        next_test_piece.shape = self.rotate_shape(next_test_piece.shape)
-                    
-                    # Set position
-                    next_test_piece.x = next_position
-                    
-                    # Drop the piece
-                    next_test_piece.y = 0
-                    while not self.check_collision(next_test_grid, next_test_piece, 0, 1):
-                        next_test_piece.y += 1
-                    
-                    # Place the piece
-                    self.place_piece(next_test_grid, next_test_piece)
-                    
-                    # Clear lines
-                    next_lines_cleared = self.clear_lines(next_test_grid)
-                    
-                    # Evaluate
-                    next_score = self.evaluate_position(next_test_grid, next_lines_cleared)
-                    best_next_score = max(best_next_score, next_score)
-                
-                # Add the best next piece score with a discount factor
-                move_score += 0.5 * best_next_score
+        Returns:
+            list: (move, resulting_grid, lines_cleared) tuples
+        """
+        results = []
+        for move in self.get_possible_moves_for_piece(grid, piece):
+            rotations, position = move
+            test_grid, lines_cleared = self.drop_piece(grid, piece, rotations, position)
+            results.append((move, test_grid, lines_cleared))
+        
+        return results
+    
+    def drop_piece(self, grid, piece, rotations, position):
+        """
+        Hard drop a piece onto a copy of the grid.
+        
+        Args:
+            grid: The game grid, left unchanged
+            piece: The tetromino piece to drop
+            rotations: Number of clockwise rotations to apply
+            position: Column of the piece's left edge
             
-            # Track the best move(s)
-            if move_score > best_score:
-                best_score = move_score
-                best_moves = [move]
-            elif move_score == best_score:
-                best_moves.append(move)
-        
-        # If multiple moves have the same score, choose one randomly
-        return random.choice(best_moves) if best_moves else None
+        Returns:
+            tuple: (resulting_grid, lines_cleared)
+        """
+        # Create a copy of the grid and piece to simulate the move
+        test_grid = [row[:] for row in grid]
+        test_piece = copy.copy(piece)
+        
+        # Apply rotations
+        for _ in range(rotations):
+            test_piece.shape = self.rotate_shape(test_piece.shape)
+        
+        # Set position
+        test_piece.x = position
+        
+        # Drop the piece to find its final position
+        test_piece.y = 0
+        while not self.check_collision(test_grid, test_piece, 0, 1):
+            test_piece.y += 1
+        
+        # Place the piece on the test grid and clear any completed lines
+        self.place_piece(test_grid, test_piece)
+        lines_cleared = self.clear_lines(test_grid)
+        
+        return test_grid, lines_cleared
     
     def get_possible_moves(self):
         """Get all possible moves (rotations and positions) for the current piece."""
@@ -258,7 +488,7 @@ class TetrisBot:
             
             # Try each horizontal position
             for x in range(-2, 10):  # Allow some overhang for rotation clearance
-                test_piece = copy.deepcopy(piece)
+                test_piece = copy.copy(piece)
                 test_piece.x = x
                 test_piece.y = 0
                 
@@ -433,3 +663,63 @@ class TetrisBot:
         )
         
         return score
+
+class BotGame:
+    """One bot playing on its own simulated board with a seeded piece stream."""
+    
+    def __init__(self, bot, seed):
+        self.bot = bot
+        self.rng = random.Random(seed)
+        preview = max(2, bot.settings[bot.difficulty]['search_depth'])
+        self.queue = [self.rng.randrange(len(SHAPES)) for _ in range(preview)]
+        self.score = 0
+        self.lines_cleared = 0
+        self.level = 1
+        self.pieces = 0
+        self.game_over = False
+    
+    def play_piece(self):
+        """
+        Let the bot place the next piece.
+        
+        Returns:
+            int: Lines cleared by the placement
+        """
+        pieces = [SearchPiece(SHAPES[shape_idx], shape_idx) for shape_idx in self.queue]
+        self.bot.set_pieces(pieces[0], pieces[1], pieces[2:])
+        
+        move = self.bot.step()
+        if move is None:
+            self.game_over = True
+            return 0
+        
+        self.bot.grid, lines = self.bot.drop_piece(self.bot.grid, pieces[0],
+                                                   move['rotations'], move['position'])
+        self.queue.pop(0)
+        self.queue.append(self.rng.randrange(len(SHAPES)))
+        self.pieces += 1
+        
+        # Same scoring and levels as the multiplayer client
+        if lines > 0:
+            self.lines_cleared += lines
+            self.score += lines * lines * 100 * self.level
+        self.level = max(1, self.lines_cleared // 10 + 1)
+        return lines
+    
+    def add_junk_lines(self, num_lines, rng):
+        """Push junk lines with one random gap onto the bottom of the board."""
+        grid = self.bot.grid
+        for _ in range(num_lines):
+            grid.pop(0)
+            gap = rng.randint(0, len(grid[0]) - 1)
+            grid.append([0 if x == gap else JUNK_BLOCK for x in range(len(grid[0]))])
+    
+    def result(self):
+        """Return the statistics for this player's game."""
+        return {
+            "lines": self.lines_cleared,
+            "score": self.score,
+            "pieces": self.pieces,
+            "survival": round(self.pieces * self.bot.settings[self.bot.difficulty]['move_delay'], 2),
+            "topped_out": self.game_over
+        }